@@ -0,0 +1,212 @@
+'''
+Hot/cold archival of completed flights. The archival job moves Landed and
+Cancelled flights older than a given age, with their OperatedBy rows, from
+the main database (the hot set) to an archive database, a batch of flights
+per transaction. While it moves a batch, it adds the batch to totals kept in
+the archive, so that summary statistics 1, 2 and 4 are the live statistics
+of the hot set plus the archived totals and never scan archived rows.
+
+The archived totals are computed when the flights are archived: later
+changes to Aircrafts or Pilots no longer affect them.
+'''
+import datetime
+import os
+
+from parallel_stats import merge
+from profiler import connect
+
+COMPLETED_STATUSES = ("Landed", "Cancelled")
+
+# pre-aggregated totals of the archived flights, created with the archive
+archive_totals_schema = (
+    """CREATE TABLE IF NOT EXISTS StatusTotals (
+         Status TEXT NOT NULL PRIMARY KEY,
+         NumFlights INTEGER NOT NULL,
+         AircraftFlights INTEGER NOT NULL,
+         PassengerCapacity INTEGER NOT NULL
+       )""",
+    """CREATE TABLE IF NOT EXISTS PilotStatusTotals (
+         PilotID TEXT NOT NULL,
+         Status TEXT NOT NULL,
+         NumFlights INTEGER NOT NULL,
+         PRIMARY KEY (PilotID, Status)
+       )""",
+)
+
+# rows shaped as the partial aggregates of parallel_stats.merge
+totals_queries = {
+    1: "SELECT Status, NumFlights FROM StatusTotals WHERE NumFlights > 0",
+    2: """SELECT Status, PassengerCapacity FROM StatusTotals
+           WHERE AircraftFlights > 0""",
+    4: "SELECT PilotID, Status, NumFlights FROM PilotStatusTotals",
+}
+
+# ---- one batch of the archival job (the flights listed in temp.ArchiveBatch)
+sql_create_batch = """CREATE TEMP TABLE IF NOT EXISTS ArchiveBatch (
+                        FlightRowID INTEGER PRIMARY KEY,
+                        FlightID TEXT NOT NULL
+                      )"""
+sql_select_batch = """INSERT INTO temp.ArchiveBatch (FlightRowID, FlightID)
+                      SELECT rowid, FlightID FROM main.Flights
+                       WHERE Departure < ? AND Status IN ({statuses})
+                       LIMIT ?"""
+# WHERE true: required by the upsert of an INSERT ... SELECT
+sql_add_status_totals = """
+    INSERT INTO archive.StatusTotals
+      (Status, NumFlights, AircraftFlights, PassengerCapacity)
+    SELECT Status, COUNT(*), COUNT(Aircrafts.AircraftID),
+           COALESCE(SUM(MaxPassengers), 0)
+      FROM temp.ArchiveBatch
+      JOIN main.Flights ON Flights.rowid = ArchiveBatch.FlightRowID
+      LEFT JOIN main.Aircrafts ON Flights.AircraftID = Aircrafts.AircraftID
+     WHERE true
+     GROUP BY Status
+    ON CONFLICT(Status) DO UPDATE SET
+      NumFlights = NumFlights + excluded.NumFlights,
+      AircraftFlights = AircraftFlights + excluded.AircraftFlights,
+      PassengerCapacity = PassengerCapacity + excluded.PassengerCapacity"""
+sql_add_pilot_totals = """
+    INSERT INTO archive.PilotStatusTotals (PilotID, Status, NumFlights)
+    SELECT Pilots.PilotID, Status, COUNT(Flights.FlightID)
+      FROM temp.ArchiveBatch
+      JOIN main.Flights ON Flights.rowid = ArchiveBatch.FlightRowID
+      JOIN main.OperatedBy ON OperatedBy.FlightID = Flights.FlightID
+      JOIN main.Pilots ON Pilots.PilotID = OperatedBy.PilotID
+     WHERE true
+     GROUP BY Pilots.PilotID, Status
+    ON CONFLICT(PilotID, Status) DO UPDATE SET
+      NumFlights = NumFlights + excluded.NumFlights"""
+sql_copy_flights = """INSERT INTO archive.Flights
+                      SELECT Flights.* FROM temp.ArchiveBatch
+                        JOIN main.Flights ON Flights.rowid = ArchiveBatch.FlightRowID"""
+# a plain INSERT: a row already archived aborts the batch instead of being
+# deleted from the hot set without a copy
+sql_copy_operated_by = """INSERT INTO archive.OperatedBy
+                          SELECT * FROM main.OperatedBy
+                           WHERE FlightID IN (SELECT FlightID FROM temp.ArchiveBatch)"""
+sql_delete_operated_by = """DELETE FROM main.OperatedBy
+                            WHERE FlightID IN (SELECT FlightID FROM temp.ArchiveBatch)"""
+sql_delete_flights = """DELETE FROM main.Flights
+                        WHERE rowid IN (SELECT FlightRowID FROM temp.ArchiveBatch)"""
+sql_clear_batch = "DELETE FROM temp.ArchiveBatch"
+
+
+# --------------------------------------------------------------
+class ArchiveResult:
+  '''
+  Outcome of an archival run
+  '''
+
+  def __init__(self, cutoff):
+    self.cutoff = cutoff
+    self.flights = 0
+    self.operated_by = 0
+    self.batches = 0
+
+  def as_dict(self):
+    return {
+        "cutoff": self.cutoff,
+        "flights": self.flights,
+        "operated_by": self.operated_by,
+        "batches": self.batches,
+    }
+
+
+# --------------------------------------------------------------
+class FlightArchive:
+  '''
+  The archive database of a main database. schema holds the statements
+  creating the Flights and OperatedBy tables (and their indexes) in the
+  archive. The archive has tables of the same names, so any query of the
+  hot set runs unchanged on the archive with query(). Its connections report
+  to profiler, when given
+  '''
+
+  def __init__(self, db_path, archive_path, schema=(), profiler=None):
+    self.db_path = db_path
+    self.archive_path = archive_path
+    self.profiler = profiler
+    conn = connect(archive_path, profiler)
+    try:
+      for statement in tuple(schema) + archive_totals_schema:
+        conn.execute(statement)
+      conn.commit()
+    finally:
+      conn.close()
+
+  def archive(self, older_than_days, batch_size=5000, today=None):
+    '''
+    Move the completed flights that departed more than older_than_days ago
+    (and their OperatedBy rows) to the archive, batch_size flights per
+    transaction; returns an ArchiveResult
+    '''
+    if older_than_days < 0 or batch_size < 1:
+      raise ValueError("The age must be positive and the batch size at least 1.")
+    today = today or datetime.date.today()
+    cutoff = (today - datetime.timedelta(days=older_than_days)).isoformat()
+    result = ArchiveResult(cutoff)
+    select_batch = sql_select_batch.format(statuses=", ".join(
+        "?" for _ in COMPLETED_STATUSES))
+    # a connection of its own: the archive is attached to it
+    conn = connect(self.db_path, self.profiler)
+    try:
+      conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path, ))
+      conn.execute(sql_create_batch)
+      while True:
+        with conn:
+          conn.execute(sql_clear_batch)
+          selected = conn.execute(select_batch,
+                                  (cutoff, ) + COMPLETED_STATUSES +
+                                  (batch_size, )).rowcount
+          if selected == 0:
+            break
+          conn.execute(sql_add_status_totals)
+          conn.execute(sql_add_pilot_totals)
+          conn.execute(sql_copy_flights)
+          result.operated_by += conn.execute(sql_copy_operated_by).rowcount
+          conn.execute(sql_delete_operated_by)
+          result.flights += conn.execute(sql_delete_flights).rowcount
+          conn.execute(sql_clear_batch)
+        result.batches += 1
+    finally:
+      conn.close()
+    return result
+
+  def query(self, sql, params=()):
+    '''
+    Run a read-only query on the archive and return all rows
+    '''
+    conn = connect(self.archive_path, self.profiler)
+    try:
+      return conn.execute(sql, params).fetchall()
+    finally:
+      conn.close()
+
+  def contains_flight(self, flight_id):
+    '''
+    Whether a flight with this FlightID was archived
+    '''
+    return len(
+        self.query("SELECT 1 FROM Flights WHERE FlightID = ? LIMIT 1",
+                   (flight_id, ))) > 0
+
+  def flight_ids(self):
+    return [i[0] for i in self.query("SELECT FlightID FROM Flights")]
+
+  def totals(self, qid):
+    return self.query(totals_queries[qid])
+
+  def combine(self, qid, hot_rows):
+    '''
+    Summary statistic qid from the rows of the hot set and the archived totals
+    '''
+    if qid not in totals_queries:
+      return hot_rows
+    return merge(qid, [hot_rows, self.totals(qid)])
+
+
+def archive_path_of(db_path):
+  '''
+  Default archive of a database: AirDB.db -> AirDB_archive.db
+  '''
+  return os.path.splitext(db_path)[0] + "_archive.db"
@@ -0,0 +1,88 @@
+'''
+Benchmark: repeat analysis of one snapshot, flights by status.
+
+  text      render Flights as the menu's table (select_all) and parse it back
+  sql       GROUP BY query on the database
+  export    one-off cost of the columnar export of Flights
+  columnar  memory-map the export and count the Status codes
+
+Usage: python benchmarks/bench_columnar_export.py [--flights 100000] [--repeat 5]
+'''
+import argparse
+import collections
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as airdb_main
+from columnar_export import ColumnarTable, export_tables
+from data_generator import DataGenerator
+from renderer import TableRenderer
+
+
+def by_status_text(conn):
+  cursor = conn.execute("SELECT * FROM Flights")
+  out = io.StringIO()
+  TableRenderer([i[0] for i in cursor.description], out).render(cursor)
+  lines = out.getvalue().splitlines()[1:]
+  return collections.Counter(line.split("|")[4].strip() for line in lines)
+
+
+def by_status_sql(conn):
+  return dict(
+      conn.execute("SELECT Status, COUNT(*) FROM Flights GROUP BY Status"))
+
+
+def by_status_columnar(path):
+  with ColumnarTable(path) as table:
+    status = table.column("Status")
+    counts = collections.Counter(status.codes)
+    return {status.dictionary[code]: n for code, n in counts.items()}
+
+
+def timed(function, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    result = function()
+  return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--flights", type=int, default=100000)
+  parser.add_argument("--repeat", type=int, default=5)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    db_path = os.path.join(tmp, "AirDB.db")
+    airdb_main.AirDB(db_path).close()
+    conn = sqlite3.connect(db_path)
+    DataGenerator(args.flights).populate(conn)
+
+    export_seconds, paths = timed(
+        lambda: export_tables(conn, tmp, ["Flights"], {"Flights": "FlightID"}),
+        1)
+    results = [
+        ("text", ) + timed(lambda: by_status_text(conn), args.repeat),
+        ("sql", ) + timed(lambda: by_status_sql(conn), args.repeat),
+        ("export", export_seconds, None),
+        ("columnar", ) +
+        timed(lambda: by_status_columnar(paths["Flights"]), args.repeat),
+    ]
+    conn.close()
+
+    expected = results[1][2]
+    print(f"{args.flights} flights, "
+          f"export size {os.path.getsize(paths['Flights']) / 1e6:.1f} MB")
+    for name, seconds, counts in results:
+      check = "" if counts is None or dict(counts) == expected else "  MISMATCH"
+      print(f"{name:<10} {seconds * 1000:>10.1f} ms{check}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,164 @@
+'''
+Load test: several reader threads and writer threads work on the same
+database at once, and the read and write throughput is reported.
+
+Two set-ups are compared on the same generated data:
+  rollback  AirDB with the default rollback journal; every thread borrows
+            connections from the shared pool
+  wal       ConcurrentAirDB: WAL mode, one reader connection per thread and
+            one serialized writer
+
+A snapshot check runs alongside: a reader counts the flights twice inside one
+snapshot while inserts are committed, and both counts must be the same.
+
+Usage: python benchmarks/bench_concurrent_access.py [--flights 10000] [--readers 4] [--writers 2] [--seconds 5]
+'''
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as airdb_main
+from data_generator import DataGenerator
+
+
+def read_workload(airdb, gen, rng):
+  '''
+  One read: mostly PK lookups, some searches and summary statistics
+  '''
+  choice = rng.random()
+  if choice < 0.8:
+    airdb.query("SELECT * FROM Flights WHERE FlightID = ?",
+                (gen.flight_id(rng.randint(1, gen.flights)), ))
+  elif choice < 0.9:
+    airdb.query(
+        "SELECT * FROM Flights WHERE Status = ? AND AircraftID = ?",
+        (rng.choice(["Landed", "Delayed"]),
+         gen.aircraft_id(rng.randint(1, gen.aircrafts))))
+  else:
+    airdb.query(airdb_main.DBOperations.sql_summary_q4)
+
+
+def write_workload(airdb, gen, rng, next_id):
+  '''
+  One write: an insert of a new flight or an update of an existing one
+  '''
+  departure = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+  aircraft = gen.aircraft_id(rng.randint(1, gen.aircrafts))
+  if rng.random() < 0.5:
+    airdb.insert("Flights", (gen.flight_id(next_id()), "Heathrow Airport",
+                             "Haneda Airport", departure, "Scheduled",
+                             aircraft))
+  else:
+    airdb.update("Flights", (gen.flight_id(rng.randint(1, gen.flights)),
+                             "Heathrow Airport", "Haneda Airport", departure,
+                             "Delayed", aircraft))
+
+
+def worker(work, stop, counts, errors, index):
+  rng = random.Random(index)
+  while not stop.is_set():
+    try:
+      work(rng)
+      counts[index] += 1
+    except (ValueError, sqlite3.Error) as e:
+      errors.append(str(e))
+
+
+def snapshot_check(airdb, stop, results):
+  '''
+  Count the flights twice in one snapshot while writers keep committing
+  '''
+  while not stop.is_set():
+    with airdb.snapshot() as cursor:
+      first = cursor.execute("SELECT COUNT(*) FROM Flights").fetchone()[0]
+      time.sleep(0.05)
+      second = cursor.execute("SELECT COUNT(*) FROM Flights").fetchone()[0]
+    results.append(first == second)
+
+
+def run_load(airdb, gen, readers, writers, seconds):
+  stop = threading.Event()
+  read_counts = [0] * readers
+  write_counts = [0] * writers
+  errors = []
+  ids = iter(range(gen.flights + 1, 10**8))
+  id_lock = threading.Lock()
+
+  def next_id():
+    with id_lock:
+      return next(ids)
+
+  threads = [
+      threading.Thread(target=worker,
+                       args=(lambda rng: read_workload(airdb, gen, rng), stop,
+                             read_counts, errors, i)) for i in range(readers)
+  ]
+  threads += [
+      threading.Thread(target=worker,
+                       args=(lambda rng: write_workload(
+                           airdb, gen, rng, next_id), stop, write_counts,
+                             errors, i)) for i in range(writers)
+  ]
+  snapshots = []
+  if hasattr(airdb, "snapshot"):
+    threads.append(
+        threading.Thread(target=snapshot_check,
+                         args=(airdb, stop, snapshots)))
+  for thread in threads:
+    thread.start()
+  time.sleep(seconds)
+  stop.set()
+  for thread in threads:
+    thread.join()
+  return sum(read_counts), sum(write_counts), errors, snapshots
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--flights", type=int, default=10000)
+  parser.add_argument("--readers", type=int, default=4)
+  parser.add_argument("--writers", type=int, default=2)
+  parser.add_argument("--seconds", type=float, default=5.0)
+  args = parser.parse_args()
+
+  gen = DataGenerator(args.flights)
+  with tempfile.TemporaryDirectory() as tmp:
+    template = os.path.join(tmp, "template.db")
+    airdb_main.AirDB(template).close()
+    conn = sqlite3.connect(template)
+    gen.populate(conn)
+    conn.close()
+
+    print(f"{args.readers} readers, {args.writers} writers, "
+          f"{args.seconds:.0f}s, {args.flights} flights")
+    print(f"{'mode':<10} {'reads/s':>10} {'writes/s':>10} {'errors':>8} "
+          f"{'snapshots':>10}")
+    for mode, airdb_class in (("rollback", airdb_main.AirDB),
+                              ("wal", airdb_main.ConcurrentAirDB)):
+      path = os.path.join(tmp, mode + ".db")
+      shutil.copy(template, path)
+      airdb = airdb_class(path)
+      try:
+        reads, writes, errors, snapshots = run_load(airdb, gen, args.readers,
+                                                    args.writers,
+                                                    args.seconds)
+      finally:
+        airdb.close()
+      consistent = "n/a" if not snapshots else \
+          f"{sum(snapshots)}/{len(snapshots)} ok"
+      print(f"{mode:<10} {reads / args.seconds:>10.0f} "
+            f"{writes / args.seconds:>10.1f} {len(errors):>8} {consistent:>10}")
+      for error in sorted(set(errors))[:3]:
+        print("  error:", error)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,91 @@
+'''
+Benchmark: open/close a connection per operation vs. borrowing from the pool.
+
+Usage: python benchmarks/bench_connection_pool.py [--ops 5000]
+'''
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_pool import ConnectionPool
+
+SCHEMA = [
+    """CREATE TABLE Pilots (PilotID TEXT NOT NULL PRIMARY KEY, FirstName TEXT NOT NULL,
+       LastName TEXT NOT NULL, School TEXT NOT NULL, BirthDate TEXT NOT NULL,
+       ProfSince TEXT NOT NULL)""",
+    """CREATE TABLE Aircrafts (AircraftID TEXT NOT NULL PRIMARY KEY, Manufacturer TEXT NOT NULL,
+       Model TEXT NOT NULL, MaxPassengers INTEGER NOT NULL, CrewSize INTEGER NOT NULL)""",
+    """CREATE TABLE Flights (FlightID TEXT NOT NULL, Origin TEXT NOT NULL,
+       Destination TEXT NOT NULL, Departure TEXT NOT NULL, Status TEXT NOT NULL,
+       AircraftID TEXT NOT NULL)""",
+    """CREATE TABLE OperatedBy (FlightID TEXT NOT NULL, PilotID TEXT NOT NULL,
+       PRIMARY KEY (FlightID, PilotID))""",
+]
+
+QUERY = "SELECT * FROM Pilots WHERE PilotID = ?"
+
+
+def build_db(path):
+  conn = sqlite3.connect(path)
+  for stmt in SCHEMA:
+    conn.execute(stmt)
+  conn.executemany(
+      "INSERT INTO Pilots VALUES (?, ?, ?, ?, ?, ?)",
+      [(f"p{i}", "Adam", "Jones", "Air Grand", "1984-12-21", "2007-03-03")
+       for i in range(1000)])
+  conn.commit()
+  conn.close()
+
+
+def per_call(path, ops):
+  start = time.perf_counter()
+  for i in range(ops):
+    conn = sqlite3.connect(path)
+    try:
+      conn.execute(QUERY, (f"p{i % 1000}", )).fetchall()
+    finally:
+      conn.close()
+  return time.perf_counter() - start
+
+
+def pooled(path, ops):
+  pool = ConnectionPool(path)
+  start = time.perf_counter()
+  for i in range(ops):
+    conn = pool.acquire()
+    try:
+      conn.execute(QUERY, (f"p{i % 1000}", )).fetchall()
+    finally:
+      pool.release(conn)
+  elapsed = time.perf_counter() - start
+  pool.close()
+  return elapsed
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--ops", type=int, default=5000)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "AirDB.db")
+    build_db(path)
+
+    t_per_call = per_call(path, args.ops)
+    t_pooled = pooled(path, args.ops)
+
+  print(f"operations:          {args.ops}")
+  print(f"open/close per call: {t_per_call:.3f}s "
+        f"({t_per_call / args.ops * 1e6:.1f} us/op)")
+  print(f"pooled connections:  {t_pooled:.3f}s "
+        f"({t_pooled / args.ops * 1e6:.1f} us/op)")
+  print(f"speedup:             {t_per_call / t_pooled:.1f}x")
+
+
+if __name__ == "__main__":
+  main()
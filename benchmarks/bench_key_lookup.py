@@ -0,0 +1,95 @@
+'''
+Benchmark: per-insert latency of the FlightID validation as Flights grows.
+
+Compares the previous validator (load every FlightID and test membership in a
+list) with the index-backed point lookup and the cached key set.
+
+Usage: python benchmarks/bench_key_lookup.py [--sizes 1000 10000 100000] [--inserts 200]
+'''
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from key_lookup import KeyLookup
+
+CREATE_FLIGHTS = """CREATE TABLE Flights (FlightID TEXT NOT NULL, Origin TEXT NOT NULL,
+                    Destination TEXT NOT NULL, Departure TEXT NOT NULL,
+                    Status TEXT NOT NULL, AircraftID TEXT NOT NULL)"""
+INSERT_FLIGHT = "INSERT INTO Flights VALUES (?, ?, ?, ?, ?, ?)"
+CREATE_INDEX = "CREATE INDEX idx_flights_flightid ON Flights(FlightID, Status)"
+
+
+def flight_row(i):
+  return (f"f{i}", "Heathrow Airport", "Haneda Airport", "2024-05-25",
+          "Scheduled", "a1")
+
+
+def scan_exists(cur, flight_id):
+  # the validator as it was: fetch every id and search the list
+  existing_ids = cur.execute("SELECT FlightID FROM Flights").fetchall()
+  existing_ids = [i[0] for i in existing_ids]
+  return flight_id in existing_ids
+
+
+def time_inserts(conn, size, inserts, exists):
+  '''
+  Validate and insert new flights one at a time; returns mean seconds per insert
+  '''
+  cur = conn.cursor()
+  start = time.perf_counter()
+  for i in range(size, size + inserts):
+    row = flight_row(i)
+    if not exists(cur, row[0]):
+      cur.execute(INSERT_FLIGHT, row)
+      conn.commit()
+  elapsed = time.perf_counter() - start
+  cur.execute("DELETE FROM Flights WHERE rowid > ?", (size, ))
+  conn.commit()
+  return elapsed / inserts
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--sizes", type=int, nargs="+",
+                      default=[1000, 10000, 100000])
+  parser.add_argument("--inserts", type=int, default=200)
+  args = parser.parse_args()
+
+  print(f"{'rows':>10} {'full scan':>14} {'point lookup':>14} {'cached set':>14}")
+  with tempfile.TemporaryDirectory() as tmp:
+    for size in args.sizes:
+      path = os.path.join(tmp, f"flights_{size}.db")
+      conn = sqlite3.connect(path)
+      conn.execute(CREATE_FLIGHTS)
+      conn.executemany(INSERT_FLIGHT, (flight_row(i) for i in range(size)))
+      conn.execute(CREATE_INDEX)
+      lookup = KeyLookup()
+      conn.commit()
+
+      scan = time_inserts(conn, size, args.inserts, scan_exists)
+
+      point = time_inserts(
+          conn, size, args.inserts,
+          lambda cur, fid: lookup.exists(cur, "Flights", "FlightID", fid))
+
+      cached = KeyLookup(use_cache=True)
+
+      def cached_exists(cur, fid):
+        found = cached.exists(cur, "Flights", "FlightID", fid)
+        cached.record_insert("Flights", "FlightID", fid)
+        return found
+
+      cached_time = time_inserts(conn, size, args.inserts, cached_exists)
+      conn.close()
+
+      print(f"{size:>10} {scan * 1e6:>11.1f} us {point * 1e6:>11.1f} us "
+            f"{cached_time * 1e6:>11.1f} us")
+
+
+if __name__ == "__main__":
+  main()
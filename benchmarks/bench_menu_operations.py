@@ -0,0 +1,193 @@
+'''
+Benchmark suite: times every menu operation (options 5 to 15) of main.py on
+generated datasets of increasing size, and writes the results as JSON.
+
+The menu is driven exactly as an operator would use it: main.run_menu runs
+with input() answering from a script, and each operation is timed from one
+"Enter your choice" prompt to the next.
+
+Usage: python benchmarks/bench_menu_operations.py [--scales 10k 1m] [--output results.json]
+'''
+import argparse
+import builtins
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import main as airdb_main
+from data_generator import SCALES, DataGenerator
+
+MENU_PROMPT = "Enter your choice: "
+NEXT_PAGE_PROMPT = "Press Enter for the next page"
+
+# table IDs as listed by the menu (creation order)
+FLIGHTS_TABLE_ID = "3"
+
+
+def menu_script(gen):
+  '''
+  (option, description, answers) for options 5 to 15; flight ids come from the
+  generated data so that updates, deletes and searches hit an existing record
+  '''
+  middle_flight = gen.flight_id(gen.flights // 2)
+  last_flight = gen.flight_id(gen.flights)
+  new_flight = gen.flight_id(gen.flights + 1)
+  return [
+      (5, "Optional bulk data import", []),
+      (6, "Insert table record", [
+          FLIGHTS_TABLE_ID, new_flight, "Heathrow Airport", "Haneda Airport",
+          "2024-06-01", "Scheduled",
+          gen.aircraft_id(1)
+      ]),
+      (7, "Update table values based on PK", [
+          FLIGHTS_TABLE_ID, middle_flight, "Heathrow Airport",
+          "Haneda Airport", "2024-06-02", "Delayed",
+          gen.aircraft_id(1)
+      ]),
+      (8, "Delete table record based on PK", [FLIGHTS_TABLE_ID, last_flight]),
+      (9, "View table (SEL *)", [FLIGHTS_TABLE_ID]),
+      (10, "Search table record based on PK", [FLIGHTS_TABLE_ID,
+                                                middle_flight]),
+      (11, "Search table record based on Non-PK attributes",
+       [FLIGHTS_TABLE_ID, "Status", "Delayed"]),
+      (12, "Number of flights by status", []),
+      (13, "Max passengers capacity by flight status", []),
+      (14, "Pilots professional experience in years", []),
+      (15, "Number of flights by pilot and flight status", []),
+  ]
+
+
+# --------------------------------------------------------------
+class ScriptedInput:
+  '''
+  Stands in for input(): answers the menu with the scripted options and
+  records the time at which every menu prompt is shown
+  '''
+
+  def __init__(self, script):
+    self.answers = []
+    for option, _, answers in script:
+      self.answers.append(str(option))
+      self.answers.extend(answers)
+    self.answers.append("0")
+    self.menu_times = []
+
+  def __call__(self, prompt=""):
+    if prompt == MENU_PROMPT:
+      self.menu_times.append(time.perf_counter())
+    if prompt.startswith(NEXT_PAGE_PROMPT):
+      # page through the whole result
+      return ""
+    return self.answers.pop(0)
+
+
+# --------------------------------------------------------------
+class OutputCheck:
+  '''
+  Stands in for stdout: discards the output but notices error messages
+  '''
+  error_markers = ("Operation terminated", "An error occurred")
+
+  def __init__(self):
+    self.failed = False
+
+  def write(self, text):
+    if not self.failed and any(m in text for m in self.error_markers):
+      self.failed = True
+    return len(text)
+
+  def flush(self):
+    pass
+
+
+def run_menu(answers, stdout):
+  '''
+  Run the menu on the database in the current directory with scripted input
+  '''
+  real_input, real_stdout = builtins.input, sys.stdout
+  builtins.input, sys.stdout = answers, stdout
+  try:
+    airdb_main.run_menu(airdb_main.DBOperations())
+  finally:
+    builtins.input, sys.stdout = real_input, real_stdout
+
+
+def bench_scale(name, flights, work_dir):
+  gen = DataGenerator(flights)
+  scale_dir = os.path.join(work_dir, name)
+  os.makedirs(scale_dir)
+  os.chdir(scale_dir)
+
+  # create the schema, then load the generated data
+  run_menu(ScriptedInput([]), OutputCheck())
+  conn = sqlite3.connect("AirDB.db")
+  start = time.perf_counter()
+  reports = gen.populate(conn)
+  load_seconds = time.perf_counter() - start
+  conn.close()
+  print(f"[{name}] loaded {sum(r.rows_inserted for r in reports)} rows "
+        f"in {load_seconds:.1f}s", file=sys.stderr)
+
+  results = []
+  for option, description, answers in menu_script(gen):
+    scripted = ScriptedInput([(option, description, answers)])
+    output = OutputCheck()
+    run_menu(scripted, output)
+    # menu_times[0]: option entered, menu_times[1]: back at the menu
+    seconds = scripted.menu_times[1] - scripted.menu_times[0]
+    results.append({
+        "scale": name,
+        "flights": flights,
+        "option": option,
+        "operation": description,
+        "seconds": round(seconds, 6),
+        "ok": not output.failed,
+    })
+    print(f"[{name}] {option:>2}. {description:<50} {seconds:>10.4f}s"
+          f"{'' if not output.failed else '  (error)'}",
+          file=sys.stderr)
+  return load_seconds, results
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--scales",
+                      nargs="+",
+                      default=["10k"],
+                      help="named scales (" + ", ".join(SCALES) +
+                      ") or flight counts")
+  parser.add_argument("--output", default="bench_menu_operations.json")
+  args = parser.parse_args()
+
+  output_path = os.path.abspath(args.output)
+  cwd = os.getcwd()
+  report = {
+      "python": platform.python_version(),
+      "sqlite": sqlite3.sqlite_version,
+      "load_seconds": {},
+      "results": [],
+  }
+  with tempfile.TemporaryDirectory() as work_dir:
+    try:
+      for name in args.scales:
+        flights = SCALES.get(name.lower()) or int(name)
+        load_seconds, results = bench_scale(name, flights, work_dir)
+        report["load_seconds"][name] = round(load_seconds, 3)
+        report["results"].extend(results)
+    finally:
+      os.chdir(cwd)
+
+  with open(output_path, "w") as f:
+    json.dump(report, f, indent=2)
+  print("Results written to", output_path, file=sys.stderr)
+
+
+if __name__ == "__main__":
+  main()
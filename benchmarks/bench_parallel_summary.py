@@ -0,0 +1,74 @@
+'''
+Benchmark: summary statistics 2 and 4 computed serially (the queries of
+main.DBOperations) and with parallel_stats over Departure partitions, for
+1 to N worker processes. Every parallel result is checked against the serial
+one; the speedup is relative to the serial query.
+
+Usage: python benchmarks/bench_parallel_summary.py [--flights 500000] [--workers 1 2 4] [--repeat 3]
+'''
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as airdb_main
+from data_generator import DataGenerator
+from parallel_stats import ParallelSummary
+
+
+def best_of(function, repeat):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best, result
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--flights", type=int, default=500000)
+  parser.add_argument("--workers",
+                      type=int,
+                      nargs="+",
+                      default=sorted({1, 2, os.cpu_count() or 1}))
+  parser.add_argument("--repeat", type=int, default=3)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    db_path = os.path.join(tmp, "AirDB.db")
+    airdb_main.AirDB(db_path).close()
+    conn = sqlite3.connect(db_path)
+    DataGenerator(args.flights).populate(conn)
+    cursor = conn.cursor()
+
+    print(f"{args.flights} flights, {os.cpu_count()} cores")
+    print(f"{'stat':<6} {'mode':<12} {'seconds':>10} {'speedup':>8}")
+    for qid in (2, 4):
+      serial_seconds, expected = best_of(
+          lambda: cursor.execute(airdb_main.DBOperations.summary_queries[qid]).
+          fetchall(), args.repeat)
+      print(f"{qid:<6} {'serial':<12} {serial_seconds:>10.3f} {1:>8.2f}")
+      for workers in args.workers:
+        with ParallelSummary(db_path, workers) as summary:
+          # start the worker processes before timing
+          summary.run(qid, cursor)
+          seconds, rows = best_of(lambda: summary.run(qid, cursor),
+                                  args.repeat)
+        check = ""
+        if sorted(rows) != sorted(expected):
+          check = "  MISMATCH"
+        elif rows != expected:
+          check = "  (same rows, ties ordered differently)"
+        print(f"{qid:<6} {f'{workers} workers':<12} {seconds:>10.3f} "
+              f"{serial_seconds / seconds:>8.2f}{check}")
+    conn.close()
+
+
+if __name__ == "__main__":
+  main()
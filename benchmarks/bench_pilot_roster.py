@@ -0,0 +1,105 @@
+'''
+Benchmark: latency of the pilot roster (AirDB.pilot_roster) per pilot, over
+all dates and over a three-month range, with the covering indexes
+(idx_operatedby_pilotid_flightid and idx_flights_flightid_departure) and with
+the indexes they replaced (OperatedBy (PilotID) and Flights (FlightID, Status)).
+
+The cost of a roster grows with the flights of the pilot (about 100 in the
+generated data, whatever its size) and the depth of the indexes, so the
+latency measured on a smaller database is close to that of a larger one.
+
+Usage: python benchmarks/bench_pilot_roster.py [--flights 200000] [--pilots 2000]
+'''
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as airdb_main
+from data_generator import DataGenerator
+
+covering_indexes = ("idx_operatedby_pilotid_flightid",
+                    "idx_flights_flightid_departure")
+previous_indexes = (
+    "CREATE INDEX idx_operatedby_pilotid ON OperatedBy (PilotID)",
+    "CREATE INDEX idx_flights_flightid ON Flights (FlightID, Status)",
+)
+
+
+def time_rosters(airdb, pilots, low, high):
+  '''
+  Milliseconds per roster, and the rows returned
+  '''
+  times = []
+  rows = 0
+  for pilot_id in pilots:
+    start = time.perf_counter()
+    for _ in airdb.pilot_roster(pilot_id, low, high):
+      rows += 1
+    times.append((time.perf_counter() - start) * 1000)
+  return times, rows
+
+
+def report(label, times, rows):
+  times = sorted(times)
+  p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+  print(f"{label:<34} {statistics.mean(times):>9.3f} "
+        f"{statistics.median(times):>9.3f} {p99:>9.3f} "
+        f"{rows / len(times):>9.1f}")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--flights", type=int, default=200000)
+  parser.add_argument("--pilots",
+                      type=int,
+                      default=2000,
+                      help="rosters timed per case")
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    db_path = os.path.join(tmp, "AirDB.db")
+    airdb_main.AirDB(db_path).close()
+    gen = DataGenerator(args.flights)
+    conn = sqlite3.connect(db_path)
+    gen.populate(conn)
+    conn.close()
+    rng = random.Random(7)
+    pilots = [
+        gen.pilot_id(rng.randint(1, gen.pilots)) for _ in range(args.pilots)
+    ]
+
+    print(f"{args.flights} flights, {gen.pilots} pilots, "
+          f"{args.pilots} rosters per case")
+    print(f"{'case':<34} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'rows':>9}")
+    # AirDB drops the previous indexes at startup only: they are swapped
+    # while it is open
+    airdb = airdb_main.AirDB(db_path)
+    # warm the page cache
+    time_rosters(airdb, pilots[:100], None, None)
+    for indexes in ("covering", "previous"):
+      if indexes == "previous":
+        conn = sqlite3.connect(db_path)
+        for name in covering_indexes:
+          conn.execute("DROP INDEX " + name)
+        for statement in previous_indexes:
+          conn.execute(statement)
+        conn.commit()
+        conn.close()
+      for label, low, high in (("all dates", None, None),
+                               ("2024-04-01 to 2024-06-30", "2024-04-01",
+                                "2024-06-30")):
+        times, rows = time_rosters(airdb, pilots, low, high)
+        report(f"{indexes}, {label}", times, rows)
+    airdb.close()
+
+
+if __name__ == "__main__":
+  main()
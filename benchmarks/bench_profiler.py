@@ -0,0 +1,87 @@
+'''
+Benchmark: overhead of query profiling (profiler.ProfiledConnection) against
+a plain connection. Each case is timed on both: PK lookups (one execute and
+one fetch per lookup: the per-execute cost) and a full scan of Flights (the
+per-row cost of iterating the cursor).
+
+Usage: python benchmarks/bench_profiler.py [--flights 200000] [--lookups 20000] [--repeat 5]
+'''
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as airdb_main
+from data_generator import DataGenerator
+from profiler import QueryProfiler, connect
+
+
+def pk_lookups(conn, ids):
+  sql = "SELECT * FROM Flights WHERE FlightID = ?"
+  for flight_id in ids:
+    conn.execute(sql, (flight_id, )).fetchone()
+
+
+def full_scan(conn, ids):
+  for _ in conn.execute("SELECT * FROM Flights"):
+    pass
+
+
+def best_of(function, conn, ids, repeat):
+  seconds = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function(conn, ids)
+    elapsed = time.perf_counter() - start
+    seconds = elapsed if seconds is None else min(seconds, elapsed)
+  return seconds
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--flights", type=int, default=200000)
+  parser.add_argument("--lookups", type=int, default=20000)
+  parser.add_argument("--repeat", type=int, default=5)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    db_path = os.path.join(tmp, "AirDB.db")
+    airdb_main.AirDB(db_path).close()
+    gen = DataGenerator(args.flights)
+    conn = sqlite3.connect(db_path)
+    gen.populate(conn)
+    conn.close()
+    rng = random.Random(7)
+    ids = [
+        gen.flight_id(rng.randint(1, args.flights))
+        for _ in range(args.lookups)
+    ]
+
+    plain = connect(db_path)
+    profiled = connect(db_path, QueryProfiler())
+    print(f"{args.flights} flights, {args.lookups} lookups, best of "
+          f"{args.repeat}")
+    print(f"{'case':<12} {'plain s':>9} {'profiled s':>11} {'ratio':>7} "
+          f"{'overhead':>14}")
+    for label, function, units, unit in (
+        ("PK lookups", pk_lookups, args.lookups, "execute"),
+        ("full scan", full_scan, args.flights, "row"),
+    ):
+      # warm the page cache
+      function(plain, ids)
+      plain_s = best_of(function, plain, ids, args.repeat)
+      profiled_s = best_of(function, profiled, ids, args.repeat)
+      overhead = (profiled_s - plain_s) / units * 1e6
+      print(f"{label:<12} {plain_s:>9.3f} {profiled_s:>11.3f} "
+            f"{profiled_s / plain_s:>7.2f} {overhead:>6.2f} us/{unit}")
+    plain.close()
+    profiled.close()
+
+
+if __name__ == "__main__":
+  main()
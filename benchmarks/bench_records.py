@@ -0,0 +1,139 @@
+'''
+Benchmark: statement parameters built by the *Info classes as typed records
+(records.py) versus the former newline-joined __str__ followed by
+split("\\n"), and records built in bulk from cursor rows.
+
+For each path: records per second, and the memory allocated while building
+the records (tracemalloc: peak, and what is still held by the results), per
+record. Aircrafts show the integer columns (kept as int by the records,
+turned into text by the string path).
+
+Usage: python benchmarks/bench_records.py [--records 1000000] [--repeat 3]
+'''
+import argparse
+import itertools
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as airdb_main
+import records
+from data_generator import DataGenerator
+
+
+# ---- the former serialization of FlightInfo and AircraftsInfo
+def flight_str(info):
+  return info.flight_id + "\n"\
+      + info.flight_origin + "\n"\
+      + info.flight_destination + "\n"\
+      + info.flight_departure + "\n"\
+      + info.status + "\n"\
+      + info.aircraft_id
+
+
+def aircraft_str(info):
+  return info.aircraft_id + "\n"\
+      + info.manufacturer + "\n"\
+      + info.model + "\n"\
+      + str(info.max_passengers) + "\n"\
+      + str(info.crew)
+
+
+def set_flight(info, row):
+  (info.flight_id, info.flight_origin, info.flight_destination,
+   info.flight_departure, info.status, info.aircraft_id) = row
+
+
+def set_aircraft(info, row):
+  (info.aircraft_id, info.manufacturer, info.model, info.max_passengers,
+   info.crew) = row
+
+
+def string_params(info, to_str):
+  return tuple(str(to_str(info)).split("\n"))
+
+
+def record_params(info, to_str):
+  return info.record()
+
+
+def build_params(info, set_row, to_str, rows, params):
+  '''
+  Set each row on info (as the setters do) and build its parameters
+  '''
+  result = []
+  append = result.append
+  for row in rows:
+    set_row(info, row)
+    append(params(info, to_str))
+  return result
+
+
+def measure(function, repeat):
+  '''
+  (best seconds of repeat calls, peak bytes, bytes held by the result)
+  '''
+  seconds = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    del result
+    seconds = elapsed if seconds is None else min(seconds, elapsed)
+  tracemalloc.start()
+  result = function()
+  held, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del result
+  return seconds, peak, held
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--records", type=int, default=1000000)
+  parser.add_argument("--repeat", type=int, default=3)
+  args = parser.parse_args()
+  n = args.records
+
+  gen = DataGenerator(n)
+  flights = list(gen.flights_rows())
+  aircrafts = list(itertools.islice(itertools.cycle(gen.aircrafts_rows()), n))
+  flight_info = airdb_main.FlightInfo(cursor=None)
+  aircraft_info = airdb_main.AircraftsInfo(cursor=None)
+
+  conn = sqlite3.connect(":memory:")
+  conn.execute(airdb_main.DBOperations.create_tables_dict["Flights"])
+  conn.executemany(airdb_main.DBOperations.insert_tables_dict["Flights"],
+                   flights)
+  sql = airdb_main.DBOperations.sql_select_all + "Flights"
+
+  cases = (
+      ("Flights", "str + split", lambda: build_params(
+          flight_info, set_flight, flight_str, flights, string_params)),
+      ("Flights", "record", lambda: build_params(
+          flight_info, set_flight, flight_str, flights, record_params)),
+      ("Aircrafts", "str + split", lambda: build_params(
+          aircraft_info, set_aircraft, aircraft_str, aircrafts, string_params)),
+      ("Aircrafts", "record", lambda: build_params(
+          aircraft_info, set_aircraft, aircraft_str, aircrafts, record_params)),
+      ("Flights", "fetchall", lambda: conn.execute(sql).fetchall()),
+      ("Flights", "from_rows", lambda: records.from_rows(
+          "Flights", conn.execute(sql))),
+  )
+
+  print(f"{n} records per case")
+  print(f"{'table':<10} {'path':<12} {'records/s':>12} {'peak B/rec':>11} "
+        f"{'held B/rec':>11}")
+  for table, path, function in cases:
+    seconds, peak, held = measure(function, args.repeat)
+    print(f"{table:<10} {path:<12} {n / seconds:>12,.0f} {peak / n:>11.1f} "
+          f"{held / n:>11.1f}")
+  conn.close()
+
+
+if __name__ == "__main__":
+  main()
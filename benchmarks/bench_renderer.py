@@ -0,0 +1,94 @@
+'''
+Benchmark: rendering time of query results as the number of rows grows.
+
+Compares the previous pretty_print (string built with +=) with the
+renderers of renderer.py (table, csv, tsv, jsonl). Output goes to a sink
+that only counts characters. Time per row stays flat for the renderers,
+which shows linear scaling; the previous version is only run up to
+--max-previous rows.
+
+Usage: python benchmarks/bench_renderer.py [--sizes 10000 100000 1000000] [--max-previous 100000]
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_generator import DataGenerator
+from renderer import FORMATS, make_renderer
+
+COLUMNS = ("FlightID", "Origin", "Destination", "Departure", "Status",
+           "AircraftID")
+
+
+# --------------------------------------------------------------
+class CountingSink:
+  '''
+  Stands in for stdout: counts the characters written
+  '''
+
+  def __init__(self):
+    self.written = 0
+
+  def write(self, text):
+    self.written += len(text)
+    return len(text)
+
+  def flush(self):
+    pass
+
+
+def previous_pretty_print(columns, records, out):
+  # pretty_print as it was: header-based width and += concatenation
+  columns = [tuple(columns)]
+  records = columns + records
+  max_col_length = max([len(i) for i in columns[0]]) + 2
+  table = ""
+  for row in records:
+    new_row = ""
+    for cell in row:
+      cell = str(cell)
+      if len(cell) <= max_col_length:
+        new_row += cell + " " * (max_col_length - len(cell)) + "|"
+      else:
+        new_row += cell[:max_col_length - 2] + '..|'
+    table += new_row + "\n"
+  out.write(table)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--sizes",
+                      type=int,
+                      nargs="+",
+                      default=[10000, 100000, 1000000])
+  parser.add_argument("--max-previous", type=int, default=100000)
+  args = parser.parse_args()
+
+  gen = DataGenerator(max(args.sizes))
+  all_rows = list(gen.flights_rows())
+  names = ("previous", ) + FORMATS
+  print(f"{'rows':>10} " + " ".join(f"{name:>16}" for name in names))
+  for size in args.sizes:
+    rows = all_rows[:size]
+    timings = []
+    for name in names:
+      sink = CountingSink()
+      start = time.perf_counter()
+      if name == "previous":
+        if size > args.max_previous:
+          timings.append("skipped")
+          continue
+        previous_pretty_print(COLUMNS, rows, sink)
+      else:
+        # a generator: the renderer cannot tell the result size in advance
+        make_renderer(name, COLUMNS, sink).render(iter(rows))
+      elapsed = time.perf_counter() - start
+      timings.append(f"{elapsed:.2f}s {elapsed / size * 1e6:.2f}us")
+    print(f"{size:>10} " + " ".join(f"{t:>16}" for t in timings))
+
+
+if __name__ == "__main__":
+  main()
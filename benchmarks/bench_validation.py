@@ -0,0 +1,91 @@
+'''
+Benchmark: validation throughput of the per-record set_* chain versus the
+batch validator used by the file import.
+
+The per-record path runs the Info setters one row at a time against an
+in-memory database (one key lookup per row); the batch path checks the whole
+batch with validation.BatchValidator.
+
+Usage: python benchmarks/bench_validation.py [--rows 100000] [--per-record-rows 10000]
+'''
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as airdb_main
+import validation
+from data_generator import DataGenerator
+
+
+def setter_chain(info, table, row):
+  '''
+  The checks run by insert_record, without the INSERT
+  '''
+  if table == "Pilots":
+    return info.set_pilot_id(row[0]) and info.set_first_name(row[1]) \
+        and info.set_last_name(row[2]) and info.set_school(row[3]) \
+        and info.set_birth_date(row[4]) and info.set_prof_since(row[5])
+  return info.set_flight_id(row[0]) and info.set_flight_origin(row[1]) \
+      and info.set_flight_destination(row[2]) \
+      and info.set_flight_departure(row[3]) and info.set_status(row[4]) \
+      and info.set_aircraft_id(row[5])
+
+
+def time_per_record(conn, table, rows):
+  info_class = {
+      "Pilots": airdb_main.PilotsInfo,
+      "Flights": airdb_main.FlightInfo
+  }[table]
+  info = info_class(cursor=conn.cursor(), conn=conn)
+  start = time.perf_counter()
+  with contextlib.redirect_stdout(io.StringIO()):
+    for row in rows:
+      setter_chain(info, table, row)
+  return time.perf_counter() - start
+
+
+def time_batch(conn, table, rows):
+  start = time.perf_counter()
+  validator = validation.BatchValidator.from_cursor(conn.cursor(), table)
+  codes = validator.validate(rows)
+  elapsed = time.perf_counter() - start
+  return elapsed, sum(1 for row_codes in codes if row_codes)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--rows", type=int, default=100000)
+  parser.add_argument("--per-record-rows", type=int, default=10000)
+  args = parser.parse_args()
+
+  gen = DataGenerator(args.rows)
+  gen.pilots = args.rows
+  conn = sqlite3.connect(":memory:")
+  db_ops = airdb_main.DBOperations
+  for table in ("Pilots", "Aircrafts", "Flights"):
+    conn.execute(db_ops.create_tables_dict[table])
+  conn.executemany(db_ops.insert_tables_dict["Aircrafts"],
+                   gen.aircrafts_rows())
+  conn.commit()
+
+  print(f"{'table':<10} {'rows':>8} {'per record':>14} {'batch':>14} "
+        f"{'batch time':>11} {'invalid':>8}")
+  for table, rows in (("Pilots", list(gen.pilots_rows())),
+                      ("Flights", list(gen.flights_rows()))):
+    sample = rows[:args.per_record_rows]
+    per_record = time_per_record(conn, table, sample)
+    batch, invalid = time_batch(conn, table, rows)
+    print(f"{table:<10} {len(rows):>8} "
+          f"{len(sample) / per_record:>8.0f} row/s "
+          f"{len(rows) / batch:>8.0f} row/s {batch:>10.3f}s {invalid:>8}")
+  conn.close()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,283 @@
+import csv
+import json
+import os
+import sqlite3
+import time
+
+import validation
+
+
+# --------------------------------------------------------------
+class ImportReport:
+  '''
+  Counters collected while a file is imported
+  '''
+
+  def __init__(self, path, table):
+    self.path = path
+    self.table = table
+    self.rows_read = 0
+    self.rows_inserted = 0
+    self.rows_rejected = 0
+    self.reject_path = None
+    self.elapsed = 0.0
+
+  def rows_per_second(self):
+    if self.elapsed == 0:
+      return 0.0
+    return self.rows_inserted / self.elapsed
+
+  def as_dict(self):
+    return {
+        "path": self.path,
+        "table": self.table,
+        "rows_read": self.rows_read,
+        "rows_inserted": self.rows_inserted,
+        "rows_rejected": self.rows_rejected,
+        "reject_path": self.reject_path,
+        "elapsed_seconds": round(self.elapsed, 3),
+        "rows_per_second": round(self.rows_per_second(), 1),
+    }
+
+  def __str__(self):
+    text = f"Rows read: {self.rows_read}\n"\
+        + f"Rows inserted into {self.table}: {self.rows_inserted}\n"\
+        + f"Rows rejected: {self.rows_rejected}\n"\
+        + f"Elapsed: {self.elapsed:.2f}s ({self.rows_per_second():.0f} rows/s)"
+    if self.rows_rejected > 0:
+      text += f"\nRejected rows were written to {self.reject_path}"
+    return text
+
+
+# --------------------------------------------------------------
+class FileImporter:
+  '''
+  Streams records from a CSV or JSON-lines file into one table using its
+  INSERT statement. Records are read with generators, inserted with chunked
+  executemany calls inside transactions of a fixed size, and rows that cannot
+  be inserted are written to a reject file instead of aborting the import.
+  '''
+
+  # pragmas used for the duration of the load, restored afterwards
+  load_pragmas = {
+      "synchronous": "OFF",
+      "journal_mode": "MEMORY",
+      "cache_size": -64000,
+      "temp_store": "MEMORY",
+  }
+
+  def __init__(self,
+               conn,
+               table,
+               insert_sql,
+               columns,
+               chunk_size=5000,
+               transaction_size=100000,
+               validate=None,
+               validate_batch=None):
+    self.conn = conn
+    self.table = table
+    self.insert_sql = insert_sql
+    self.columns = tuple(columns)
+    self.chunk_size = chunk_size
+    self.transaction_size = transaction_size
+    # optional function(record tuple) that raises ValueError for invalid records
+    self.validate = validate
+    # optional function(list of record tuples) returning one tuple of error
+    # codes per record (e.g. validation.BatchValidator.validate)
+    self.validate_batch = validate_batch
+    self.rejects = None
+    self.report = None
+
+  # ---- readers: generators of (line number, raw record)
+  def read_csv(self, path):
+    '''
+    Yield the records of a CSV file; a header row with the column names is skipped
+    '''
+    with open(path, newline="", encoding="utf-8") as f:
+      for line_no, record in enumerate(csv.reader(f), start=1):
+        if line_no == 1 and tuple(record) == self.columns:
+          continue
+        yield line_no, record
+
+  def read_jsonl(self, path):
+    '''
+    Yield the records of a JSON-lines file: either objects keyed by column name,
+    or lists with the values in column order
+    '''
+    with open(path, encoding="utf-8") as f:
+      for line_no, line in enumerate(f, start=1):
+        line = line.strip()
+        if line == "":
+          continue
+        try:
+          record = json.loads(line)
+        except ValueError:
+          # passed on as-is so that it ends up in the reject file
+          record = line
+        if isinstance(record, dict):
+          record = [record.get(column) for column in self.columns]
+        yield line_no, record
+
+  def read_records(self, path):
+    '''
+    Pick a reader from the file extension
+    '''
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+      return self.read_csv(path)
+    if extension in (".jsonl", ".ndjson", ".json"):
+      return self.read_jsonl(path)
+    raise ValueError(
+        "Unsupported file type. Please use a .csv or .jsonl file.")
+
+  # ---- validation and rejects
+  def check_record(self, record):
+    '''
+    Return the record as a parameter tuple, or raise ValueError if it cannot be inserted
+    '''
+    if not isinstance(record, (list, tuple)):
+      raise ValueError("Record could not be parsed.")
+    if len(record) != len(self.columns):
+      raise ValueError(
+          f"Expected {len(self.columns)} values, found {len(record)}.")
+    for column, value in zip(self.columns, record):
+      if value is None or str(value).strip() == "":
+        raise ValueError(f"Missing value for {column}.")
+    record = tuple(record)
+    if self.validate is not None:
+      self.validate(record)
+    return record
+
+  def reject(self, line_no, record, error, codes=None):
+    '''
+    Write a rejected record to the reject file
+    '''
+    self.report.rows_rejected += 1
+    if self.rejects is None:
+      self.rejects = open(self.report.reject_path, "w", encoding="utf-8")
+    rejected = {"line": line_no, "error": str(error), "record": record}
+    if codes:
+      rejected["codes"] = list(codes)
+    self.rejects.write(json.dumps(rejected, default=str) + "\n")
+
+  def validate_chunk(self, chunk):
+    '''
+    Run the batch validator over a chunk; returns the valid (line number, row) pairs
+    '''
+    if self.validate_batch is None:
+      return chunk
+    valid = []
+    for (line_no, row), codes in zip(chunk,
+                                     self.validate_batch([r for _, r in chunk])):
+      if codes:
+        self.reject(line_no, row, validation.describe(codes), codes)
+      else:
+        valid.append((line_no, row))
+    return valid
+
+  def chunks(self, records):
+    '''
+    Group the valid records into lists of at most chunk_size (line number, row) pairs
+    '''
+    chunk = []
+    for line_no, record in records:
+      self.report.rows_read += 1
+      try:
+        chunk.append((line_no, self.check_record(record)))
+      except ValueError as e:
+        self.reject(line_no, record, e)
+        continue
+      if len(chunk) == self.chunk_size:
+        chunk = self.validate_chunk(chunk)
+        if len(chunk) > 0:
+          yield chunk
+        chunk = []
+    chunk = self.validate_chunk(chunk)
+    if len(chunk) > 0:
+      yield chunk
+
+  # ---- loading
+  def insert_chunk(self, cur, chunk):
+    '''
+    Insert a chunk with one executemany. If any row fails, the chunk is rolled
+    back to its savepoint and inserted row by row so only the failing rows are rejected
+    '''
+    cur.execute("SAVEPOINT import_chunk")
+    try:
+      cur.executemany(self.insert_sql, [row for _, row in chunk])
+      cur.execute("RELEASE import_chunk")
+      return len(chunk)
+    except sqlite3.DatabaseError:
+      cur.execute("ROLLBACK TO import_chunk")
+      cur.execute("RELEASE import_chunk")
+
+    inserted = 0
+    for line_no, row in chunk:
+      try:
+        cur.execute(self.insert_sql, row)
+        inserted += 1
+      except sqlite3.DatabaseError as e:
+        self.reject(line_no, row, e)
+    return inserted
+
+  def apply_load_pragmas(self):
+    '''
+    Switch to the load pragmas; returns the previous values
+    '''
+    previous = dict()
+    for name, value in self.load_pragmas.items():
+      previous[name] = self.conn.execute(f"PRAGMA {name}").fetchone()[0]
+      if name == "journal_mode" and str(previous[name]).lower() == "wal":
+        # keep WAL: readers may be using the database during the load
+        continue
+      self.conn.execute(f"PRAGMA {name} = {value}")
+    return previous
+
+  def restore_pragmas(self, previous):
+    for name, value in previous.items():
+      self.conn.execute(f"PRAGMA {name} = {value}")
+
+  def import_records(self, records, source="", reject_path=None):
+    '''
+    Load an iterable of (line number, record) pairs and return an ImportReport
+    '''
+    self.report = ImportReport(source, self.table)
+    self.report.reject_path = reject_path or (source or self.table) + ".rejects.jsonl"
+    if self.conn.in_transaction:
+      self.conn.commit()
+
+    previous = self.apply_load_pragmas()
+    start = time.perf_counter()
+    cur = self.conn.cursor()
+    try:
+      in_transaction = 0
+      for chunk in self.chunks(records):
+        if in_transaction == 0:
+          cur.execute("BEGIN")
+        inserted = self.insert_chunk(cur, chunk)
+        self.report.rows_inserted += inserted
+        in_transaction += len(chunk)
+        if in_transaction >= self.transaction_size:
+          self.conn.commit()
+          in_transaction = 0
+      self.conn.commit()
+    except Exception:
+      self.conn.rollback()
+      raise
+    finally:
+      self.report.elapsed = time.perf_counter() - start
+      if self.rejects is not None:
+        self.rejects.close()
+        self.rejects = None
+      self.restore_pragmas(previous)
+
+    return self.report
+
+  def import_file(self, path, reject_path=None):
+    '''
+    Load a CSV or JSON-lines file and return an ImportReport
+    '''
+    return self.import_records(self.read_records(path),
+                               source=path,
+                               reject_path=reject_path)
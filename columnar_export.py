@@ -0,0 +1,321 @@
+'''
+Columnar export of AirDB tables. A table is streamed from the database into
+typed column arrays (array module buffers, no list of row tuples is kept)
+and written to one binary file that ColumnarTable memory-maps back without
+parsing anything but a small JSON header.
+
+File layout (all buffers start on an 8-byte boundary):
+
+  b"AIRCOL01"                 magic
+  uint64 (little-endian)      length of the JSON header
+  JSON header                 table, rows, byte order, column descriptions
+  column buffers
+
+Column types:
+  int64, float64   one value buffer ("values")
+  text             UTF-8 "data" plus int64 "offsets" (rows + 1 entries);
+                   used for key columns, whose values are all different
+  dict             int32 "codes" into a dictionary stored as text
+                   ("dict_data", "dict_offsets"); used for the other text
+                   columns, which repeat a few values (Status, Origin, ...)
+
+NumPy is optional: ColumnarTable.numpy(name) returns zero-copy arrays when it
+is installed.
+'''
+import array
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+MAGIC = b"AIRCOL01"
+ALIGNMENT = 8
+
+
+def padding(size):
+  return -size % ALIGNMENT
+
+
+# --------------------------------------------------------------
+class ColumnBuilder:
+  '''
+  Accumulates the values of one column into typed buffers
+  '''
+
+  def __init__(self, name, declared_type, is_key=False):
+    self.name = name
+    declared_type = (declared_type or "").upper()
+    if "INT" in declared_type:
+      self.type = "int64"
+      self.values = array.array("q")
+    elif any(t in declared_type for t in ("REAL", "FLOA", "DOUB")):
+      self.type = "float64"
+      self.values = array.array("d")
+    elif is_key:
+      self.type = "text"
+      self.data = bytearray()
+      self.offsets = array.array("q", [0])
+    else:
+      self.type = "dict"
+      self.codes = array.array("i")
+      self.dictionary = dict()
+
+  def extend(self, values):
+    if self.type == "int64":
+      try:
+        self.values.extend(values)
+      except TypeError:
+        raise ValueError(f"Column {self.name} holds non-integer values.")
+    elif self.type == "float64":
+      self.values.extend(float(value) for value in values)
+    elif self.type == "text":
+      data, offsets = self.data, self.offsets
+      for value in values:
+        data += str(value).encode("utf-8")
+        offsets.append(len(data))
+    else:
+      dictionary = self.dictionary
+      self.codes.extend(
+          dictionary.setdefault(value, len(dictionary)) for value in values)
+
+  def buffers(self):
+    '''
+    (buffer name, bytes-like) pairs to be written
+    '''
+    if self.type in ("int64", "float64"):
+      return [("values", self.values)]
+    if self.type == "text":
+      return [("offsets", self.offsets), ("data", self.data)]
+    dict_data = bytearray()
+    dict_offsets = array.array("q", [0])
+    for value in self.dictionary:
+      dict_data += str(value).encode("utf-8")
+      dict_offsets.append(len(dict_data))
+    return [("codes", self.codes), ("dict_offsets", dict_offsets),
+            ("dict_data", dict_data)]
+
+
+def export_table(cursor, table, path, key_column=None, chunk_size=10000):
+  '''
+  Stream a table into a columnar file; returns its header
+  '''
+  info = cursor.execute("SELECT name, type FROM pragma_table_info(?)",
+                        (table, )).fetchall()
+  if len(info) == 0:
+    raise ValueError(f"Table {table} does not exist at the moment.")
+  builders = [
+      ColumnBuilder(name, declared_type, is_key=name == key_column)
+      for name, declared_type in info
+  ]
+
+  cursor.execute(f"SELECT {', '.join(name for name, _ in info)} FROM {table}")
+  rows = 0
+  while True:
+    chunk = cursor.fetchmany(chunk_size)
+    if len(chunk) == 0:
+      break
+    rows += len(chunk)
+    # one pass per column over the chunk
+    for builder, values in zip(builders, zip(*chunk)):
+      builder.extend(values)
+
+  header = {
+      "table": table,
+      "rows": rows,
+      "byteorder": sys.byteorder,
+      "exported_at": datetime.datetime.now().isoformat(timespec="seconds"),
+      "columns": [],
+  }
+  pending = []
+  offset = 0
+  for builder in builders:
+    column = {"name": builder.name, "type": builder.type, "buffers": {}}
+    for buffer_name, buffer in builder.buffers():
+      size = len(memoryview(buffer).cast("B"))
+      column["buffers"][buffer_name] = [offset, size]
+      pending.append(buffer)
+      offset += size + padding(size)
+    header["columns"].append(column)
+
+  encoded = json.dumps(header).encode("utf-8")
+  encoded += b" " * padding(len(MAGIC) + 8 + len(encoded))
+  tmp_path = path + ".tmp"
+  with open(tmp_path, "wb") as f:
+    f.write(MAGIC)
+    f.write(struct.pack("<Q", len(encoded)))
+    f.write(encoded)
+    for buffer in pending:
+      f.write(buffer)
+      f.write(b"\0" * padding(len(memoryview(buffer).cast("B"))))
+  # replace any earlier export only once the new file is complete
+  os.replace(tmp_path, path)
+  return header
+
+
+def export_tables(conn, out_dir, tables, key_columns=None):
+  '''
+  Export several tables from one snapshot of the database (a single read
+  transaction); returns {table: path}
+  '''
+  key_columns = key_columns or {}
+  os.makedirs(out_dir, exist_ok=True)
+  paths = dict()
+  in_transaction = conn.in_transaction
+  if not in_transaction:
+    conn.execute("BEGIN")
+  try:
+    cursor = conn.cursor()
+    for table in tables:
+      path = os.path.join(out_dir, table + ".col")
+      export_table(cursor, table, path, key_columns.get(table))
+      paths[table] = path
+  finally:
+    if not in_transaction:
+      conn.rollback()
+  return paths
+
+
+# --------------------------------------------------------------
+class TextColumn:
+  '''
+  Read-only view of a text or dictionary-encoded column of a mapped file.
+  For dict columns, codes (int32 memoryview) and dictionary (list of
+  strings) can be used directly, e.g. collections.Counter(column.codes)
+  '''
+
+  def __init__(self, rows, buffers):
+    self.rows = rows
+    if "codes" in buffers:
+      self.codes = buffers["codes"]
+      self.dictionary = decode_strings(buffers["dict_offsets"],
+                                       buffers["dict_data"])
+    else:
+      self.codes = None
+      self.offsets = buffers["offsets"]
+      self.data = buffers["data"]
+
+  def __len__(self):
+    return self.rows
+
+  def __getitem__(self, i):
+    if i < 0:
+      i += self.rows
+    if not 0 <= i < self.rows:
+      raise IndexError("column index out of range")
+    if self.codes is not None:
+      return self.dictionary[self.codes[i]]
+    return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+  def __iter__(self):
+    if self.codes is not None:
+      dictionary = self.dictionary
+      return (dictionary[code] for code in self.codes)
+    return (self[i] for i in range(self.rows))
+
+
+def decode_strings(offsets, data):
+  return [
+      str(data[offsets[i]:offsets[i + 1]], "utf-8")
+      for i in range(len(offsets) - 1)
+  ]
+
+
+# --------------------------------------------------------------
+class ColumnarTable:
+  '''
+  Memory-maps an exported table. Numeric columns come back as typed
+  memoryviews over the file, text columns as TextColumn
+  '''
+
+  # format of every buffer, for memoryview.cast
+  formats = {
+      "offsets": "q",
+      "data": "B",
+      "codes": "i",
+      "dict_offsets": "q",
+      "dict_data": "B",
+  }
+
+  def __init__(self, path):
+    # views handed out, released on close()
+    self.views = []
+    self.file = open(path, "rb")
+    self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+    self.view = memoryview(self.map)
+    if bytes(self.view[:len(MAGIC)]) != MAGIC:
+      self.close()
+      raise ValueError(f"{path} is not a columnar export.")
+    header_length = struct.unpack("<Q", self.view[8:16])[0]
+    self.header = json.loads(bytes(self.view[16:16 + header_length]))
+    if self.header["byteorder"] != sys.byteorder:
+      self.close()
+      raise ValueError(f"{path} was written on a machine with another byte order.")
+    self.data_start = 16 + header_length
+    self.rows = self.header["rows"]
+    self.columns = {column["name"]: column for column in self.header["columns"]}
+
+  def buffer(self, column, name, fmt="B"):
+    offset, size = column["buffers"][name]
+    start = self.data_start + offset
+    view = self.view[start:start + size]
+    typed = view.cast(fmt)
+    self.views.extend((typed, view))
+    return typed
+
+  def column(self, name):
+    '''
+    Typed memoryview (int64/float64 columns) or TextColumn
+    '''
+    column = self.columns.get(name)
+    if column is None:
+      raise ValueError(f"Column {name} is not available in {self.header['table']}.")
+    if column["type"] == "int64":
+      return self.buffer(column, "values", "q")
+    if column["type"] == "float64":
+      return self.buffer(column, "values", "d")
+    return TextColumn(
+        self.rows, {
+            name: self.buffer(column, name, self.formats[name])
+            for name in column["buffers"]
+        })
+
+  def numpy(self, name):
+    '''
+    Zero-copy NumPy array of a numeric column, or of the codes of a dict column
+    '''
+    if numpy is None:
+      raise ValueError("NumPy is not installed.")
+    column = self.columns[name]
+    if column["type"] == "int64":
+      return numpy.frombuffer(self.buffer(column, "values"), dtype=numpy.int64)
+    if column["type"] == "float64":
+      return numpy.frombuffer(self.buffer(column, "values"),
+                              dtype=numpy.float64)
+    if column["type"] == "dict":
+      return numpy.frombuffer(self.buffer(column, "codes"), dtype=numpy.int32)
+    raise ValueError(f"Column {name} has no numeric representation.")
+
+  def close(self):
+    for view in self.views:
+      view.release()
+    self.views = []
+    self.view.release()
+    try:
+      self.map.close()
+    except BufferError:
+      # NumPy arrays still use the mapping; it is unmapped once they are gone
+      pass
+    self.file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
@@ -0,0 +1,126 @@
+import contextlib
+import pathlib
+import sqlite3
+import threading
+import weakref
+
+from profiler import connect
+
+
+def enable_wal(conn):
+  '''
+  Switch the database to write-ahead logging: readers keep reading their
+  snapshot while a writer commits. The journal mode is stored in the database
+  file, so it stays on for every later connection. Returns the new mode
+  '''
+  mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+  if str(mode).lower() != "wal":
+    raise sqlite3.OperationalError(
+        f"Could not enable WAL mode (journal mode is {mode}).")
+  return mode
+
+
+# --------------------------------------------------------------
+class ThreadOwner:
+  '''
+  Stored in a thread-local: collected when its thread exits
+  '''
+
+
+# --------------------------------------------------------------
+class ReaderConnections:
+  '''
+  One read-only connection per thread. Connections are opened the first time
+  a thread reads, are only ever used by that thread, and are closed when the
+  thread exits
+  '''
+
+  pragmas = {
+      "cache_size": -8000,
+      "temp_store": "MEMORY",
+      "busy_timeout": 5000,
+  }
+
+  def __init__(self,
+               db_path,
+               cached_statements=256,
+               profiler=None,
+               on_close=None):
+    self.cached_statements = cached_statements
+    # the QueryProfiler of the pooled connections (None: not profiled)
+    self.profiler = profiler
+    # called with every connection closed (e.g. to drop what was recorded
+    # about it)
+    self.on_close = on_close
+    self.uri = pathlib.Path(db_path).absolute().as_uri() + "?mode=ro"
+    self.local = threading.local()
+    self.lock = threading.Lock()
+    self.opened = []
+    self.closed = False
+
+  def connection(self):
+    '''
+    Return the reader connection of the calling thread
+    '''
+    conn = getattr(self.local, "conn", None)
+    if conn is None:
+      if self.closed:
+        raise sqlite3.ProgrammingError("The reader connections have been closed.")
+      # closed from whichever thread calls close(), hence check_same_thread=False
+      conn = connect(self.uri,
+                     self.profiler,
+                     uri=True,
+                     check_same_thread=False,
+                     cached_statements=self.cached_statements)
+      for name, value in self.pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+      self.local.conn = conn
+      # the thread-local values are released when the thread exits, which
+      # closes its connection
+      self.local.owner = ThreadOwner()
+      weakref.finalize(self.local.owner, self.release, conn)
+      with self.lock:
+        self.opened.append(conn)
+    return conn
+
+  def release(self, conn):
+    '''
+    Close the connection of a thread that exited (unless close() did)
+    '''
+    with self.lock:
+      if conn not in self.opened:
+        return
+      self.opened.remove(conn)
+    self.close_connection(conn)
+
+  def close_connection(self, conn):
+    try:
+      conn.close()
+    except sqlite3.Error:
+      pass
+    if self.on_close is not None:
+      self.on_close(conn)
+
+  @contextlib.contextmanager
+  def snapshot(self):
+    '''
+    Every query run by the calling thread inside the block reads the same
+    snapshot of the database, whatever is committed in the meantime
+    '''
+    conn = self.connection()
+    if conn.in_transaction:
+      # nested: already reading a snapshot
+      yield conn.cursor()
+      return
+    conn.execute("BEGIN")
+    try:
+      yield conn.cursor()
+    finally:
+      conn.rollback()
+
+  def close(self):
+    self.closed = True
+    with self.lock:
+      opened, self.opened = self.opened, []
+    for conn in opened:
+      self.close_connection(conn)
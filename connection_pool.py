@@ -0,0 +1,172 @@
+import queue
+import sqlite3
+import threading
+import time
+
+from profiler import connect
+
+
+# --------------------------------------------------------------
+class ConnectionPool:
+  '''
+  Keeps a small number of long-lived sqlite3 connections to the database.
+  Operations borrow a connection with acquire() and hand it back with release()
+  instead of opening (and closing) a new connection every time.
+  '''
+
+  # pragmas applied once, when a connection is first opened
+  default_pragmas = {
+      "cache_size": -8000,  # negative value = size in KiB
+      "temp_store": "MEMORY",
+      "busy_timeout": 5000,
+  }
+
+  # prepared statements kept per connection (sqlite3's LRU, keyed by SQL text)
+  cached_statements = 256
+
+  # connections idle for longer than this are pinged before being handed out
+  health_check_after = 30.0
+
+  def __init__(self,
+               db_path,
+               max_size=4,
+               timeout=10.0,
+               pragmas=None,
+               profiler=None,
+               on_close=None):
+    self.db_path = db_path
+    # QueryProfiler timing every statement of the pooled connections
+    self.profiler = profiler
+    # called with every connection the pool closes (e.g. to drop what was
+    # recorded about it)
+    self.on_close = on_close
+    self.max_size = max_size
+    self.timeout = timeout
+    self.pragmas = dict(self.default_pragmas)
+    if pragmas is not None:
+      self.pragmas.update(pragmas)
+
+    # idle connections, most recently used first
+    self.idle = queue.LifoQueue()
+    self.opened = 0
+    self.lock = threading.Lock()
+    self.last_used = dict()
+    # id(connection) -> serial number, unique for the lifetime of the pool
+    self.serials = dict()
+    self.next_serial = 0
+    self.closed = False
+
+  def open_connection(self):
+    '''
+    Open a new connection and configure it with the pool pragmas
+    '''
+    conn = connect(self.db_path,
+                   self.profiler,
+                   check_same_thread=False,
+                   cached_statements=self.cached_statements)
+    for name, value in self.pragmas.items():
+      conn.execute(f"PRAGMA {name} = {value}")
+    with self.lock:
+      self.next_serial += 1
+      self.serials[id(conn)] = self.next_serial
+    return conn
+
+  def serial(self, conn):
+    '''
+    Return the serial number of a pooled connection (ids of closed connections
+    can be reused by new ones, serial numbers are not)
+    '''
+    return self.serials.get(id(conn), 0)
+
+  def is_healthy(self, conn):
+    '''
+    Confirm that a pooled connection is still usable
+    '''
+    try:
+      conn.execute("SELECT 1").fetchone()
+      return True
+    except sqlite3.Error:
+      return False
+
+  def discard(self, conn):
+    '''
+    Close a connection and free its slot in the pool
+    '''
+    try:
+      conn.close()
+    except sqlite3.Error:
+      pass
+    with self.lock:
+      self.opened -= 1
+      self.last_used.pop(id(conn), None)
+      self.serials.pop(id(conn), None)
+    if self.on_close is not None:
+      self.on_close(conn)
+
+  def acquire(self):
+    '''
+    Borrow a connection: reuse an idle one, open a new one if the pool is not
+    full, or wait for one to be released
+    '''
+    if self.closed:
+      raise sqlite3.ProgrammingError("The connection pool has been closed.")
+
+    while True:
+      try:
+        conn = self.idle.get_nowait()
+      except queue.Empty:
+        conn = None
+
+      if conn is None:
+        with self.lock:
+          can_open = self.opened < self.max_size
+          if can_open:
+            self.opened += 1
+        if can_open:
+          try:
+            return self.open_connection()
+          except Exception:
+            with self.lock:
+              self.opened -= 1
+            raise
+        try:
+          conn = self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+          raise sqlite3.OperationalError(
+              f"No database connection became available within {self.timeout} seconds."
+          )
+
+      # only ping connections that have been idle for a while
+      idle_for = time.monotonic() - self.last_used.get(id(conn), 0.0)
+      if idle_for < self.health_check_after or self.is_healthy(conn):
+        return conn
+      self.discard(conn)
+
+  def release(self, conn):
+    '''
+    Return a borrowed connection to the pool
+    '''
+    if self.closed:
+      self.discard(conn)
+      return
+    try:
+      # never hand out a connection with a half-finished transaction
+      if conn.in_transaction:
+        conn.rollback()
+    except sqlite3.Error:
+      self.discard(conn)
+      return
+    self.last_used[id(conn)] = time.monotonic()
+    self.idle.put(conn)
+
+  def close(self):
+    '''
+    Close every idle connection and stop handing out new ones
+    '''
+    self.closed = True
+    while True:
+      try:
+        conn = self.idle.get_nowait()
+      except queue.Empty:
+        break
+      self.discard(conn)
@@ -0,0 +1,214 @@
+'''
+Deterministic generator of synthetic AirDB data (Pilots, Aircrafts, Flights
+and OperatedBy) at a configurable scale. The same seed always produces the
+same rows, and every row respects the rules enforced by the set_* validators.
+
+Usage: python data_generator.py --flights 10000 --out feeds/
+       (writes one CSV file per table, ready for menu option 17)
+'''
+import argparse
+import csv
+import datetime
+import os
+import random
+
+from bulk_import import FileImporter
+
+FIRST_NAMES = [
+    "Adam", "James", "William", "Christina", "Edward", "Silvie", "John",
+    "Maria", "Elena", "George", "Sofia", "Nikos", "Anna", "Peter", "Laura",
+    "Omar", "Yuki", "Carlos", "Ingrid", "Priya"
+]
+LAST_NAMES = [
+    "Jones", "Black", "Spencer", "Gloves", "Vladic", "Koolash", "Porter",
+    "Papadopoulos", "Rossi", "Tanaka", "Garcia", "Smith", "Novak", "Dubois",
+    "Schmidt", "Haddad", "Kowalski", "Silva", "Larsen", "Patel"
+]
+SCHOOLS = [
+    "Air Grand", "Apple Air", "Clearview", "Skyline Academy", "Blue Wings",
+    "Northern Aviation"
+]
+AIRCRAFT_MODELS = [
+    ("Boeing", "747", 400, 10),
+    ("Boeing", "737", 180, 6),
+    ("Airbus", "320", 120, 6),
+    ("Airbus", "380", 500, 10),
+    ("Embraer", "E190", 100, 4),
+    ("Bombardier", "CRJ900", 76, 3),
+]
+AIRPORTS = [
+    "Heathrow Airport", "Charles de Gaulle Airport",
+    "Athens International Airport", "Leonardo da Vinci–Fiumicino Airport",
+    "Los Angeles International Airport", "Haneda Airport",
+    "Frankfurt Airport", "Amsterdam Airport Schiphol",
+    "Dubai International Airport", "Singapore Changi Airport",
+    "John F. Kennedy International Airport", "Madrid–Barajas Airport"
+]
+STATUSES = ["Cancelled", "Landed", "Delayed", "Scheduled"]
+
+# named scales (number of flights)
+SCALES = {"10k": 10000, "1m": 1000000, "10m": 10000000}
+
+
+# --------------------------------------------------------------
+class DataGenerator:
+  '''
+  Produces valid rows for every AirDB table. Pilot and aircraft counts are
+  derived from the number of flights
+  '''
+
+  def __init__(self,
+               flights,
+               seed=42,
+               reference_date=datetime.date(2024, 6, 1),
+               first_departure=datetime.date(2024, 1, 1),
+               departure_days=730):
+    self.flights = flights
+    self.pilots = max(10, flights // 50)
+    self.aircrafts = max(5, flights // 200)
+    self.seed = seed
+    self.reference_date = reference_date
+    self.first_departure = first_departure
+    self.departure_days = departure_days
+
+  # ---- ids
+  def pilot_id(self, i):
+    return f"P{i:07d}"
+
+  def aircraft_id(self, i):
+    return f"A{i:06d}"
+
+  def flight_id(self, i):
+    return f"F{i:08d}"
+
+  # ---- tables
+  def pilots_rows(self):
+    '''
+    Pilots aged 25 to 60 on the reference date, who turned professional at 18
+    or later (so the rows stay valid for years after the reference date)
+    '''
+    rng = random.Random(f"{self.seed}-pilots")
+    for i in range(1, self.pilots + 1):
+      age_days = rng.randint(25 * 366, 60 * 365)
+      birth = self.reference_date - datetime.timedelta(days=age_days)
+      pro_after_days = rng.randint(19 * 366, age_days - 366)
+      prof_since = birth + datetime.timedelta(days=pro_after_days)
+      yield (self.pilot_id(i), rng.choice(FIRST_NAMES),
+             rng.choice(LAST_NAMES), rng.choice(SCHOOLS), birth.isoformat(),
+             prof_since.isoformat())
+
+  def aircrafts_rows(self):
+    rng = random.Random(f"{self.seed}-aircrafts")
+    for i in range(1, self.aircrafts + 1):
+      manufacturer, model, max_passengers, crew = rng.choice(AIRCRAFT_MODELS)
+      yield (self.aircraft_id(i), manufacturer, model, max_passengers, crew)
+
+  def flights_rows(self):
+    '''
+    Flights on random days, where an aircraft flies at most one flight per
+    day that is not cancelled: a flight drawn on a day its aircraft is
+    already booked moves to the next free day of that aircraft (or is
+    cancelled when the aircraft has none left)
+    '''
+    rng = random.Random(f"{self.seed}-flights")
+    # one byte per (aircraft, day) slot
+    booked = bytearray(self.aircrafts * self.departure_days)
+    for i in range(1, self.flights + 1):
+      origin, destination = rng.sample(AIRPORTS, 2)
+      day = rng.randrange(self.departure_days)
+      status = rng.choice(STATUSES)
+      aircraft = rng.randint(1, self.aircrafts)
+      if status != "Cancelled":
+        slots = (aircraft - 1) * self.departure_days
+        for offset in range(self.departure_days):
+          slot = slots + (day + offset) % self.departure_days
+          if not booked[slot]:
+            booked[slot] = 1
+            day = (day + offset) % self.departure_days
+            break
+        else:
+          status = "Cancelled"
+      departure = self.first_departure + datetime.timedelta(days=day)
+      yield (self.flight_id(i), origin, destination, departure.isoformat(),
+             status, self.aircraft_id(aircraft))
+
+  def operated_by_rows(self):
+    '''
+    One to three distinct pilots per flight
+    '''
+    rng = random.Random(f"{self.seed}-operated-by")
+    for i in range(1, self.flights + 1):
+      crew = rng.sample(range(1, self.pilots + 1), rng.randint(1, 3))
+      for pilot in crew:
+        yield (self.flight_id(i), self.pilot_id(pilot))
+
+  def tables(self):
+    '''
+    (table name, rows generator) pairs, in an order that respects the references
+    '''
+    return [
+        ("Pilots", self.pilots_rows()),
+        ("Aircrafts", self.aircrafts_rows()),
+        ("Flights", self.flights_rows()),
+        ("OperatedBy", self.operated_by_rows()),
+    ]
+
+  # ---- output
+  def populate(self, conn):
+    '''
+    Insert every generated row into existing tables; returns the ImportReports
+    '''
+    reports = []
+    for table, rows in self.tables():
+      columns = [
+          i[0] for i in conn.execute("SELECT name FROM pragma_table_info(?)", (
+              table, )).fetchall()
+      ]
+      insert_sql = f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})"
+      importer = FileImporter(conn, table, insert_sql, columns)
+      reports.append(
+          importer.import_records(enumerate(rows, start=1), source=table))
+    return reports
+
+  def write_csv(self, out_dir):
+    '''
+    Write one CSV file (with a header row) per table; returns the file paths
+    '''
+    os.makedirs(out_dir, exist_ok=True)
+    headers = {
+        "Pilots": ("PilotID", "FirstName", "LastName", "School", "BirthDate",
+                   "ProfSince"),
+        "Aircrafts":
+        ("AircraftID", "Manufacturer", "Model", "MaxPassengers", "CrewSize"),
+        "Flights": ("FlightID", "Origin", "Destination", "Departure", "Status",
+                    "AircraftID"),
+        "OperatedBy": ("FlightID", "PilotID"),
+    }
+    paths = []
+    for table, rows in self.tables():
+      path = os.path.join(out_dir, table + ".csv")
+      with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers[table])
+        writer.writerows(rows)
+      paths.append(path)
+    return paths
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--flights",
+                      default="10k",
+                      help="number of flights, or one of: " +
+                      ", ".join(SCALES))
+  parser.add_argument("--seed", type=int, default=42)
+  parser.add_argument("--out", default="feeds")
+  args = parser.parse_args()
+
+  flights = SCALES.get(args.flights.lower()) or int(args.flights)
+  for path in DataGenerator(flights, seed=args.seed).write_csv(args.out):
+    print("Written", path)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,69 @@
+# --------------------------------------------------------------
+class KeyLookup:
+  '''
+  Existence checks for key values (e.g. "is this PilotID already used?").
+  Each check is a single point lookup served by the PK index or by one of the
+  secondary indexes of DBOperations.indexes_dict, instead of a scan of the
+  whole key column. An optional in-process cache keeps the key sets in memory
+  and is kept up to date by the insert/delete paths.
+  '''
+
+  # (table, column) pairs whose values are unique, so a delete removes the key
+  unique_keys = {
+      ("Pilots", "PilotID"),
+      ("Aircrafts", "AircraftID"),
+      ("Flights", "FlightID"),
+  }
+
+  def __init__(self, use_cache=False):
+    self.use_cache = use_cache
+    # (table, column) -> set of key values
+    self.cache = dict()
+
+  def exists(self, cursor, table, column, value):
+    '''
+    Return True if the value is found in the table column
+    '''
+    if self.use_cache:
+      key = (table, column)
+      if key not in self.cache:
+        self.cache[key] = {
+            row[0]
+            for row in cursor.execute(f"SELECT {column} FROM {table}")
+        }
+      return value in self.cache[key]
+
+    row = cursor.execute(f"SELECT 1 FROM {table} WHERE {column} = ? LIMIT 1",
+                         (value, )).fetchone()
+    return row is not None
+
+  # ---- cache maintenance (no-ops while the cache is not loaded)
+  def record_insert(self, table, column, value):
+    '''
+    Add a newly inserted key to the cache
+    '''
+    if (table, column) in self.cache:
+      self.cache[(table, column)].add(value)
+
+  def record_delete(self, table, column, value):
+    '''
+    Remove a deleted key from the cache
+    '''
+    key = (table, column)
+    if key not in self.cache:
+      return
+    if key in self.unique_keys:
+      self.cache[key].discard(value)
+    else:
+      # other rows may still hold the same value: reload on next use
+      del self.cache[key]
+
+  def invalidate(self, table=None):
+    '''
+    Drop the cached keys of one table (or of every table)
+    '''
+    if table is None:
+      self.cache = dict()
+    else:
+      for key in [k for k in self.cache if k[0] == table]:
+        del self.cache[key]
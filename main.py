@@ -1,5 +1,34 @@
-import sqlite3
+import argparse
+import atexit
+import concurrent.futures
 import datetime
+import itertools
+import json
+import os
+import shlex
+import sqlite3
+import sys
+
+from archive import FlightArchive, archive_path_of, totals_queries
+from bulk_import import FileImporter
+from columnar_export import export_tables
+from parallel_stats import ParallelSummary, partial_queries
+from profiler import QueryProfiler
+from records import (AircraftRecord, FlightRecord, OperatedByRecord,
+                     PilotRecord, from_rows)
+from concurrent_access import ReaderConnections, enable_wal
+from connection_pool import ConnectionPool
+from key_lookup import KeyLookup
+from metrics import (Metrics, measured, observe_error, observe_rows,
+                     wait_for_input)
+from renderer import FORMATS, TableRenderer, make_renderer
+from sharding import SHARDED_TABLES, ShardedFlights, is_sharded, sharded_flight_ids
+from text_search import TEXT_INDEXES
+import query_builder
+from result_cache import CachedResult, ResultCache
+from socket_server import serve
+from statement_registry import StatementRegistry
+import validation
 
 
 # --------------------------------------------------------------
@@ -136,6 +165,29 @@ class DBOperations:
       OPERATED_BY: sql_create_operated_by_table
   }
 
+  # secondary indexes for each table: index name -> (table, indexed columns)
+  # they are created at startup and every time their table is created
+  indexes_dict = {
+      # point lookups by FlightID and the OperatedBy join (covers Status and
+      # the Departure bounds of the pilot roster)
+      "idx_flights_flightid_departure":
+      (FLIGHTS, ("FlightID", "Departure", "Status")),
+      # grouping by Status, and the Aircrafts join by status (covering)
+      "idx_flights_status": (FLIGHTS, ("Status", "AircraftID")),
+      # flights of an aircraft, and the (AircraftID, Departure) slots checked
+      # for double bookings (covering the check and the report)
+      "idx_flights_aircraft_departure":
+      (FLIGHTS, ("AircraftID", "Departure", "Status", "FlightID")),
+      # Departure ranges, covering the parallel summary statistics
+      "idx_flights_departure_covering":
+      (FLIGHTS, ("Departure", "Status", "AircraftID", "FlightID")),
+      # flights of a pilot, read from the index alone
+      "idx_operatedby_pilotid_flightid": (OPERATED_BY, ("PilotID", "FlightID")),
+  }
+  # default indexes replaced by the ones above, dropped at startup
+  obsolete_indexes = ("idx_flights_flightid", "idx_flights_departure",
+                      "idx_operatedby_pilotid", "idx_flights_aircraftid")
+
   # store PK for each table
   prim_key_tables_dict = {
       PILOTS: "PilotID",
@@ -164,9 +216,24 @@ class DBOperations:
                               VALUES (?, ?)
                         """
 
+  # store insert statements for direct reference
+  insert_tables_dict = {
+      PILOTS: sql_insert_pilots,
+      AIRCRAFTS: sql_insert_aircrafts,
+      FLIGHTS: sql_insert_flights,
+      OPERATED_BY: sql_insert_operated_by
+  }
+
   # ------ Generic select all statement: the execute function call adds the table name
   sql_select_all = "SELECT * FROM "
 
+  # ------ Keyset pagination: one page of rows after the last rowid already shown
+  sql_select_page = """SELECT rowid, * FROM {table} WHERE rowid > ? {where}
+                       ORDER BY rowid LIMIT ?"""
+
+  # number of rows fetched and printed at a time
+  page_size = 50
+
   # ------ search statement
   sql_search_flights_data = """SELECT * FROM Flights WHERE FlightID = ?"""
   sql_search_pilots_data = """SELECT * FROM Pilots WHERE FlightID = ?"""
@@ -189,16 +256,256 @@ class DBOperations:
   sql_delete_aircrafts_data = """  DELETE FROM Aircrafts WHERE AircraftID = ? """
   sql_delete_operatedby_data = """  DELETE FROM OperatedBy WHERE FlightID = ? AND PilotID = ?"""
 
+  # store update and delete statements for direct reference
+  update_tables_dict = {
+      PILOTS: sql_update_pilots_data,
+      AIRCRAFTS: sql_update_aircrafts_data,
+      FLIGHTS: sql_update_flights_data
+  }
+
+  delete_tables_dict = {
+      PILOTS: sql_delete_pilots_data,
+      AIRCRAFTS: sql_delete_aircrafts_data,
+      FLIGHTS: sql_delete_flights_data,
+      OPERATED_BY: sql_delete_operatedby_data
+  }
+
   # ------ Drop statements: the execute function call adds the table name
   sql_drop_table_query = "DROP TABLE IF EXISTS "
 
   # ------ Select table names
-  sql_get_table_names_query = """SELECT name FROM sqlite_master WHERE type='table';"""
+  # (helper tables such as the materialized summaries are not listed)
+  sql_get_table_names_query = """SELECT name FROM sqlite_master WHERE type='table'
+                                 AND name IN ('Pilots', 'Aircrafts', 'Flights', 'OperatedBy');"""
+
+  # ------ Summary statistics (menu options 12 to 15)
+  sql_summary_q1 = '''SELECT Status, COUNT(Status) AS 'Number of Flights'
+         FROM Flights 
+         GROUP BY Status
+         ORDER BY COUNT(Status) DESC
+         '''
+  sql_summary_q2 = '''SELECT Status, ROUND(SUM(MaxPassengers),1) AS 'Total Passengers Capacity'
+         FROM Aircrafts, Flights
+         WHERE Flights.AircraftID = Aircrafts.AircraftID 
+         GROUP BY Status
+         ORDER BY ROUND(SUM(MaxPassengers),1) DESC
+         '''
+  sql_summary_q3 = '''SELECT PilotID,
+                LastName || ' ' || FirstName AS Name,
+                ROUND((julianday('now') - julianday(ProfSince ))/365,1) AS ProfExperienceYears
+         FROM Pilots
+         ORDER BY ProfExperienceYears DESC
+         '''
+  sql_summary_q4 = '''SELECT Pilots.PilotID, Status, COUNT(Flights.FlightID) AS "Number of Flights"
+          FROM Flights, Pilots, OperatedBy
+          WHERE Flights.FlightID = OperatedBy.FlightID
+            AND Pilots.PilotID = OperatedBy.PilotID
+          GROUP BY Pilots.PilotID, Status
+
+       '''
+  summary_queries = {
+      1: sql_summary_q1,
+      2: sql_summary_q2,
+      3: sql_summary_q3,
+      4: sql_summary_q4
+  }
 
-  def __init__(self):
+  # ------ Pilot roster: the flights of a pilot between two dates (inclusive),
+  # with their aircraft. OperatedBy is read from idx_operatedby_pilotid_flightid
+  # and the dates are checked in idx_flights_flightid_departure, so only the
+  # Flights rows in range are read
+  sql_pilot_roster = """SELECT Flights.FlightID, Departure, Origin, Destination, Status,
+                               Flights.AircraftID, Manufacturer, Model
+                          FROM OperatedBy
+                          JOIN Flights ON Flights.FlightID = OperatedBy.FlightID
+                          LEFT JOIN Aircrafts ON Aircrafts.AircraftID = Flights.AircraftID
+                         WHERE OperatedBy.PilotID = ? AND Departure BETWEEN ? AND ?
+                         ORDER BY Departure, Flights.FlightID"""
+  # bounds used when no date is given
+  roster_first_date = "0001-01-01"
+  roster_last_date = "9999-12-31"
+
+  # ------ Double bookings: flights sharing an aircraft on a Departure date
+  # (cancelled flights release their aircraft). The slots held more than once
+  # are found in one pass over idx_flights_aircraft_departure (grouped in
+  # index order, without sorting); only their flights are then read back
+  sql_double_bookings = """SELECT Flights.AircraftID, Flights.Departure, FlightID
+                             FROM (SELECT AircraftID, Departure FROM Flights
+                                    WHERE Status <> 'Cancelled'
+                                    GROUP BY AircraftID, Departure
+                                   HAVING COUNT(*) > 1) AS Slots
+                             JOIN Flights ON Flights.AircraftID = Slots.AircraftID
+                                         AND Flights.Departure = Slots.Departure
+                            WHERE Status <> 'Cancelled'
+                            ORDER BY Flights.AircraftID, Flights.Departure, FlightID"""
+
+  # ------ Materialized summary statistics: the flights count (q1) and the
+  # passengers capacity (q2) per status, kept up to date by triggers on
+  # Flights and Aircrafts so that options 12 and 13 read one row per status
+  SUMMARY = "FlightStatusSummary"
+
+  sql_create_summary_table = """CREATE TABLE IF NOT EXISTS FlightStatusSummary (
+                                  Status TEXT NOT NULL PRIMARY KEY,
+                                  NumFlights INTEGER NOT NULL,
+                                  AircraftFlights INTEGER NOT NULL,
+                                  PassengerCapacity INTEGER NOT NULL
+                                )"""
+
+  sql_rebuild_summary_table = """INSERT INTO FlightStatusSummary
+                                   (Status, NumFlights, AircraftFlights, PassengerCapacity)
+                                 SELECT Status, COUNT(*), COUNT(Aircrafts.AircraftID),
+                                        COALESCE(SUM(MaxPassengers), 0)
+                                   FROM Flights LEFT JOIN Aircrafts
+                                     ON Flights.AircraftID = Aircrafts.AircraftID
+                                  GROUP BY Status"""
+
+  sql_summary_materialized_q1 = '''SELECT Status, NumFlights AS 'Number of Flights'
+                                   FROM FlightStatusSummary
+                                  WHERE NumFlights > 0
+                                  ORDER BY NumFlights DESC
+                               '''
+  sql_summary_materialized_q2 = '''SELECT Status, ROUND(PassengerCapacity,1) AS 'Total Passengers Capacity'
+                                   FROM FlightStatusSummary
+                                  WHERE AircraftFlights > 0
+                                  ORDER BY PassengerCapacity DESC
+                               '''
+  materialized_summary_queries = {
+      1: sql_summary_materialized_q1,
+      2: sql_summary_materialized_q2
+  }
+
+  # the summary row changes of a flight being added or removed
+  sql_summary_add_flight = """
+      INSERT INTO FlightStatusSummary (Status, NumFlights, AircraftFlights, PassengerCapacity)
+      SELECT NEW.Status, 1, COUNT(MaxPassengers), COALESCE(SUM(MaxPassengers), 0)
+        FROM Aircrafts WHERE AircraftID = NEW.AircraftID
+      ON CONFLICT(Status) DO UPDATE SET
+        NumFlights = NumFlights + excluded.NumFlights,
+        AircraftFlights = AircraftFlights + excluded.AircraftFlights,
+        PassengerCapacity = PassengerCapacity + excluded.PassengerCapacity;"""
+  sql_summary_remove_flight = """
+      UPDATE FlightStatusSummary SET
+        NumFlights = NumFlights - 1,
+        AircraftFlights = AircraftFlights -
+          (SELECT COUNT(*) FROM Aircrafts WHERE AircraftID = OLD.AircraftID),
+        PassengerCapacity = PassengerCapacity -
+          (SELECT COALESCE(SUM(MaxPassengers), 0) FROM Aircrafts WHERE AircraftID = OLD.AircraftID)
+      WHERE Status = OLD.Status;"""
+  # ... and of an aircraft being added or removed (for the flights assigned to it)
+  sql_summary_add_aircraft = """
+      UPDATE FlightStatusSummary SET
+        AircraftFlights = AircraftFlights +
+          (SELECT COUNT(*) FROM Flights WHERE Flights.Status = FlightStatusSummary.Status
+                                          AND Flights.AircraftID = NEW.AircraftID),
+        PassengerCapacity = PassengerCapacity + NEW.MaxPassengers *
+          (SELECT COUNT(*) FROM Flights WHERE Flights.Status = FlightStatusSummary.Status
+                                          AND Flights.AircraftID = NEW.AircraftID);"""
+  sql_summary_remove_aircraft = """
+      UPDATE FlightStatusSummary SET
+        AircraftFlights = AircraftFlights -
+          (SELECT COUNT(*) FROM Flights WHERE Flights.Status = FlightStatusSummary.Status
+                                          AND Flights.AircraftID = OLD.AircraftID),
+        PassengerCapacity = PassengerCapacity - OLD.MaxPassengers *
+          (SELECT COUNT(*) FROM Flights WHERE Flights.Status = FlightStatusSummary.Status
+                                          AND Flights.AircraftID = OLD.AircraftID);"""
+
+  summary_triggers_dict = {
+      "trg_flights_summary_insert":
+      "CREATE TRIGGER IF NOT EXISTS trg_flights_summary_insert AFTER INSERT ON Flights BEGIN"
+      + sql_summary_add_flight + " END",
+      "trg_flights_summary_delete":
+      "CREATE TRIGGER IF NOT EXISTS trg_flights_summary_delete AFTER DELETE ON Flights BEGIN"
+      + sql_summary_remove_flight + " END",
+      "trg_flights_summary_update":
+      "CREATE TRIGGER IF NOT EXISTS trg_flights_summary_update AFTER UPDATE OF Status, AircraftID ON Flights BEGIN"
+      + sql_summary_remove_flight + sql_summary_add_flight + " END",
+      "trg_aircrafts_summary_insert":
+      "CREATE TRIGGER IF NOT EXISTS trg_aircrafts_summary_insert AFTER INSERT ON Aircrafts BEGIN"
+      + sql_summary_add_aircraft + " END",
+      "trg_aircrafts_summary_delete":
+      "CREATE TRIGGER IF NOT EXISTS trg_aircrafts_summary_delete AFTER DELETE ON Aircrafts BEGIN"
+      + sql_summary_remove_aircraft + " END",
+      "trg_aircrafts_summary_update":
+      "CREATE TRIGGER IF NOT EXISTS trg_aircrafts_summary_update AFTER UPDATE OF AircraftID, MaxPassengers ON Aircrafts BEGIN"
+      + sql_summary_remove_aircraft + sql_summary_add_aircraft + " END",
+  }
+  sql_drop_trigger = "DROP TRIGGER IF EXISTS "
+  sql_count_triggers_query = "SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name IN ({names})"
+
+  # ------ Index statements
+  sql_create_index = "CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+  sql_drop_index = "DROP INDEX IF EXISTS "
+  sql_get_index_names_query = """SELECT name, tbl_name, sql FROM sqlite_master
+                                 WHERE type='index' ORDER BY tbl_name, name;"""
+  sql_get_table_columns_query = "SELECT name FROM pragma_table_info(?)"
+
+  # ------ Index catalog: the indexes added and dropped from the menu, kept in
+  # the database so that later sessions (and tables created again) follow them.
+  # A dropped default index is kept with Dropped = 1 so that it is not rebuilt
+  INDEX_CATALOG = "IndexCatalog"
+
+  sql_create_index_catalog = """CREATE TABLE IF NOT EXISTS IndexCatalog (
+                                  Name TEXT NOT NULL PRIMARY KEY,
+                                  TableName TEXT NOT NULL,
+                                  Columns TEXT NOT NULL,
+                                  Dropped INTEGER NOT NULL
+                                )"""
+  sql_get_index_catalog_query = "SELECT Name, TableName, Columns, Dropped FROM IndexCatalog"
+  sql_save_index_catalog = "INSERT OR REPLACE INTO IndexCatalog VALUES (?, ?, ?, ?)"
+  sql_delete_index_catalog = "DELETE FROM IndexCatalog WHERE Name = ?"
+
+  # ------ Planner statistics (ANALYZE reads at most about this many rows
+  # per index, so that it stays fast on large tables)
+  analysis_limit = 1000
+  sql_table_exists_query = "SELECT 1 FROM sqlite_master WHERE type='table' AND name = ?"
+  sql_analyzed_tables_query = "SELECT DISTINCT tbl FROM sqlite_stat1"
+
+  # queries that the secondary indexes are expected to serve (see verify_index_usage)
+  index_check_queries = {
+      "Number of flights by status": sql_summary_q1,
+      "Max passengers capacity by flight status": sql_summary_q2,
+      "Number of flights by pilot and flight status": sql_summary_q4,
+      "Flights by FlightID": "SELECT * FROM Flights WHERE FlightID = ?",
+      "Flights by Status": "SELECT * FROM Flights WHERE Status = ?",
+      "Flights by AircraftID": "SELECT * FROM Flights WHERE AircraftID = ?",
+      "Flights by Departure": "SELECT * FROM Flights WHERE Departure = ?",
+      "OperatedBy by PilotID": "SELECT * FROM OperatedBy WHERE PilotID = ?",
+      "Pilot roster": sql_pilot_roster,
+      "Aircraft double bookings": sql_double_bookings,
+  }
+
+  def __init__(self, db_path="AirDB.db", profiler=None, metrics=None):
+    # times every statement run on the pooled connections (off when None: see
+    # --profile)
+    self.profiler = profiler
+    # calls, errors, rows and latency of the menu operations
+    self.metrics = metrics if metrics is not None else Metrics()
+    # search queries built once per (table, column) from the real schema
+    self.statements = StatementRegistry(self.prim_key_tables_dict,
+                                        self.sql_select_page,
+                                        ConnectionPool.cached_statements)
+    # connections are borrowed from (and returned to) a long-lived pool
+    self.pool = ConnectionPool(db_path,
+                               profiler=self.profiler,
+                               on_close=self.statements.forget)
+    # index-backed existence checks shared with the *Info classes
+    self.lookup = KeyLookup()
+    # results of the summary statistics and searches, valid for one data version
+    self.cache = ResultCache()
+    # bumped by every insert, update, delete, drop and create
+    self.data_version = 0
+    # indexes added from the menu are kept next to the default ones (and the
+    # index catalog of the database is applied at startup)
+    self.indexes_dict = dict(self.indexes_dict)
+    # cold archive of completed flights, opened once it exists
+    self.archive_path = archive_path_of(db_path)
+    self.archive = None
+    if os.path.exists(self.archive_path):
+      self.open_archive()
+    self.conn = None
+    self.cur = None
     try:
-      self.conn = sqlite3.connect("AirDB.db")
-      self.cur = self.conn.cursor()
+      self.get_connection()
 
       # create tables if they do not exist
       # self.cur.execute(self.sql_drop_table_query + self.PILOTS)
@@ -211,22 +518,90 @@ class DBOperations:
       self.cur.execute(self.sql_create_flights_table_firsttime)
 
       # self.cur.execute(self.sql_drop_table_query + self.OPERATED_BY)
-      self.cur.execute(self.sql_create_operated_by_table)
+      self.cur.execute(self.sql_create_operated_by_table_firsttime)
+
+      self.conn.commit()
 
+      # secondary indexes
+      self.load_index_catalog()
+      self.create_indexes()
+      self.conn.commit()
+
+      # materialized summary statistics
+      self.refresh_summary_tables()
+      self.conn.commit()
+
+      # full-text indexes of the airport names and the pilots
+      self.refresh_text_indexes()
+      self.conn.commit()
+
+      # planner statistics, for the indexes chosen by the condition searches
+      self.refresh_statistics()
       self.conn.commit()
 
     except Exception as e:
       print(e)
     finally:
-      self.conn.close()
+      self.release_connection()
 
   def get_connection(self):
     '''
-    Establish a connection to the database
+    Borrow a connection from the pool (the one already held is reused)
     '''
-    self.conn = sqlite3.connect("AirDB.db")
+    if self.conn is None:
+      self.conn = self.pool.acquire()
     self.cur = self.conn.cursor()
 
+  def release_connection(self):
+    '''
+    Return the borrowed connection to the pool
+    '''
+    if self.conn is not None:
+      self.pool.release(self.conn)
+    self.conn = None
+    self.cur = None
+
+  def is_sharded(self):
+    '''
+    Whether Flights and OperatedBy are stored in monthly shards (see
+    sharding.py); only ShardedAirDB can then read and write them
+    '''
+    conn = self.pool.acquire()
+    try:
+      return is_sharded(conn.cursor())
+    finally:
+      self.pool.release(conn)
+
+  # ---- Result cache
+  def bump_data_version(self):
+    '''
+    Invalidate every cached result after a change to the data or the schema
+    '''
+    self.data_version += 1
+
+  def get_data_version(self, conn):
+    '''
+    Version token of the data seen by a connection: the in-process counter,
+    plus PRAGMA data_version which changes when another connection (or
+    process) commits a change
+    '''
+    return (self.data_version, self.pool.serial(conn),
+            conn.execute("PRAGMA data_version").fetchone()[0])
+
+  def execute_cached(self, query, params=(), cursor=None):
+    '''
+    Execute a read-only query through the result cache; returns an object
+    with the description, fetchmany and fetchall of a cursor
+    '''
+    cursor = cursor if cursor is not None else self.cur
+    return self.cache.execute(
+        cursor,
+        query,
+        params,
+        self.get_data_version(cursor.connection),
+        execute=lambda query, params: self.statements.execute(
+            cursor, query, params))
+
   # ---- Create and delete tables
   def bulk_import_seed_data(self):
     '''
@@ -243,7 +618,9 @@ class DBOperations:
       self.cur.executemany(self.sql_insert_operated_by,
                            self.operated_by_seed_data)
       self.conn.commit()
+      self.lookup.invalidate()
 
+      self.bump_data_version()
       print("Seed data loaded successfully.")
 
     except Exception as e:
@@ -252,7 +629,80 @@ class DBOperations:
       )
       print("Error message:", e)
     finally:
-      self.conn.close()
+      self.release_connection()
+
+  def import_file(self, table, path, reject_path=None):
+    '''
+    Load a CSV or JSON-lines file into a table and return the ImportReport.
+    Rows that cannot be inserted are written to the reject file
+    '''
+    if table not in self.insert_tables_dict:
+      raise ValueError(f"Unknown table: {table}")
+    try:
+      self.get_connection()
+      columns = [
+          i[0] for i in self.cur.execute(self.sql_get_table_columns_query, (
+              table, )).fetchall()
+      ]
+      if len(columns) == 0:
+        raise ValueError(f"Table {table} does not exist at the moment.")
+      # the rules of the set_* functions, checked one chunk at a time
+      validator = validation.BatchValidator.from_cursor(self.cur, table)
+      if table == self.FLIGHTS:
+        # archived and sharded FlightIDs cannot be reused either
+        if self.archive is not None:
+          validator.existing_keys.update(self.archive.flight_ids())
+        validator.existing_keys.update(sharded_flight_ids(self.cur))
+      importer = FileImporter(self.conn,
+                              table,
+                              self.insert_tables_dict[table],
+                              columns,
+                              validate_batch=validator.validate)
+      if table in (self.FLIGHTS, self.AIRCRAFTS):
+        # one rebuild after the load is cheaper than firing the triggers per row
+        self.drop_summary_triggers()
+        self.conn.commit()
+      try:
+        report = importer.import_file(path, reject_path=reject_path)
+      finally:
+        self.refresh_summary_tables()
+        self.refresh_statistics([table])
+        self.conn.commit()
+        self.bump_data_version()
+      self.lookup.invalidate(table)
+      return report
+    finally:
+      self.release_connection()
+
+  def bulk_import_file(self):
+    '''
+    Function that allows the user to import table records from a CSV or JSON-lines file
+    '''
+    try:
+      self.get_connection()
+      selected_table = self.select_existing_table_to_operate()
+      self.release_connection()
+      if selected_table == -2:
+        print('Returning to main menu')
+
+      elif selected_table == -1:
+        print("""No tables exist. \n
+              You have to create a table first to proceed with this operation."""
+              )
+      else:
+        path = wait_for_input("Enter the path of a .csv or .jsonl file, or r to return: ")
+        if path == 'r':
+          return -1
+        report = self.import_file(selected_table, path)
+        print(report)
+
+    except Exception as e:
+      print(
+          "\nOperation terminated. Please see the message above for further information.\n"
+      )
+      print(e)
+    finally:
+      self.release_connection()
 
   def update_deleted_tables_dict(self):
     '''
@@ -294,6 +744,9 @@ class DBOperations:
         for ind, val in enumerate(self.cur.fetchall(), start=1)
     }
 
+    # return the connection to the pool
+    self.release_connection()
+
     if len(self.avail_tables) == 0:
       print("No tables exist in the database.")
     else:
@@ -326,7 +779,7 @@ class DBOperations:
     invalid_input = True
     while invalid_input:
       # ask for input
-      usr_input = input("Enter table ID, or 'r' to return to the menu: ")
+      usr_input = wait_for_input("Enter table ID, or 'r' to return to the menu: ")
       if usr_input == 'r':
         return -2
       # validate input
@@ -365,7 +818,7 @@ class DBOperations:
       invalid_input = True
       while invalid_input:
         # ask for input
-        usr_input = input("Enter table ID, or 'r' to return to the menu: ")
+        usr_input = wait_for_input("Enter table ID, or 'r' to return to the menu: ")
         if usr_input == 'r':
           return -2
         # validate input
@@ -396,7 +849,13 @@ class DBOperations:
               )
       else:
         self.cur.execute(self.create_tables_dict[selected_table])
+        self.create_indexes(selected_table)
+        self.refresh_summary_tables()
+        self.refresh_text_indexes()
         self.conn.commit()
+        self.lookup.invalidate(selected_table)
+        self.statements.invalidate(selected_table)
+        self.bump_data_version()
         print(f"Table {selected_table} created successfully.\n")
 
         # as the deleted tables dict would still store the table created above, it must be updated
@@ -405,7 +864,7 @@ class DBOperations:
     except Exception as e:
       print(e)
     finally:
-      self.conn.close()
+      self.release_connection()
 
   def drop_table(self):
     '''
@@ -423,7 +882,12 @@ class DBOperations:
               )
       else:
         self.cur.execute(self.sql_drop_table_query + selected_table)
+        self.refresh_summary_tables()
+        self.refresh_text_indexes()
         self.conn.commit()
+        self.lookup.invalidate(selected_table)
+        self.statements.invalidate(selected_table)
+        self.bump_data_version()
         print(f"Table {selected_table} removed successfully.\n")
 
         # Store the removed table to the deleted tables dictionary
@@ -435,34 +899,261 @@ class DBOperations:
     except Exception as e:
       print(e)
     finally:
-      self.conn.close()
+      self.release_connection()
 
-  # ---- Display all and search by ID
-  def pretty_print(self, columns, records):
+  # ---- Secondary indexes
+  def load_index_catalog(self):
     '''
-      Parse records and print out the table in a "prettyfied format"
-      '''
-    columns = [tuple(i[0] for i in columns)]
-    records = columns + records
-
-    # calc max length
-    max_col_length = max([len(i) for i in columns[0]]) + 2
-
-    # create pretty table to print
-    table = ""
-    for row in records:
-      new_row = ""
-      for cell in row:
-        cell = str(cell)
-        if len(cell) <= max_col_length:
-          new_row += cell + " " * (max_col_length - len(cell)) + "|"
+    Apply the index catalog of the database to indexes_dict: add the indexes
+    added in earlier sessions and remove the default ones that were dropped
+    '''
+    self.cur.execute(self.sql_create_index_catalog)
+    for name, table, columns, dropped in self.cur.execute(
+        self.sql_get_index_catalog_query).fetchall():
+      if dropped:
+        self.indexes_dict.pop(name, None)
+      else:
+        self.indexes_dict[name] = (table, tuple(columns.split(",")))
+
+  def create_indexes(self, table=None):
+    '''
+    Create the catalog indexes of every available table (or of the given table only)
+    '''
+    if table is None:
+      for name in self.obsolete_indexes:
+        self.cur.execute(self.sql_drop_index + name)
+    self.cur.execute(self.sql_get_table_names_query)
+    existing_tables = [i[0] for i in self.cur.fetchall()]
+    for name, (index_table, columns) in self.indexes_dict.items():
+      if index_table not in existing_tables:
+        # the index will be created along with the table
+        continue
+      if table is None or table == index_table:
+        self.cur.execute(
+            self.sql_create_index.format(name=name,
+                                         table=index_table,
+                                         columns=", ".join(columns)))
+
+  def get_indexes(self):
+    '''
+    Return (name, table, definition) for every index in the database
+    '''
+    try:
+      self.get_connection()
+      return self.cur.execute(self.sql_get_index_names_query).fetchall()
+    finally:
+      self.release_connection()
+
+  def add_index(self, name, table, columns):
+    '''
+    Add an index to the catalog and create it. Raises ValueError for an invalid
+    name, table or column
+    '''
+    if not name.replace("_", "").isalnum():
+      raise ValueError("Index names may only contain letters, digits and '_'.")
+    if table not in self.create_tables_dict:
+      raise ValueError(f"Unknown table: {table}")
+    try:
+      self.get_connection()
+      table_columns = [
+          i[0] for i in self.cur.execute(self.sql_get_table_columns_query, (
+              table, )).fetchall()
+      ]
+      if len(table_columns) == 0:
+        raise ValueError(f"Table {table} does not exist at the moment.")
+      for column in columns:
+        if column not in table_columns:
+          raise ValueError(f"Column {column} is not available in {table}.")
+
+      self.cur.execute(
+          self.sql_create_index.format(name=name,
+                                       table=table,
+                                       columns=", ".join(columns)))
+      self.cur.execute(self.sql_save_index_catalog,
+                       (name, table, ",".join(columns), 0))
+      self.conn.commit()
+      self.indexes_dict[name] = (table, tuple(columns))
+    finally:
+      self.release_connection()
+
+  def drop_index(self, name):
+    '''
+    Drop an index and remove it from the catalog
+    '''
+    if name.startswith("sqlite_autoindex"):
+      raise ValueError("Indexes backing a primary key cannot be dropped.")
+    if not name.replace("_", "").isalnum():
+      raise ValueError("Index names may only contain letters, digits and '_'.")
+    try:
+      self.get_connection()
+      self.cur.execute(self.sql_drop_index + name)
+      if name in DBOperations.indexes_dict:
+        # a default index: remember that it was dropped
+        table, columns = DBOperations.indexes_dict[name]
+        self.cur.execute(self.sql_save_index_catalog,
+                         (name, table, ",".join(columns), 1))
+      else:
+        self.cur.execute(self.sql_delete_index_catalog, (name, ))
+      self.conn.commit()
+      self.indexes_dict.pop(name, None)
+    finally:
+      self.release_connection()
+
+  def verify_index_usage(self):
+    '''
+    Run EXPLAIN QUERY PLAN for the built-in queries. Returns one
+    (query, plan, uses indexes) row per query: a query does not use the
+    indexes when any of its steps is a plain scan of a table (not of a
+    subquery it materialized)
+    '''
+    results = []
+    try:
+      self.get_connection()
+      catalog = query_builder.tables(self.cur)
+      for description, query in self.index_check_queries.items():
+        params = ("", ) * query.count("?")
+        plan = query_builder.plan(self.cur, query, params)
+        results.append((description, "; ".join(plan),
+                         query_builder.uses_indexes(plan, catalog)))
+    finally:
+      self.release_connection()
+    return results
+
+  def manage_indexes(self):
+    '''
+    List, add and drop secondary indexes, and check that the built-in queries use them
+    '''
+    print("  1. List indexes")
+    print("  2. Add an index")
+    print("  3. Drop an index")
+    print("  4. Verify query plans")
+    usr_input = wait_for_input("Enter option, or 'r' to return to the menu: ")
+    try:
+      if usr_input == "1":
+        indexes = self.get_indexes()
+        if len(indexes) > 0:
+          print("AirDB indexes:")
+          for name, table, definition in indexes:
+            print(table, "-", name, "-", definition or "(primary key)")
         else:
-          new_row += cell[:max_col_length - 2] + '..|'
-      table += new_row + "\n"
+          print("No indexes exist in the database.")
+
+      elif usr_input == "2":
+        table = wait_for_input("Enter table name, or r to return: ")
+        if table == 'r':
+          return -1
+        columns = wait_for_input("Enter comma-separated column names, or r to return: ")
+        if columns == 'r':
+          return -1
+        columns = [i.strip() for i in columns.split(",") if i.strip() != ""]
+        name = wait_for_input("Enter index name, or r to return: ")
+        if name == 'r':
+          return -1
+        self.add_index(name, table, columns)
+        print(f"Index {name} created successfully.")
+
+      elif usr_input == "3":
+        name = wait_for_input("Enter index name, or r to return: ")
+        if name == 'r':
+          return -1
+        self.drop_index(name)
+        print(f"Index {name} removed successfully.")
+
+      elif usr_input == "4":
+        for description, plan, uses_index in self.verify_index_usage():
+          print("OK     " if uses_index else "NO IDX ", description)
+          print("       ", plan)
 
-    print("\n")
-    print(table)
+      elif usr_input != 'r':
+        print("Invalid Choice\n")
+
+    except Exception as e:
+      print(
+          "\nOperation terminated. Please see the message above for further information.\n"
+      )
+      print(e)
 
+  # ---- Display all and search by ID
+  def pretty_print(self, columns, records, header=True, renderer=None):
+    '''
+      Parse records and print out the table in a "prettyfied format".
+      Returns the renderer: pass it back for the following pages so that
+      they keep the column widths of the first one
+      '''
+    if renderer is None:
+      renderer = TableRenderer([i[0] for i in columns], sys.stdout,
+                               sample=records)
+    if header:
+      print("\n")
+      renderer.write_header()
+    renderer.write_rows(records)
+    # flush so that every page shows up as soon as it is ready
+    renderer.flush()
+    return renderer
+
+  def next_page_requested(self):
+    '''
+    Ask the user whether to print the next page of results
+    '''
+    usr_input = wait_for_input("Press Enter for the next page, or 'r' to return: ")
+    return usr_input != 'r'
+
+  def print_pages(self, table, where="", params=(), cached=False, query=None):
+    '''
+    Print the records of a table (optionally filtered) one page at a time.
+    Each page is fetched with a keyset query (rowid > last rowid shown), so
+    only a single page is ever held in memory. Pages can be served from the
+    result cache. query is a prepared page query (see StatementRegistry.search_page).
+    Returns the number of rows printed
+    '''
+    if query is None:
+      query = self.sql_select_page.format(table=table, where=where)
+    last_rowid = -2**63
+    printed = 0
+    renderer = None
+    while True:
+      page_params = (last_rowid, ) + tuple(params) + (self.page_size, )
+      if cached:
+        result = self.execute_cached(query, page_params)
+      else:
+        result = self.statements.execute(self.cur, query, page_params)
+      records = result.fetchall()
+      if len(records) == 0:
+        break
+      # the rowid is only used as the keyset and is not printed
+      last_rowid = records[-1][0]
+      renderer = self.pretty_print(columns=result.description[1:],
+                                   records=[row[1:] for row in records],
+                                   header=printed == 0,
+                                   renderer=renderer)
+      printed += len(records)
+      if len(records) < self.page_size or not self.next_page_requested():
+        break
+    print()
+    return printed
+
+  def stream_print(self, result):
+    '''
+    Print the rows of an executed query as they are fetched, one page of
+    rows (fetchmany) at a time. Returns the number of rows printed
+    '''
+    printed = 0
+    renderer = None
+    while True:
+      records = result.fetchmany(self.page_size)
+      if len(records) == 0:
+        break
+      renderer = self.pretty_print(columns=result.description,
+                                   records=records,
+                                   header=printed == 0,
+                                   renderer=renderer)
+      printed += len(records)
+      if len(records) < self.page_size or not self.next_page_requested():
+        break
+    print()
+    return printed
+
+  @measured("select_all")
   def select_all(self):
     '''
     Select table and print out every record
@@ -479,18 +1170,18 @@ class DBOperations:
               )
       else:
         print("Table selected:", selected_table)
-        result = self.cur.execute(self.sql_select_all + selected_table)
-        records = result.fetchall()
-        if len(records) > 0:
-          self.pretty_print(columns=result.description, records=records)
-        else:
+        printed = self.print_pages(selected_table)
+        observe_rows(printed)
+        if printed == 0:
           print(f"Table {selected_table} is empty.")
 
     except Exception as e:
+      observe_error()
       print(e)
     finally:
-      self.conn.close()
+      self.release_connection()
 
+  @measured("search_data")
   def search_data(self):
     '''
     This function asks the user to select which table they wish to search based on the table's primary key
@@ -507,41 +1198,43 @@ class DBOperations:
               )
       else:
         print("Table selected:", selected_table)
+        query = self.statements.search_pk(self.cur, selected_table)
         if selected_table != self.OPERATED_BY:
           pk_column = self.prim_key_tables_dict[selected_table]
-          query = f""" SELECT * FROM {selected_table} WHERE {pk_column} = ? """
-          pk_id = input(f"Enter {pk_column}, or r to return: ")
+          pk_id = wait_for_input(f"Enter {pk_column}, or r to return: ")
           if pk_id == 'r':
             return -1
 
           else:
-            result = self.cur.execute(query, (pk_id, ))
+            result = self.execute_cached(query, (pk_id, ))
 
         else:
-          query = f""" SELECT * FROM {selected_table} WHERE FlightID = ? AND PilotID = ?"""
-          pk1_id = input(f"Enter FlightID, or r to return: ")
+          pk1_id = wait_for_input(f"Enter FlightID, or r to return: ")
           if pk1_id == 'r':
             return -1
-          pk2_id = input(f"Enter PilotID, or r to return: ")
+          pk2_id = wait_for_input(f"Enter PilotID, or r to return: ")
           if pk2_id == 'r':
             return -1
 
-          result = self.cur.execute(query, (pk1_id, pk2_id))
+          result = self.execute_cached(query, (pk1_id, pk2_id))
 
         records = result.fetchall()
+        observe_rows(len(records))
         if len(records) > 0:
           self.pretty_print(columns=result.description, records=records)
         else:
           print(f"No record was found.")
 
     except Exception as e:
+      observe_error()
       print(
           "\nOperation terminated. Please see the message above for further information.\n"
       )
       print(e)
     finally:
-      self.conn.close()
+      self.release_connection()
 
+  @measured("search_data_by_non_pk")
   def search_data_by_non_pk(self):
     '''
     This function asks the user to select which table they wish to search based on the table's non-primary key attributes
@@ -559,20 +1252,23 @@ class DBOperations:
       else:
         print("Table selected:", selected_table)
         if selected_table != self.OPERATED_BY:
-          pk_column = input(f"Enter column name, or r to return: ")
+          pk_column = wait_for_input(f"Enter column name, or r to return: ")
           if pk_column == 'r':
             return -1
-          query = f""" SELECT * FROM {selected_table} WHERE {pk_column} = ? """
-          pk_id = input(f"Enter {pk_column} value, or r to return: ")
+          # unknown columns are rejected here, before any value is asked for
+          query = self.statements.search_page(self.cur, selected_table,
+                                              pk_column)
+          pk_id = wait_for_input(f"Enter {pk_column} value, or r to return: ")
           if pk_id == 'r':
             return -1
 
           else:
-            result = self.cur.execute(query, (pk_id, ))
-            records = result.fetchall()
-            if len(records) > 0:
-              self.pretty_print(columns=result.description, records=records)
-            else:
+            printed = self.print_pages(selected_table,
+                                       params=(pk_id, ),
+                                       cached=True,
+                                       query=query)
+            observe_rows(printed)
+            if printed == 0:
               print(f"No record was found.")
 
         else:
@@ -580,14 +1276,16 @@ class DBOperations:
           raise ValueError
 
     except Exception as e:
+      observe_error()
       print(
           "\nOperation terminated as an error occurred. Please make sure you've specified a table column name that is available in the selected table.\n"
       )
       print(e)
     finally:
-      self.conn.close()
+      self.release_connection()
 
   # ---- Insert, update, delete
+  @measured("insert_data")
   def insert_data(self):
     '''
     This function asks the user to select which table they wish to insert data into and then asks 
@@ -606,35 +1304,48 @@ class DBOperations:
       else:
 
         if selected_table == self.FLIGHTS:
-          flight = FlightInfo(cursor=self.cur, conn=self.conn)
+          flight = FlightInfo(cursor=self.cur,
+                              conn=self.conn,
+                              lookup=self.lookup,
+                              archive=self.archive)
           if flight.insert_record_by_id(self.sql_insert_flights) == -1:
             raise ValueError
 
         elif selected_table == self.PILOTS:
-          pilot = PilotsInfo(cursor=self.cur, conn=self.conn)
+          pilot = PilotsInfo(cursor=self.cur,
+                             conn=self.conn,
+                             lookup=self.lookup)
           if pilot.insert_record_by_id(self.sql_insert_pilots) == -1:
             raise ValueError
 
         elif selected_table == self.AIRCRAFTS:
-          aircraft = AircraftsInfo(cursor=self.cur, conn=self.conn)
+          aircraft = AircraftsInfo(cursor=self.cur,
+                                   conn=self.conn,
+                                   lookup=self.lookup)
           if aircraft.insert_record_by_id(self.sql_insert_aircrafts) == -1:
             raise ValueError
 
         elif selected_table == self.OPERATED_BY:
-          operatedBy = OperatedByInfo(cursor=self.cur, conn=self.conn)
+          operatedBy = OperatedByInfo(cursor=self.cur,
+                                      conn=self.conn,
+                                      lookup=self.lookup)
           if operatedBy.insert_record_by_id(self.sql_insert_operated_by) == -1:
             raise ValueError
 
+        observe_rows(max(self.cur.rowcount, 0))
+        self.bump_data_version()
         print(f"Inserted data to {selected_table} successfully.")
 
     except Exception as e:
+      observe_error()
       print(
           "\nOperation terminated. Please see the message above for further information.\n"
       )
       print(e)
     finally:
-      self.conn.close()
+      self.release_connection()
 
+  @measured("update_data")
   def update_data(self):
     '''
     This function asks the user to select which table they wish to update and then asks 
@@ -654,17 +1365,23 @@ class DBOperations:
       else:
 
         if selected_table == self.FLIGHTS:
-          flight = FlightInfo(cursor=self.cur, conn=self.conn)
+          flight = FlightInfo(cursor=self.cur,
+                              conn=self.conn,
+                              lookup=self.lookup)
           if flight.update_record_by_id(self.sql_update_flights_data) == -1:
             raise ValueError
 
         elif selected_table == self.PILOTS:
-          pilot = PilotsInfo(cursor=self.cur, conn=self.conn)
+          pilot = PilotsInfo(cursor=self.cur,
+                             conn=self.conn,
+                             lookup=self.lookup)
           if pilot.update_record_by_id(self.sql_update_pilots_data) == -1:
             raise ValueError
 
         elif selected_table == self.AIRCRAFTS:
-          aircraft = AircraftsInfo(cursor=self.cur, conn=self.conn)
+          aircraft = AircraftsInfo(cursor=self.cur,
+                                   conn=self.conn,
+                                   lookup=self.lookup)
           if aircraft.update_record_by_id(
               self.sql_update_aircrafts_data) == -1:
             raise ValueError
@@ -676,17 +1393,21 @@ class DBOperations:
           print("You should delete the PK record and insert a new one.")
           raise ValueError
 
+        observe_rows(max(self.cur.rowcount, 0))
+        self.bump_data_version()
         print(f"Updated data in {selected_table} successfully.")
 
     except Exception as e:
+      observe_error()
       print(e)
       print(
           "\nOperation terminated. Please see the message above for further information.\n"
       )
 
     finally:
-      self.conn.close()
+      self.release_connection()
 
+  @measured("delete_data")
   def delete_data(self):
     '''
     This function deletes a record based on the primary key of the selected table
@@ -705,313 +1426,781 @@ class DBOperations:
       else:
 
         if selected_table == self.FLIGHTS:
-          flight = FlightInfo(cursor=self.cur, conn=self.conn)
+          flight = FlightInfo(cursor=self.cur,
+                              conn=self.conn,
+                              lookup=self.lookup)
           if flight.delete_record_by_id(self.sql_delete_flights_data) == -1:
             raise ValueError
 
         elif selected_table == self.PILOTS:
-          pilot = PilotsInfo(cursor=self.cur, conn=self.conn)
+          pilot = PilotsInfo(cursor=self.cur,
+                             conn=self.conn,
+                             lookup=self.lookup)
           if pilot.delete_record_by_id(self.sql_delete_pilots_data) == -1:
             raise ValueError
 
         elif selected_table == self.AIRCRAFTS:
-          aircraft = AircraftsInfo(cursor=self.cur, conn=self.conn)
+          aircraft = AircraftsInfo(cursor=self.cur,
+                                   conn=self.conn,
+                                   lookup=self.lookup)
           if aircraft.delete_record_by_id(
               self.sql_delete_aircrafts_data) == -1:
             raise ValueError
 
         elif selected_table == self.OPERATED_BY:
-          operatedBy = OperatedByInfo(cursor=self.cur, conn=self.conn)
+          operatedBy = OperatedByInfo(cursor=self.cur,
+                                      conn=self.conn,
+                                      lookup=self.lookup)
           if operatedBy.delete_record_by_id(
               self.sql_delete_operatedby_data) == -1:
             raise ValueError
 
+        observe_rows(max(self.cur.rowcount, 0))
+        self.bump_data_version()
         print(f"Deleted data from {selected_table} successfully.")
 
     except Exception as e:
+      observe_error()
       print(e)
       print(
           "\nOperation terminated. Please see the message above for further information.\n"
       )
 
     finally:
-      self.conn.close()
+      self.release_connection()
 
   # ---- Calculate summary stats
+  @measured("calc_summary_stat")
   def calc_summary_stat(self, qid):
-    q1 = '''SELECT Status, COUNT(Status) AS 'Number of Flights'
-           FROM Flights 
-           GROUP BY Status
-           ORDER BY COUNT(Status) DESC
-           '''
-    q2 = '''SELECT Status, ROUND(SUM(MaxPassengers),1) AS 'Total Passengers Capacity'
-           FROM Aircrafts, Flights
-           WHERE Flights.AircraftID = Aircrafts.AircraftID 
-           GROUP BY Status
-           ORDER BY ROUND(SUM(MaxPassengers),1) DESC
-           '''
-    q3 = '''SELECT PilotID,
-                  CONCAT(LastName,' ', FirstName) AS Name,
-                  ROUND((julianday('now') - julianday(ProfSince ))/365,1) AS ProfExperienceYears
-           FROM Pilots
-           ORDER BY ProfExperienceYears DESC
-           '''
-    q4 = '''SELECT Pilots.PilotID, Status, COUNT(Flights.FlightID) AS "Number of Flights"
-            FROM Flights, Pilots, OperatedBy
-            WHERE Flights.FlightID = OperatedBy.FlightID
-              AND Pilots.PilotID = OperatedBy.PilotID
-            GROUP BY Pilots.PilotID, Status
-
-         '''
-    map_queries = {1: q1, 2: q2, 3: q3, 4: q4}
     try:
       self.get_connection()
-      result = self.cur.execute(map_queries[qid], )
-      records = result.fetchall()
-      if len(records) > 0:
-        self.pretty_print(columns=result.description, records=records)
-      else:
+      result = self.summary_with_archive(
+          qid, self.execute_cached(self.get_summary_query(qid)))
+      printed = self.stream_print(result)
+      observe_rows(printed)
+      if printed == 0:
         print(f"No records were found.")
     except Exception as e:
+      observe_error()
       print("\nAn error occurred. Operation terminated.\n")
       print(e)
     finally:
-      self.conn.close()
+      self.release_connection()
 
+  def get_summary_query(self, qid, cursor=None):
+    '''
+    Return the query for a summary statistic: the materialized one when the
+    summary triggers are in place, the full query otherwise
+    '''
+    cursor = cursor if cursor is not None else self.cur
+    if qid in self.materialized_summary_queries and self.summary_tables_active(
+        cursor):
+      return self.materialized_summary_queries[qid]
+    return self.summary_queries[qid]
 
-# --------------------------------------------------------------
-class PilotsInfo:
+  # ---- Materialized summary statistics
+  def summary_tables_active(self, cursor=None):
+    '''
+    Check whether every summary trigger exists (i.e. the summary table is up to date)
+    '''
+    cursor = cursor if cursor is not None else self.cur
+    names = ", ".join(f"'{i}'" for i in self.summary_triggers_dict)
+    count = cursor.execute(
+        self.sql_count_triggers_query.format(names=names)).fetchone()[0]
+    return count == len(self.summary_triggers_dict)
 
-  def __init__(self, cursor, conn=None):
-    self.pilot_id = ''
-    self.first_name = ''
-    self.last_name = ''
-    self.school = ''
-    self.birth_date = ''
-    self.prof_since = ''
-    self.cursor = cursor
-    self.conn = conn
+  def drop_summary_triggers(self):
+    for name in self.summary_triggers_dict:
+      self.cur.execute(self.sql_drop_trigger + name)
 
-  # table interaction functions
-  def delete_record_by_id(self, sql_delete_pilots_data):
+  def build_summary_table(self):
     '''
-    Deletes a Pilots table record by its ID
+    Recompute the summary table from Flights and Aircrafts
     '''
-    pilot_id = input("Enter PilotID, or r to return: ")
-    if pilot_id == 'r':
-      return -1
-    else:
-      id_in_table = self.accepted_pilot_id(pilot_id) == False
-      if id_in_table:
-        self.cursor.execute(sql_delete_pilots_data, (pilot_id, ))
-        result = self.cursor.rowcount
-        print("Rows affected:", str(result))
-        self.conn.commit()
-      else:
-        print('Pilot ID does not exist.')
-        return -1
+    self.cur.execute("DELETE FROM " + self.SUMMARY)
+    self.cur.execute(self.sql_rebuild_summary_table)
 
-  def update_record_by_id(self, sql_update_pilots_data):
+  def refresh_summary_tables(self):
     '''
-    Updates a Pilots table record by its ID
+    Keep the summary triggers in place while both Flights and Aircrafts exist
+    (rebuilding the summary table when the triggers had to be created) and
+    remove them otherwise, as they would fail without those tables
     '''
-    pilot_id = input("Enter PilotID, or r to return: ")
-    if pilot_id == 'r':
-      return -1
+    self.cur.execute(self.sql_create_summary_table)
+    self.cur.execute(self.sql_get_table_names_query)
+    existing_tables = [i[0] for i in self.cur.fetchall()]
+    if self.FLIGHTS in existing_tables and self.AIRCRAFTS in existing_tables:
+      if not self.summary_tables_active():
+        for stmt in self.summary_triggers_dict.values():
+          self.cur.execute(stmt)
+        self.build_summary_table()
     else:
-      id_in_table = self.accepted_pilot_id(pilot_id) == False
-      if id_in_table:
-        print('Pilot ID found.')
-        if self.set_first_name(input("Enter First Name: ")):
-          if self.set_last_name(input("Enter Last Name: ")):
-            if self.set_school(input("Enter Air School Name: ")):
-              if self.set_birth_date(input("Enter Birth Date: ")):
-                if self.set_prof_since(input("Enter Prof Since Date: ")):
-                  pilot = str(self.__str__()) + "\n" + pilot_id
-                  # print(pilot)
-                  self.cursor.execute(sql_update_pilots_data,
-                                      tuple(pilot.split("\n"))[1:])
-                  result = self.cursor.rowcount
-                  print("Rows affected:", str(result))
-                  self.conn.commit()
-
-                else:
-                  return -1
-              else:
-                return -1
-            else:
-              return -1
-          else:
-            return -1
-        else:
-          return -1
-      else:
-        print('Pilot ID does not exist.')
-        return -1
+      self.drop_summary_triggers()
+      self.cur.execute("DELETE FROM " + self.SUMMARY)
 
-  def insert_record_by_id(self, sql_insert_pilots):
+  def refresh_statistics(self, tables=None):
     '''
-      Insert new record to Pilots table
-      '''
-    pilot_id = input("Enter PilotID, or r to return: ")
-    if pilot_id == 'r':
-      return -1
-    else:
-      if self.set_pilot_id(pilot_id):
-        if self.set_first_name(input("Enter First Name: ")):
-          if self.set_last_name(input("Enter Last Name: ")):
-            if self.set_school(input("Enter Air School Name: ")):
-              if self.set_birth_date(input("Enter Birth Date: ")):
-                if self.set_prof_since(input("Enter Prof Since Date: ")):
-                  # print(tuple(str(self.__str__()).split("\n")))
-                  self.cursor.execute(sql_insert_pilots,
-                                      tuple(str(self.__str__()).split("\n")))
-                  result = self.cursor.rowcount
-                  print("Rows affected:", str(result))
-                  self.conn.commit()
-                else:
-                  return -1
-              else:
-                return -1
-            else:
-              return -1
-          else:
-            return -1
-        else:
-          return -1
-      else:
-        return -1
-
-  # validation functions
-  def accepted_pilot_id(self, pilot_id):
+    Collect the planner statistics (ANALYZE) of the given tables, or of the
+    tables that have none yet. Without them the planner assumes that every
+    index is selective, and may prefer Status (four values) to a Departure range
     '''
-    Validate that the pilot id is not already being used on the Pilots table
+    self.cur.execute(self.sql_get_table_names_query)
+    existing_tables = [i[0] for i in self.cur.fetchall()]
+    if tables is None:
+      analyzed = set()
+      if self.cur.execute(self.sql_table_exists_query,
+                          ("sqlite_stat1", )).fetchone() is not None:
+        analyzed = {
+            i[0]
+            for i in self.cur.execute(self.sql_analyzed_tables_query)
+        }
+      tables = [i for i in existing_tables if i not in analyzed]
+    self.cur.execute(f"PRAGMA analysis_limit = {self.analysis_limit}")
+    for table in tables:
+      if table in existing_tables:
+        self.cur.execute("ANALYZE " + table)
+
+  def rebuild_summary_tables(self):
+    '''
+    Recompute the materialized summary statistics from scratch
     '''
-    existing_ids = self.cursor.execute("SELECT PilotID FROM Pilots").fetchall()
-    existing_ids = [i[0] for i in existing_ids]
-    if pilot_id not in existing_ids:
-      return True
-    else:
-      return False
+    try:
+      self.get_connection()
+      if not self.summary_tables_active():
+        raise ValueError(
+            "The Flights and Aircrafts tables must exist to build the summary tables."
+        )
+      self.build_summary_table()
+      self.conn.commit()
+      self.bump_data_version()
+    finally:
+      self.release_connection()
 
-  def accepted_birth_date(self, birth_date):
+  def check_summary_tables(self):
     '''
-    Validate that the input is a date respecting the "YYYY-MM-DD" format
+    Compare the materialized summary statistics with the full queries.
+    Returns one (statistic, status, materialized value, actual value) row per difference
     '''
+    differences = []
     try:
-      # confirm format
-      datetime.date.fromisoformat(birth_date)
-      # confirm that the pilot is between 18 and 70 yo
-      days = (datetime.datetime.now() -
-              datetime.datetime.strptime(birth_date, '%Y-%m-%d')).days
-      years = days / 365.24
-      if (years >= 18) & (70 >= years):
-        return True
-      else:
-        return False
-    except:
-      return False
+      self.get_connection()
+      if not self.summary_tables_active():
+        raise ValueError(
+            "The Flights and Aircrafts tables must exist to check the summary tables."
+        )
+      for qid, query in self.materialized_summary_queries.items():
+        materialized = dict(self.cur.execute(query).fetchall())
+        actual = dict(self.cur.execute(self.summary_queries[qid]).fetchall())
+        for status in sorted(set(materialized) | set(actual)):
+          if materialized.get(status) != actual.get(status):
+            differences.append((qid, status, materialized.get(status),
+                                actual.get(status)))
+    finally:
+      self.release_connection()
+    return differences
 
-  def accepted_prof_since_date(self, prof_since):
+  def manage_summary_tables(self):
     '''
-    Validate the prof since date
+    Check the materialized summary statistics against the full queries, or rebuild them
     '''
+    print("  1. Check the summary tables against the full queries")
+    print("  2. Rebuild the summary tables")
+    usr_input = wait_for_input("Enter option, or 'r' to return to the menu: ")
     try:
-      # confirm format
-      datetime.date.fromisoformat(prof_since)
-      # confirm that the pilot turned pro at least 18 years following their birth
-      turned_pro = datetime.datetime.strptime(prof_since, '%Y-%m-%d')
-      birth = datetime.datetime.strptime(self.birth_date, '%Y-%m-%d')
-      days = (turned_pro - birth).days
-      years = days / 365.24
-      # confirm that the prof date is not set in the future
-      days_from_now = (datetime.datetime.now() -
-                       datetime.datetime.strptime(prof_since, '%Y-%m-%d')).days
-      if (years >= 18) & (days_from_now > 0):
-        return True
-      else:
-        return False
-    except:
-      return False
+      if usr_input == "1":
+        differences = self.check_summary_tables()
+        if len(differences) == 0:
+          print("The summary tables are consistent with the full queries.")
+        else:
+          print("Differences found (statistic, status, materialized, actual):")
+          for row in differences:
+            print(*row, sep=" | ")
+          print("Use option 2 to rebuild the summary tables.")
 
-  # setter functions
-  def set_pilot_id(self, pilot_id):
-    if self.accepted_pilot_id(pilot_id) & (pilot_id != "\n"):
-      self.pilot_id = pilot_id
-      return True
-    else:
-      print("Invalid Pilot ID.")
-      return False
+      elif usr_input == "2":
+        self.rebuild_summary_tables()
+        print("Summary tables rebuilt successfully.")
 
-  def set_first_name(self, first_name):
-    if (len(first_name) > 1) & (not first_name.isnumeric()) & (first_name
-                                                               != "\n"):
+      elif usr_input != 'r':
+        print("Invalid Choice\n")
+
+    except Exception as e:
+      print(
+          "\nOperation terminated. Please see the message above for further information.\n"
+      )
+      print(e)
+
+  # ---- Archive of completed flights
+  def open_archive(self):
+    '''
+    Open (creating it if needed) the archive database
+    '''
+    if self.archive is None:
+      schema = [
+          self.sql_create_flights_table_firsttime,
+          self.sql_create_operated_by_table_firsttime
+      ] + [
+          self.sql_create_index.format(name=name,
+                                       table=table,
+                                       columns=", ".join(columns))
+          for name, (table, columns) in self.indexes_dict.items()
+          if table in (self.FLIGHTS, self.OPERATED_BY)
+      ]
+      self.archive = FlightArchive(self.pool.db_path, self.archive_path,
+                                   schema, self.profiler)
+    return self.archive
+
+  def archive_flights(self, older_than_days, batch_size=5000):
+    '''
+    Move the completed flights older than older_than_days to the archive;
+    returns an ArchiveResult
+    '''
+    result = self.open_archive().archive(older_than_days, batch_size)
+    self.lookup.invalidate(self.FLIGHTS)
+    self.lookup.invalidate(self.OPERATED_BY)
+    self.bump_data_version()
+    return result
+
+  def summary_with_archive(self, qid, result):
+    '''
+    Add the archived totals to the result of a summary statistic of the hot set
+    '''
+    if self.archive is None or qid not in totals_queries:
+      return result
+    description = result.description
+    return CachedResult(description,
+                        self.archive.combine(qid, result.fetchall()))
+
+  def archive_completed_flights(self):
+    '''
+    Ask for an age in days and archive the completed flights older than that
+    '''
+    usr_input = wait_for_input(
+        "Archive Landed and Cancelled flights older than how many days? "
+        "(r to return): ")
+    if usr_input == 'r':
+      return -1
+    try:
+      result = self.archive_flights(int(usr_input))
+      print(f"Flights departed before {result.cutoff} archived:",
+            result.flights)
+      print("OperatedBy rows archived:", result.operated_by)
+      print("Archive:", self.archive_path)
+    except Exception as e:
+      print(
+          "\nOperation terminated. Please see the message above for further information.\n"
+      )
+      print(e)
+
+  def search_archive(self):
+    '''
+    Search the archived Flights or OperatedBy records by any column
+    '''
+    if self.archive is None:
+      print("No flights have been archived yet.")
+      return -1
+    try:
+      self.get_connection()
+      table = wait_for_input("Enter table (Flights or OperatedBy), or r to return: ")
+      if table == 'r':
+        return -1
+      if table not in (self.FLIGHTS, self.OPERATED_BY):
+        raise ValueError(f"Only {self.FLIGHTS} and {self.OPERATED_BY} are archived.")
+      column = wait_for_input("Enter column name, or r to return: ")
+      if column == 'r':
+        return -1
+      # the archive has the columns of the main tables
+      query = self.statements.search(self.cur, table, column)
+      value = wait_for_input(f"Enter {column} value, or r to return: ")
+      if value == 'r':
+        return -1
+      columns = [(i, ) for i in self.statements.columns(self.cur, table)]
+      result = CachedResult(columns, self.archive.query(query, (value, )))
+      if self.stream_print(result) == 0:
+        print("No record was found.")
+    except Exception as e:
+      print(
+          "\nOperation terminated. Please see the message above for further information.\n"
+      )
+      print(e)
+    finally:
+      self.release_connection()
+
+  # ---- Pilot roster
+  def roster_params(self, pilot_id, low=None, high=None):
+    '''
+    Parameters of sql_pilot_roster; dates left out (None or blank) are not
+    bounded. Raises ValueError for a date that is not YYYY-MM-DD
+    '''
+    bounds = []
+    for date, default in ((low, self.roster_first_date),
+                          (high, self.roster_last_date)):
+      if date is None or date == "":
+        bounds.append(default)
+      elif validation.parse_date(date) is None:
+        raise ValueError("Dates must follow the 'YYYY-MM-DD' format.")
+      else:
+        bounds.append(date)
+    return (pilot_id, bounds[0], bounds[1])
+
+  @measured("pilot_roster")
+  def print_pilot_roster(self):
+    '''
+    Print the flights a pilot operates between two dates, with their aircraft
+    '''
+    try:
+      self.get_connection()
+      pilot_id = wait_for_input("Enter PilotID, or r to return: ")
+      if pilot_id == 'r':
+        return -1
+      low = wait_for_input("Enter first Departure date (blank for no bound): ")
+      high = wait_for_input("Enter last Departure date (blank for no bound): ")
+      result = self.cur.execute(self.sql_pilot_roster,
+                                self.roster_params(pilot_id, low, high))
+      printed = self.stream_print(result)
+      observe_rows(printed)
+      if printed == 0:
+        print("No flight was found.")
+    except Exception as e:
+      observe_error()
+      print(
+          "\nOperation terminated. Please see the message above for further information.\n"
+      )
+      print(e)
+    finally:
+      self.release_connection()
+
+  # ---- Full-text search
+  def refresh_text_indexes(self):
+    '''
+    Keep the full-text index of each mirrored table while the table exists
+    '''
+    self.cur.execute(self.sql_get_table_names_query)
+    existing_tables = [i[0] for i in self.cur.fetchall()]
+    for index in TEXT_INDEXES.values():
+      index.refresh(self.cur, existing_tables)
+
+  @measured("text_search")
+  def text_search(self):
+    '''
+    Search the airport names of Flights, or the names and schools of Pilots,
+    by words or word prefixes; the best matches are printed first
+    '''
+    try:
+      self.get_connection()
+      table = wait_for_input("Enter table (Flights or Pilots), or r to return: ")
+      if table == 'r':
+        return -1
+      if table not in TEXT_INDEXES:
+        raise ValueError("Full-text search covers the Flights and Pilots tables.")
+      text = wait_for_input("Enter the words to search for, or r to return: ")
+      if text == 'r':
+        return -1
+      prefix = wait_for_input("Match the beginning of words? (Y/n): ").lower() != 'n'
+      result = TEXT_INDEXES[table].search(self.cur, text, prefix)
+      printed = self.stream_print(result)
+      observe_rows(printed)
+      if printed == 0:
+        print("No record was found.")
+    except Exception as e:
+      observe_error()
+      print(
+          "\nOperation terminated. Please see the message above for further information.\n"
+      )
+      print(e)
+    finally:
+      self.release_connection()
+
+  # ---- Search by conditions
+  def filter_query(self, cursor, table, predicates):
+    '''
+    (SQL, parameters) of the rows of a table matching every predicate, with
+    the columns checked against the schema
+    '''
+    if table not in self.create_tables_dict:
+      raise ValueError(f"Unknown table: {table}")
+    return query_builder.build(
+        table, predicates, lambda name: self.statements.columns(cursor, name))
+
+  @measured("filter_table")
+  def filter_table(self):
+    '''
+    Search a table by several conditions (equality, IN lists and ranges)
+    combined with AND, and print the query plan used
+    '''
+    try:
+      self.get_connection()
+      table = wait_for_input("Enter table name, or r to return: ")
+      if table == 'r':
+        return -1
+      print("Conditions: <column> <operator> <value(s)>, joined by 'and'.")
+      print("Operators: " + ", ".join(query_builder.OPERATORS) + ".",
+            "Flights can also be filtered by the columns of its aircraft.")
+      print("e.g. Departure between 2024-04-01 and 2024-06-30 and "
+            "Status = Delayed and Model = 320")
+      conditions = wait_for_input("Enter conditions, or r to return: ")
+      if conditions == 'r':
+        return -1
+      predicates = query_builder.parse_predicates(conditions)
+      sql, params = self.filter_query(self.cur, table, predicates)
+      plan = query_builder.plan(self.cur, sql, params)
+      print("Query plan:")
+      for step in plan:
+        print("  " + step)
+      scans = query_builder.full_scans(plan,
+                                       query_builder.tables(self.cur))
+      if len(scans) > 0:
+        print("  Read without an index:", ", ".join(scans))
+      printed = self.stream_print(self.cur.execute(sql, params))
+      observe_rows(printed)
+      if printed == 0:
+        print("No record was found.")
+    except Exception as e:
+      observe_error()
+      print(
+          "\nOperation terminated. Please see the message above for further information.\n"
+      )
+      print(e)
+    finally:
+      self.release_connection()
+
+  # ---- Double bookings
+  def group_bookings(self, rows):
+    '''
+    (AircraftID, Departure, FlightIDs) of each double booking, from the rows
+    of sql_double_bookings
+    '''
+    return [(aircraft_id, departure, tuple(row[2] for row in group))
+            for (aircraft_id, departure), group in itertools.groupby(
+                rows, key=lambda row: (row[0], row[1]))]
+
+  @measured("double_bookings")
+  def print_double_bookings(self):
+    '''
+    Print every aircraft assigned to more than one flight on the same day
+    '''
+    try:
+      self.get_connection()
+      bookings = self.group_bookings(
+          self.cur.execute(self.sql_double_bookings))
+      observe_rows(len(bookings))
+      columns = [("AircraftID", ), ("Departure", ), ("FlightIDs", )]
+      result = CachedResult(columns, [(aircraft_id, departure, ", ".join(ids))
+                                      for aircraft_id, departure, ids in bookings])
+      if self.stream_print(result) == 0:
+        print("No aircraft is double-booked.")
+    except Exception as e:
+      observe_error()
+      print(
+          "\nOperation terminated. Please see the message above for further information.\n"
+      )
+      print(e)
+    finally:
+      self.release_connection()
+
+  # ---- Query profile
+  def print_query_profile(self):
+    '''
+    Print the statements with the largest total time, and the plans of the
+    latest slow executions
+    '''
+    if self.profiler is None:
+      print("Query profiling is off. Start the program with --profile.")
+      return -1
+    usr_input = wait_for_input(
+        "Number of statements to show (Enter for 10), or r to return: ")
+    if usr_input == 'r':
+      return -1
+    try:
+      top = self.profiler.top(int(usr_input) if usr_input != "" else 10)
+      if len(top) == 0:
+        print("No statements have been run yet.")
+        return
+      columns = [(name, ) for name in top[0]]
+      # the SQL text last, where it can be cut without hiding the numbers
+      columns = columns[1:] + columns[:1]
+      self.pretty_print(columns, [
+          tuple(row.values())[1:] + (row["sql"], ) for row in top
+      ])
+      print(f"\nSlow executions (at least {self.profiler.threshold * 1000:g} ms),"
+            " latest last:")
+      if len(self.profiler.slow) == 0:
+        print("None.")
+      for entry in list(self.profiler.slow)[-5:]:
+        print(f"\n{entry['elapsed_ms']} ms, {entry['rows']} rows: {entry['sql']}")
+        for step in entry["plan"] or []:
+          print("  ", step)
+    except Exception as e:
+      print(
+          "\nOperation terminated. Please see the message above for further information.\n"
+      )
+      print(e)
+
+  def print_metrics(self):
+    '''
+    Print the metrics of the menu operations as Prometheus text or JSON
+    '''
+    print("  1. Prometheus text format")
+    print("  2. JSON")
+    usr_input = wait_for_input("Enter option, or 'r' to return to the menu: ")
+    if usr_input == "1":
+      print(self.metrics.prometheus())
+    elif usr_input == "2":
+      print(self.metrics.json())
+    elif usr_input != 'r':
+      print("Invalid Choice\n")
+
+
+# --------------------------------------------------------------
+class PilotsInfo:
+
+  def __init__(self, cursor, conn=None, lookup=None, interactive=True):
+    self.pilot_id = ''
+    self.first_name = ''
+    self.last_name = ''
+    self.school = ''
+    self.birth_date = ''
+    self.prof_since = ''
+    self.cursor = cursor
+    self.conn = conn
+    self.lookup = lookup if lookup is not None else KeyLookup()
+    # setters print their messages (menu), or raise them (AirDB)
+    self.interactive = interactive
+
+  # table interaction functions
+  def delete_record_by_id(self, sql_delete_pilots_data):
+    '''
+    Deletes a Pilots table record by its ID
+    '''
+    pilot_id = wait_for_input("Enter PilotID, or r to return: ")
+    if pilot_id == 'r':
+      return -1
+    else:
+      id_in_table = self.accepted_pilot_id(pilot_id) == False
+      if id_in_table:
+        self.cursor.execute(sql_delete_pilots_data, (pilot_id, ))
+        result = self.cursor.rowcount
+        print("Rows affected:", str(result))
+        self.conn.commit()
+        self.lookup.record_delete("Pilots", "PilotID", pilot_id)
+      else:
+        print('Pilot ID does not exist.')
+        return -1
+
+  def update_record_by_id(self, sql_update_pilots_data):
+    '''
+    Updates a Pilots table record by its ID
+    '''
+    pilot_id = wait_for_input("Enter PilotID, or r to return: ")
+    if pilot_id == 'r':
+      return -1
+    else:
+      id_in_table = self.accepted_pilot_id(pilot_id) == False
+      if id_in_table:
+        print('Pilot ID found.')
+        if self.set_first_name(wait_for_input("Enter First Name: ")):
+          if self.set_last_name(wait_for_input("Enter Last Name: ")):
+            if self.set_school(wait_for_input("Enter Air School Name: ")):
+              if self.set_birth_date(wait_for_input("Enter Birth Date: ")):
+                if self.set_prof_since(wait_for_input("Enter Prof Since Date: ")):
+                  self.cursor.execute(sql_update_pilots_data,
+                                      self.record(pilot_id).update_params())
+                  result = self.cursor.rowcount
+                  print("Rows affected:", str(result))
+                  self.conn.commit()
+
+                else:
+                  return -1
+              else:
+                return -1
+            else:
+              return -1
+          else:
+            return -1
+        else:
+          return -1
+      else:
+        print('Pilot ID does not exist.')
+        return -1
+
+  def insert_record_by_id(self, sql_insert_pilots):
+    '''
+      Insert new record to Pilots table
+      '''
+    pilot_id = wait_for_input("Enter PilotID, or r to return: ")
+    if pilot_id == 'r':
+      return -1
+    else:
+      if self.set_pilot_id(pilot_id):
+        if self.set_first_name(wait_for_input("Enter First Name: ")):
+          if self.set_last_name(wait_for_input("Enter Last Name: ")):
+            if self.set_school(wait_for_input("Enter Air School Name: ")):
+              if self.set_birth_date(wait_for_input("Enter Birth Date: ")):
+                if self.set_prof_since(wait_for_input("Enter Prof Since Date: ")):
+                  self.cursor.execute(sql_insert_pilots, self.record())
+                  result = self.cursor.rowcount
+                  print("Rows affected:", str(result))
+                  self.conn.commit()
+                  self.lookup.record_insert("Pilots", "PilotID",
+                                            self.pilot_id)
+                else:
+                  return -1
+              else:
+                return -1
+            else:
+              return -1
+          else:
+            return -1
+        else:
+          return -1
+      else:
+        return -1
+
+  # non-interactive versions of the functions above (records are passed in)
+  def delete_record(self, sql_delete_pilots_data, pilot_id):
+    '''
+    Deletes a Pilots table record by its ID; returns the number of rows affected
+    '''
+    if self.accepted_pilot_id(pilot_id):
+      validation.reject(validation.UNKNOWN_ID, self.interactive)
+      return -1
+    self.cursor.execute(sql_delete_pilots_data, (pilot_id, ))
+    result = self.cursor.rowcount
+    self.conn.commit()
+    self.lookup.record_delete("Pilots", "PilotID", pilot_id)
+    return result
+
+  def update_record(self, sql_update_pilots_data, record):
+    '''
+    Updates a Pilots table record (PilotID first); returns the number of rows affected
+    '''
+    pilot_id, first_name, last_name, school, birth_date, prof_since = record
+    if self.accepted_pilot_id(pilot_id):
+      validation.reject(validation.UNKNOWN_ID, self.interactive)
+      return -1
+    if self.set_first_name(first_name) and self.set_last_name(last_name) \
+        and self.set_school(school) and self.set_birth_date(birth_date) \
+        and self.set_prof_since(prof_since):
+      self.cursor.execute(sql_update_pilots_data,
+                          self.record(pilot_id).update_params())
+      result = self.cursor.rowcount
+      self.conn.commit()
+      return result
+    return -1
+
+  def insert_record(self, sql_insert_pilots, record):
+    '''
+    Insert new record to Pilots table; returns the number of rows affected
+    '''
+    pilot_id, first_name, last_name, school, birth_date, prof_since = record
+    if self.set_pilot_id(pilot_id) and self.set_first_name(first_name) \
+        and self.set_last_name(last_name) and self.set_school(school) \
+        and self.set_birth_date(birth_date) and self.set_prof_since(prof_since):
+      self.cursor.execute(sql_insert_pilots, self.record())
+      result = self.cursor.rowcount
+      self.conn.commit()
+      self.lookup.record_insert("Pilots", "PilotID", self.pilot_id)
+      return result
+    return -1
+
+  # validation functions
+  def accepted_pilot_id(self, pilot_id):
+    '''
+    Validate that the pilot id is not already being used on the Pilots table
+    '''
+    return not self.lookup.exists(self.cursor, "Pilots", "PilotID", pilot_id)
+
+  def accepted_birth_date(self, birth_date):
+    '''
+    Validate that the input is a date respecting the "YYYY-MM-DD" format
+    '''
+    # confirm format, and that the pilot is between 18 and 70 yo
+    return validation.check_birth_date(validation.parse_date(birth_date),
+                                       datetime.date.today()) is None
+
+  def accepted_prof_since_date(self, prof_since):
+    '''
+    Validate the prof since date
+    '''
+    # confirm that the pilot turned pro at least 18 years following their
+    # birth, and that the prof date is not set in the future
+    return validation.check_prof_since(validation.parse_date(prof_since),
+                                       validation.parse_date(self.birth_date),
+                                       datetime.date.today()) is None
+
+  # setter functions
+  def set_pilot_id(self, pilot_id):
+    if self.accepted_pilot_id(pilot_id) & (pilot_id != "\n"):
+      self.pilot_id = pilot_id
+      return True
+    else:
+      return validation.reject(
+          validation.INVALID_ID if pilot_id == "\n" else validation.ID_IN_USE,
+          self.interactive)
+
+  def set_first_name(self, first_name):
+    code = validation.check_text(first_name, validation.INVALID_NAME)
+    if code is None:
       self.first_name = first_name
       return True
     else:
-      print(
-          "Pilot names must have at least two characters and be non-numeric.")
-      return False
+      return validation.reject(code, self.interactive)
 
   def set_last_name(self, last_name):
-    if (len(last_name) > 1) & (not last_name.isnumeric()) & (last_name
-                                                             != "\n"):
+    code = validation.check_text(last_name, validation.INVALID_NAME)
+    if code is None:
       self.last_name = last_name
       return True
     else:
-      print(
-          "Pilot names must have at least two characters and be non-numeric.")
-      return False
+      return validation.reject(code, self.interactive)
 
   def set_school(self, school):
-    if (len(school) > 1) & (not school.isnumeric()) & (school != "\n"):
+    code = validation.check_text(school, validation.INVALID_SCHOOL)
+    if code is None:
       self.school = school
       return True
     else:
-      print(
-          "Air school names must have at least two characters and be non-numeric."
-      )
-      return False
+      return validation.reject(code, self.interactive)
 
   def set_birth_date(self, birth_date):
     if self.accepted_birth_date(birth_date):
       self.birth_date = birth_date
       return True
     else:
-      print(
-          "Invalid birth date. The pilot must be between 18 and 70 years old.")
-      return False
+      return validation.reject(validation.INVALID_BIRTH_DATE,
+                               self.interactive)
 
   def set_prof_since(self, prof_since):
     if self.accepted_prof_since_date(prof_since):
       self.prof_since = prof_since
       return True
     else:
-      print(
-          "Invalid ''prof since'' date. The pilot must have been at least 18 years old when they started working as professionals."
-      )
-      return False
+      return validation.reject(validation.INVALID_PROF_SINCE,
+                               self.interactive)
 
-  def __str__(self):
-    return self.pilot_id + "\n"\
-        + self.first_name + "\n"\
-        + self.last_name + "\n"\
-        + self.school + "\n"\
-        + self.birth_date + "\n"\
-        + self.prof_since
+  def record(self, pilot_id=None):
+    '''
+    The record set by the setters, with pilot_id as its PK when given (updates)
+    '''
+    return PilotRecord(self.pilot_id if pilot_id is None else pilot_id,
+                       self.first_name, self.last_name, self.school,
+                       self.birth_date, self.prof_since)
 
 
 # --------------------------------------------------------------
 class AircraftsInfo:
 
-  def __init__(self, cursor, conn=None):
+  def __init__(self, cursor, conn=None, lookup=None, interactive=True):
     self.aircraft_id = ''
     self.manufacturer = ''
     self.model = ''
-    self.max_passengers = ''
-    self.crew = ''
+    self.max_passengers = None
+    self.crew = None
     self.cursor = cursor
     self.conn = conn
+    self.lookup = lookup if lookup is not None else KeyLookup()
+    # setters print their messages (menu), or raise them (AirDB)
+    self.interactive = interactive
 
   # table interaction functions
 
@@ -1019,7 +2208,7 @@ class AircraftsInfo:
     '''
     Deletes an Aircrafts table record by its ID
     '''
-    aircraft_id = input("Enter AircraftID, or r to return: ")
+    aircraft_id = wait_for_input("Enter AircraftID, or r to return: ")
     if aircraft_id == 'r':
       return -1
     else:
@@ -1029,6 +2218,7 @@ class AircraftsInfo:
         result = self.cursor.rowcount
         print("Rows affected:", str(result))
         self.conn.commit()
+        self.lookup.record_delete("Aircrafts", "AircraftID", aircraft_id)
       else:
         print('Aircraft ID does not exist.')
         return -1
@@ -1037,21 +2227,19 @@ class AircraftsInfo:
     '''
     Updates an Aircrafts table record by its ID
     '''
-    aircraft_id = input("Enter AircraftID, or r to return: ")
+    aircraft_id = wait_for_input("Enter AircraftID, or r to return: ")
     if aircraft_id == 'r':
       return -1
     else:
       id_in_table = self.accepted_aircraft_id(aircraft_id) == False
       if id_in_table:
         print('Aircraft ID found.')
-        if self.set_manufacturer(input("Enter Manufacturer: ")):
-          if self.set_model(input("Enter Model: ")):
-            if self.set_max_passengers(input("Enter Max Passengers: ")):
-              if self.set_crew(input("Enter Crew Size: ")):
-                pilot = str(self.__str__()) + "\n" + aircraft_id
-                # print(pilot)
+        if self.set_manufacturer(wait_for_input("Enter Manufacturer: ")):
+          if self.set_model(wait_for_input("Enter Model: ")):
+            if self.set_max_passengers(wait_for_input("Enter Max Passengers: ")):
+              if self.set_crew(wait_for_input("Enter Crew Size: ")):
                 self.cursor.execute(sql_update_aircrafts_data,
-                                    tuple(pilot.split("\n"))[1:])
+                                    self.record(aircraft_id).update_params())
                 result = self.cursor.rowcount
                 print("Rows affected:", str(result))
                 self.conn.commit()
@@ -1072,21 +2260,21 @@ class AircraftsInfo:
     '''
       Insert new record to Aircrafts table
       '''
-    aircraft_id = input("Enter AircraftID, or r to return: ")
+    aircraft_id = wait_for_input("Enter AircraftID, or r to return: ")
     if aircraft_id == 'r':
       return -1
     else:
       if self.set_aircraft_id(aircraft_id):
-        if self.set_manufacturer(input("Enter Manufacturer: ")):
-          if self.set_model(input("Enter Model: ")):
-            if self.set_max_passengers(input("Enter Max Passengers: ")):
-              if self.set_crew(input("Enter Crew Size: ")):
-                # print(tuple(str(self.__str__()).split("\n")))
-                self.cursor.execute(sql_insert_aircrafts,
-                                    tuple(str(self.__str__()).split("\n")))
+        if self.set_manufacturer(wait_for_input("Enter Manufacturer: ")):
+          if self.set_model(wait_for_input("Enter Model: ")):
+            if self.set_max_passengers(wait_for_input("Enter Max Passengers: ")):
+              if self.set_crew(wait_for_input("Enter Crew Size: ")):
+                self.cursor.execute(sql_insert_aircrafts, self.record())
                 result = self.cursor.rowcount
                 print("Rows affected:", str(result))
                 self.conn.commit()
+                self.lookup.record_insert("Aircrafts", "AircraftID",
+                                          self.aircraft_id)
 
               else:
                 return -1
@@ -1099,18 +2287,59 @@ class AircraftsInfo:
       else:
         return -1
 
+  # non-interactive versions of the functions above (records are passed in)
+  def delete_record(self, sql_delete_aircrafts_data, aircraft_id):
+    '''
+    Deletes an Aircrafts table record by its ID; returns the number of rows affected
+    '''
+    if self.accepted_aircraft_id(aircraft_id):
+      validation.reject(validation.UNKNOWN_ID, self.interactive)
+      return -1
+    self.cursor.execute(sql_delete_aircrafts_data, (aircraft_id, ))
+    result = self.cursor.rowcount
+    self.conn.commit()
+    self.lookup.record_delete("Aircrafts", "AircraftID", aircraft_id)
+    return result
+
+  def update_record(self, sql_update_aircrafts_data, record):
+    '''
+    Updates an Aircrafts table record (AircraftID first); returns the number of rows affected
+    '''
+    aircraft_id, manufacturer, model, max_passengers, crew = record
+    if self.accepted_aircraft_id(aircraft_id):
+      validation.reject(validation.UNKNOWN_ID, self.interactive)
+      return -1
+    if self.set_manufacturer(manufacturer) and self.set_model(model) \
+        and self.set_max_passengers(max_passengers) and self.set_crew(crew):
+      self.cursor.execute(sql_update_aircrafts_data,
+                          self.record(aircraft_id).update_params())
+      result = self.cursor.rowcount
+      self.conn.commit()
+      return result
+    return -1
+
+  def insert_record(self, sql_insert_aircrafts, record):
+    '''
+    Insert new record to Aircrafts table; returns the number of rows affected
+    '''
+    aircraft_id, manufacturer, model, max_passengers, crew = record
+    if self.set_aircraft_id(aircraft_id) and self.set_manufacturer(manufacturer) \
+        and self.set_model(model) and self.set_max_passengers(max_passengers) \
+        and self.set_crew(crew):
+      self.cursor.execute(sql_insert_aircrafts, self.record())
+      result = self.cursor.rowcount
+      self.conn.commit()
+      self.lookup.record_insert("Aircrafts", "AircraftID", self.aircraft_id)
+      return result
+    return -1
+
   # validation functions
   def accepted_aircraft_id(self, aircraft_id):
     '''
     Validate that the aircraft id is not already being used on the Aircrafts table
     '''
-    existing_ids = self.cursor.execute(
-        "SELECT AircraftID FROM Aircrafts").fetchall()
-    existing_ids = [i[0] for i in existing_ids]
-    if aircraft_id not in existing_ids:
-      return True
-    else:
-      return False
+    return not self.lookup.exists(self.cursor, "Aircrafts", "AircraftID",
+                                  aircraft_id)
 
   # setter functions
   def set_aircraft_id(self, aircraft_id):
@@ -1118,78 +2347,72 @@ class AircraftsInfo:
       self.aircraft_id = aircraft_id
       return True
     else:
-      print("Invalid Aircraft ID.")
-      return False
+      return validation.reject(
+          validation.INVALID_ID if aircraft_id == "\n" else validation.ID_IN_USE,
+          self.interactive)
 
   def set_manufacturer(self, manufacturer):
-    if (len(manufacturer) > 1) & (not manufacturer.isnumeric()) & (manufacturer
-                                                                   != "\n"):
+    code = validation.check_text(manufacturer, validation.INVALID_MANUFACTURER)
+    if code is None:
       self.manufacturer = manufacturer
       return True
     else:
-      print(
-          "Manufacturer names must have at least two characters and be non-numeric."
-      )
-      return False
+      return validation.reject(code, self.interactive)
 
   def set_model(self, model):
     if model != "\n":
       self.model = model
       return True
-    return False
+    return validation.reject(validation.INVALID_MODEL, self.interactive)
 
   def set_max_passengers(self, max_passengers):
-    try:
-      if (int(max_passengers) >= 20) & (int(max_passengers) <= 500):
-        self.max_passengers = str(int(max_passengers))
-        return True
-      else:
-        print("Max passengers value must be numeric and between 20 and 500.")
-        return False
-    except:
-      print("Max passengers value must be numeric and between 20 and 500.")
-      return False
+    code = validation.check_max_passengers(max_passengers)
+    if code is None:
+      self.max_passengers = int(max_passengers)
+      return True
+    else:
+      return validation.reject(code, self.interactive)
 
   def set_crew(self, crew):
-    try:
-      if (int(crew) >= 2) & (int(crew) <= 10):
-        self.crew = str(int(crew))
-        return True
-      else:
-        print("Cabin crew value must be numeric and between 2 and 10.")
-        return False
-    except:
-      print("Cabin crew value must be numeric and between 2 and 10.")
-      return False
+    code = validation.check_crew(crew)
+    if code is None:
+      self.crew = int(crew)
+      return True
+    else:
+      return validation.reject(code, self.interactive)
 
-  def __str__(self):
-    return self.aircraft_id + "\n"\
-        + self.manufacturer + "\n"\
-        + self.model + "\n"\
-        + self.max_passengers + "\n"\
-        + self.crew
+  def record(self, aircraft_id=None):
+    '''
+    The record set by the setters, with aircraft_id as its PK when given (updates)
+    '''
+    return AircraftRecord(
+        self.aircraft_id if aircraft_id is None else aircraft_id,
+        self.manufacturer, self.model, self.max_passengers, self.crew)
 
 
 # --------------------------------------------------------------
 class OperatedByInfo:
 
-  def __init__(self, cursor, conn=None):
+  def __init__(self, cursor, conn=None, lookup=None, interactive=True):
     self.flight_id = ''
     self.pilot_id = ''
     self.cursor = cursor
     self.conn = conn
+    self.lookup = lookup if lookup is not None else KeyLookup()
+    # setters print their messages (menu), or raise them (AirDB)
+    self.interactive = interactive
 
   # table interaction functions
   def delete_record_by_id(self, sql_delete_operated_by):
     '''
     Delete record from OperatedBy table
     '''
-    flight_id = input("Enter FlightID, or r to return: ")
+    flight_id = wait_for_input("Enter FlightID, or r to return: ")
     if flight_id == 'r':
       return -1
 
     else:
-      pilot_id = input("Enter PilotID, or r to return: ")
+      pilot_id = wait_for_input("Enter PilotID, or r to return: ")
       if pilot_id == 'r':
         return -1
 
@@ -1201,12 +2424,11 @@ class OperatedByInfo:
       if contains_both:
         self.set_pilot_id(pilot_id)
         self.set_flight_id(flight_id)
-        # print(tuple(str(self.__str__()).split("\n")))
-        self.cursor.execute(sql_delete_operated_by,
-                            tuple(str(self.__str__()).split("\n")))
+        self.cursor.execute(sql_delete_operated_by, self.record())
         result = self.cursor.rowcount
         print("Rows affected:", str(result))
         self.conn.commit()
+        self.lookup.record_delete("OperatedBy", "FlightID", flight_id)
 
       else:
         print("Composite PK does not exist.")
@@ -1216,11 +2438,11 @@ class OperatedByInfo:
     '''
       Insert new record to OperatedBy table
       '''
-    flight_id = input("Enter FlightID, or r to return: ")
+    flight_id = wait_for_input("Enter FlightID, or r to return: ")
     if flight_id == 'r':
       return -1
     else:
-      pilot_id = input("Enter PilotID, or r to return: ")
+      pilot_id = wait_for_input("Enter PilotID, or r to return: ")
       if pilot_id == 'r':
         return -1
 
@@ -1232,17 +2454,53 @@ class OperatedByInfo:
       if (not contains_both) & (flight_id != pilot_id):
         self.set_pilot_id(pilot_id)
         self.set_flight_id(flight_id)
-        # print(tuple(str(self.__str__()).split("\n")))
-        self.cursor.execute(sql_insert_operated_by,
-                            tuple(str(self.__str__()).split("\n")))
+        self.cursor.execute(sql_insert_operated_by, self.record())
         result = self.cursor.rowcount
         print("Rows affected:", str(result))
         self.conn.commit()
+        self.lookup.record_insert("OperatedBy", "FlightID", flight_id)
 
       else:
         print("Composite PK already exists.")
         return -1
 
+  # non-interactive versions of the functions above (records are passed in)
+  def delete_record(self, sql_delete_operated_by, record):
+    '''
+    Delete record (FlightID, PilotID) from OperatedBy table; returns the number of rows affected
+    '''
+    flight_id, pilot_id = record
+    if self.accepted_pilot_id_for_given_flight_id(flight_id, pilot_id):
+      validation.reject(validation.UNKNOWN_PK, self.interactive)
+      return -1
+    self.set_pilot_id(pilot_id)
+    self.set_flight_id(flight_id)
+    self.cursor.execute(sql_delete_operated_by, self.record())
+    result = self.cursor.rowcount
+    self.conn.commit()
+    self.lookup.record_delete("OperatedBy", "FlightID", flight_id)
+    return result
+
+  def insert_record(self, sql_insert_operated_by, record):
+    '''
+    Insert new record (FlightID, PilotID) to OperatedBy table; returns the number of rows affected
+    '''
+    flight_id, pilot_id = record
+    contains_both = not self.accepted_pilot_id_for_given_flight_id(
+        flight_id, pilot_id)
+    if contains_both or flight_id == pilot_id:
+      validation.reject(
+          validation.PK_IN_USE if contains_both else
+          validation.SAME_FLIGHT_PILOT, self.interactive)
+      return -1
+    self.set_pilot_id(pilot_id)
+    self.set_flight_id(flight_id)
+    self.cursor.execute(sql_insert_operated_by, self.record())
+    result = self.cursor.rowcount
+    self.conn.commit()
+    self.lookup.record_insert("OperatedBy", "FlightID", flight_id)
+    return result
+
   # validate
   # def accepted_pilot_id(self, pilot_id):
   #   '''
@@ -1274,13 +2532,8 @@ class OperatedByInfo:
     '''
     Validate that the flight id is not already being used on the Flights table
     '''
-    existing_ids = self.cursor.execute(
-        "SELECT FlightID FROM OperatedBy").fetchall()
-    existing_ids = [i[0] for i in existing_ids]
-    if flight_id not in existing_ids:
-      return True
-    else:
-      return False
+    return not self.lookup.exists(self.cursor, "OperatedBy", "FlightID",
+                                  flight_id)
 
   # setters
   def set_pilot_id(self, pilot_id):
@@ -1289,14 +2542,19 @@ class OperatedByInfo:
   def set_flight_id(self, flight_id):
     self.flight_id = flight_id
 
-  def __str__(self):
-    return self.flight_id + "\n" + self.pilot_id
+  def record(self):
+    return OperatedByRecord(self.flight_id, self.pilot_id)
 
 
 # --------------------------------------------------------------
 class FlightInfo:
 
-  def __init__(self, cursor, conn=None):
+  def __init__(self,
+               cursor,
+               conn=None,
+               lookup=None,
+               interactive=True,
+               archive=None):
     self.flight_id = ''
     self.flight_origin = ''
     self.flight_destination = ''
@@ -1305,7 +2563,19 @@ class FlightInfo:
     self.aircraft_id = ''
     self.cursor = cursor
     self.conn = conn
-    self.valid_status_list = ["Cancelled", "Landed", "Delayed", "Scheduled"]
+    self.lookup = lookup if lookup is not None else KeyLookup()
+    # setters print their messages (menu), or raise them (AirDB)
+    self.interactive = interactive
+    # FlightArchive of the database, if any: archived FlightIDs stay taken
+    self.archive = archive
+    self.valid_status_list = list(validation.VALID_STATUSES)
+
+  # another flight holding the aircraft on the Departure date: one probe of
+  # idx_flights_aircraft_departure
+  sql_aircraft_booked = """SELECT 1 FROM Flights
+                            WHERE AircraftID = ? AND Departure = ?
+                              AND Status <> ? AND FlightID <> ?
+                            LIMIT 1"""
 
   # table interaction functions
 
@@ -1313,7 +2583,7 @@ class FlightInfo:
     '''
     Deletes a Flights table record by its ID
     '''
-    flight_id = input("Enter FlightID, or r to return: ")
+    flight_id = wait_for_input("Enter FlightID, or r to return: ")
     if flight_id == 'r':
       return -1
     else:
@@ -1323,6 +2593,7 @@ class FlightInfo:
         result = self.cursor.rowcount
         print("Rows affected:", str(result))
         self.conn.commit()
+        self.lookup.record_delete("Flights", "FlightID", flight_id)
       else:
         print('Flight ID does not exist.')
         return -1
@@ -1331,22 +2602,22 @@ class FlightInfo:
     '''
     Updates a Flights table record by its ID
     '''
-    flight_id = input("Enter FlightID, or r to return: ")
+    flight_id = wait_for_input("Enter FlightID, or r to return: ")
     if flight_id == 'r':
       return -1
     else:
       id_in_table = self.accepted_flight_id(flight_id) == False
       if id_in_table:
         print('Flight ID found.')
-        if self.set_flight_origin(input("Enter Origin Airport: ")):
-          if self.set_flight_destination(input("Enter Destination Airport: ")):
-            if self.set_flight_departure(input("Enter Departure Date: ")):
-              if self.set_status(input("Enter Flight Status: ")):
-                if self.set_aircraft_id(input("Enter AircraftID: ")):
-                  flight = str(self.__str__()) + "\n" + flight_id
-                  # print(flight)
+        # the flight does not conflict with its own aircraft booking
+        self.flight_id = flight_id
+        if self.set_flight_origin(wait_for_input("Enter Origin Airport: ")):
+          if self.set_flight_destination(wait_for_input("Enter Destination Airport: ")):
+            if self.set_flight_departure(wait_for_input("Enter Departure Date: ")):
+              if self.set_status(wait_for_input("Enter Flight Status: ")):
+                if self.set_aircraft_id(wait_for_input("Enter AircraftID: ")):
                   self.cursor.execute(sql_update_flights_data,
-                                      tuple(flight.split("\n"))[1:])
+                                      self.record(flight_id).update_params())
                   result = self.cursor.rowcount
                   print("Rows affected:", str(result))
                   self.conn.commit()
@@ -1369,22 +2640,22 @@ class FlightInfo:
     '''
       Insert new record to Flights table
       '''
-    flight_id = input("Enter FlightID, or r to return: ")
+    flight_id = wait_for_input("Enter FlightID, or r to return: ")
     if flight_id == 'r':
       return -1
     else:
       if self.set_flight_id(flight_id):
-        if self.set_flight_origin(input("Enter Origin Airport: ")):
-          if self.set_flight_destination(input("Enter Destination Airport: ")):
-            if self.set_flight_departure(input("Enter Departure Date: ")):
-              if self.set_status(input("Enter Flight Status: ")):
-                if self.set_aircraft_id(input("Enter AircraftID: ")):
-                  # print(tuple(str(self.__str__()).split("\n")))
-                  self.cursor.execute(sql_insert_flights,
-                                      tuple(str(self.__str__()).split("\n")))
+        if self.set_flight_origin(wait_for_input("Enter Origin Airport: ")):
+          if self.set_flight_destination(wait_for_input("Enter Destination Airport: ")):
+            if self.set_flight_departure(wait_for_input("Enter Departure Date: ")):
+              if self.set_status(wait_for_input("Enter Flight Status: ")):
+                if self.set_aircraft_id(wait_for_input("Enter AircraftID: ")):
+                  self.cursor.execute(sql_insert_flights, self.record())
                   result = self.cursor.rowcount
                   print("Rows affected:", str(result))
                   self.conn.commit()
+                  self.lookup.record_insert("Flights", "FlightID",
+                                            self.flight_id)
                 else:
                   return -1
               else:
@@ -1398,28 +2669,76 @@ class FlightInfo:
       else:
         return -1
 
+  # non-interactive versions of the functions above (records are passed in)
+  def delete_record(self, sql_delete_flights_data, flight_id):
+    '''
+    Deletes a Flights table record by its ID; returns the number of rows affected
+    '''
+    if self.accepted_flight_id(flight_id):
+      validation.reject(validation.UNKNOWN_ID, self.interactive)
+      return -1
+    self.cursor.execute(sql_delete_flights_data, (flight_id, ))
+    result = self.cursor.rowcount
+    self.conn.commit()
+    self.lookup.record_delete("Flights", "FlightID", flight_id)
+    return result
+
+  def update_record(self, sql_update_flights_data, record):
+    '''
+    Updates a Flights table record (FlightID first); returns the number of rows affected
+    '''
+    flight_id, origin, destination, departure, status, aircraft_id = record
+    if self.accepted_flight_id(flight_id):
+      validation.reject(validation.UNKNOWN_ID, self.interactive)
+      return -1
+    # the flight does not conflict with its own aircraft booking
+    self.flight_id = flight_id
+    if self.set_flight_origin(origin) \
+        and self.set_flight_destination(destination) \
+        and self.set_flight_departure(departure) and self.set_status(status) \
+        and self.set_aircraft_id(aircraft_id):
+      self.cursor.execute(sql_update_flights_data,
+                          self.record(flight_id).update_params())
+      result = self.cursor.rowcount
+      self.conn.commit()
+      return result
+    return -1
+
+  def insert_record(self, sql_insert_flights, record):
+    '''
+    Insert new record to Flights table; returns the number of rows affected
+    '''
+    flight_id, origin, destination, departure, status, aircraft_id = record
+    if self.set_flight_id(flight_id) and self.set_flight_origin(origin) \
+        and self.set_flight_destination(destination) \
+        and self.set_flight_departure(departure) and self.set_status(status) \
+        and self.set_aircraft_id(aircraft_id):
+      self.cursor.execute(sql_insert_flights, self.record())
+      result = self.cursor.rowcount
+      self.conn.commit()
+      self.lookup.record_insert("Flights", "FlightID", self.flight_id)
+      return result
+    return -1
+
   # validation functions
   def accepted_departure_date(self, departure):
     '''
     Validate that the departure input is a date respecting the "YYYY-MM-DD" format
     '''
-    try:
-      datetime.date.fromisoformat(departure)
-      return True
-    except:
-      return False
+    return validation.check_departure(departure) is None
 
   def accepted_flight_id(self, flight_id):
     '''
     Validate that the flight id is not already being used on the Flights table
     '''
-    existing_ids = self.cursor.execute(
-        "SELECT FlightID FROM Flights").fetchall()
-    existing_ids = [i[0] for i in existing_ids]
-    if flight_id not in existing_ids:
-      return True
-    else:
-      return False
+    return not self.lookup.exists(self.cursor, "Flights", "FlightID",
+                                  flight_id)
+
+  def accepted_archived_flight_id(self, flight_id):
+    '''
+    Validate that the flight id is not used by an archived flight
+    '''
+    return self.archive is None or not self.archive.contains_flight(flight_id)
 
   def accepted_flight_destination(self, destination):
     '''
@@ -1431,32 +2750,45 @@ class FlightInfo:
     '''
     Validate that the flight status is a valid term
     '''
-    return status in self.valid_status_list
+    return validation.check_status(status) is None
 
   def accepted_flight_aircraft_id(self, aircraft_id):
     '''
     Validate that the aircraft id exists in the Aircrafts table
     '''
-    existing_ids = self.cursor.execute(
-        "SELECT AircraftID FROM Aircrafts").fetchall()
-    existing_ids = [i[0] for i in existing_ids]
-    return aircraft_id in existing_ids
+    return self.lookup.exists(self.cursor, "Aircrafts", "AircraftID",
+                              aircraft_id)
+
+  def accepted_aircraft_booking(self, aircraft_id):
+    '''
+    Validate that no other flight holds the aircraft on the departure date
+    (set before the aircraft)
+    '''
+    if validation.booking_of(aircraft_id, self.flight_departure,
+                             self.status) is None:
+      return True
+    return self.cursor.execute(
+        self.sql_aircraft_booked,
+        (aircraft_id, self.flight_departure, validation.RELEASED_STATUS,
+         self.flight_id)).fetchone() is None
 
   # setter functions
   def set_flight_id(self, flight_id):
-    if self.accepted_flight_id(flight_id) & (flight_id != "\n"):
+    if self.accepted_flight_id(flight_id) & (flight_id != "\n") \
+        and self.accepted_archived_flight_id(flight_id):
       self.flight_id = flight_id
       return True
     else:
-      print("Invalid Flight ID.")
-      return False
+      return validation.reject(
+          validation.INVALID_ID if flight_id == "\n" else validation.ID_IN_USE,
+          self.interactive)
 
   def set_flight_origin(self, flight_origin):
-    if flight_origin != "\n":
+    if validation.check_origin(flight_origin) is None:
       self.flight_origin = flight_origin
       return True
     else:
-      return False
+      return validation.reject(validation.INVALID_ORIGIN, self.interactive)
 
   def set_flight_destination(self, flight_destination):
     if self.accepted_flight_destination(flight_destination) & (
@@ -1464,8 +2796,8 @@ class FlightInfo:
       self.flight_destination = flight_destination
       return True
     else:
-      print("Flight origin and destination cannot be the same.")
-      return False
+      return validation.reject(validation.SAME_ORIGIN_DESTINATION,
+                               self.interactive)
 
   def set_flight_departure(self, flight_departure):
     if self.accepted_departure_date(flight_departure) & (flight_departure
@@ -1473,115 +2805,1085 @@ class FlightInfo:
       self.flight_departure = flight_departure
       return True
     else:
-      print("Flight departure date must follow the ''YYYY-MM-DD'' format.")
-      return False
+      return validation.reject(validation.INVALID_DEPARTURE, self.interactive)
 
   def set_status(self, status):
     if self.accepted_flight_status(status) & (status != "\n"):
       self.status = status
       return True
     else:
-      print("Status must be a label from the following values:",
-            self.valid_status_list)
-      return False
+      return validation.reject(validation.INVALID_STATUS, self.interactive)
 
   def set_aircraft_id(self, aircraft_id):
     if self.accepted_flight_aircraft_id(aircraft_id) & (aircraft_id != "\n"):
+      if not self.accepted_aircraft_booking(aircraft_id):
+        return validation.reject(validation.AIRCRAFT_BOOKED, self.interactive)
       self.aircraft_id = aircraft_id
       return True
     else:
-      print("The Aircraft ID must be available in the Aircrafts table")
-      return False
+      return validation.reject(validation.UNKNOWN_AIRCRAFT, self.interactive)
 
-  def __str__(self):
-    return self.flight_id + "\n"\
-        + self.flight_origin + "\n"\
-        + self.flight_destination + "\n"\
-        + self.flight_departure + "\n"\
-        + self.status + "\n"\
-        + self.aircraft_id
+  def record(self, flight_id=None):
+    '''
+    The record set by the setters, with flight_id as its PK when given (updates)
+    '''
+    return FlightRecord(self.flight_id if flight_id is None else flight_id,
+                        self.flight_origin, self.flight_destination,
+                        self.flight_departure, self.status, self.aircraft_id)
 
 
 # --------------------------------------------------------------
-db_ops = DBOperations()
-
-while True:
-  print("\n Menu:")
-  print("**********")
-  print('\n----- Database management and review:')
-  print("  1. Create a table")
-  print("  2. Drop a table")
-  print("  3. View available table names")
-  print("  4. View deleted table names")
-  print("  5. Optional bulk data import")
-  print('\n----- Insert, update, delete data:')
-  print("  6. Insert table record")
-  print("  7. Update table values based on PK")
-  print("  8. Delete table record based on PK")
-  print('\n----- Inspect tables:')
-  print("  9. View table (SEL *)")
-  print(" 10. Search table record based on PK")
-  print(" 11. Search table record based on Non-PK attributes")
-  print('\n----- Calculate summary stats:')
-  print(" 12. Number of flights by status")
-  print(" 13. Max passengers capacity by flight status")
-  print(" 14. Pilots professional experience in years")
-  print(" 15. Number of flights by pilot and flight status")
-  print('\n----- ')
-  print(" Type 0 to exit the program\n")
+class AirDB:
+  '''
+  Non-interactive access to the database, for scripts and batch runs.
+  Every call takes its arguments directly and returns rows (or the number of
+  rows affected) instead of prompting for input and printing tables.
+  Invalid input raises ValueError with the validation message. A database
+  whose flights are stored in shards must be opened with ShardedAirDB.
+  '''
+
+  # Flights and OperatedBy are read and written through the shards
+  sharded_storage = False
+
+  info_classes = {
+      DBOperations.PILOTS: PilotsInfo,
+      DBOperations.AIRCRAFTS: AircraftsInfo,
+      DBOperations.FLIGHTS: FlightInfo,
+      DBOperations.OPERATED_BY: OperatedByInfo
+  }
+
+  def __init__(self, db_path="AirDB.db", db_ops=None):
+    self.db_ops = db_ops if db_ops is not None else DBOperations(db_path)
+    # shared with the menu operations: AirDB calls are recorded under their names
+    self.metrics = self.db_ops.metrics
+    # process pool of parallel_summary_stat, started on first use
+    self.parallel = None
+    if not self.sharded_storage and self.db_ops.is_sharded():
+      self.db_ops.pool.close()
+      raise ValueError(self.sharded_message)
+
+  sharded_message = ("The flights of this database are stored in monthly "
+                     "shards: open it with ShardedAirDB (--batch --sharded).")
+
+  def close(self):
+    if self.parallel is not None:
+      self.parallel.close()
+    self.db_ops.pool.close()
+    if self.db_ops.profiler is not None:
+      self.db_ops.profiler.close()
+
+  # ---- helpers
+  def check_table(self, table):
+    if table not in self.db_ops.create_tables_dict:
+      raise ValueError(f"Unknown table: {table}")
+
+  def check_profiling(self):
+    if self.db_ops.profiler is None:
+      raise ValueError("Query profiling is off (see --profile).")
+
+  def run_read(self, function):
+    '''
+    Call function(cursor) with a cursor of a pooled connection
+    '''
+    conn = self.db_ops.pool.acquire()
+    try:
+      return function(conn.cursor())
+    finally:
+      self.db_ops.pool.release(conn)
+
+  def query(self, sql, params=(), cached=False):
+    '''
+    Run a read-only query on a pooled connection and return all rows
+    '''
+    if cached:
+      return self.run_read(lambda cursor: self.db_ops.execute_cached(
+          sql, params, cursor).fetchall())
+    return self.run_read(lambda cursor: self.db_ops.statements.execute(
+        cursor, sql, params).fetchall())
+
+  def stream(self, sql, params=()):
+    '''
+    Yield the rows of a read-only query as they are fetched, a page at a
+    time; the pooled connection is held until the rows are exhausted or the
+    generator is closed
+    '''
+    conn = self.db_ops.pool.acquire()
+    try:
+      cursor = self.db_ops.statements.execute(conn.cursor(), sql, params)
+      while True:
+        rows = cursor.fetchmany(self.db_ops.page_size)
+        if len(rows) == 0:
+          return
+        yield from rows
+    finally:
+      self.db_ops.pool.release(conn)
+
+  def cache_stats(self):
+    '''
+    Hit/miss counters of the result cache
+    '''
+    return self.db_ops.cache.stats()
+
+  def statement_stats(self):
+    '''
+    Reuse counts of the registry's search statements (not the hit rate of
+    sqlite3's statement cache)
+    '''
+    return self.db_ops.statements.stats()
+
+  def query_profile(self, n=10):
+    '''
+    The n statements with the largest total time (calls, times, rows)
+    '''
+    self.check_profiling()
+    return self.db_ops.profiler.top(n)
 
+  def operation_metrics(self):
+    '''
+    Calls, errors, rows and latency quantiles of every operation
+    '''
+    return self.metrics.snapshot()
+
+  def slow_queries(self):
+    '''
+    The latest executions over the slow-query threshold, with their plans
+    '''
+    self.check_profiling()
+    return list(self.db_ops.profiler.slow)
+
+  def columns(self, table):
+    '''
+    Return the column names of a table
+    '''
+    self.check_table(table)
+    return list(
+        self.run_read(
+            lambda cursor: self.db_ops.statements.columns(cursor, table)))
+
+  def write(self, table, method, sql, record):
+    '''
+    Run one of the non-interactive *Info write functions. A rejected value
+    raises validation.ValidationError (a ValueError) with its message
+    '''
+    self.check_table(table)
+    if sql is None:
+      raise ValueError(f"This operation is not supported for {table}.")
+    conn = self.db_ops.pool.acquire()
+    try:
+      if table in SHARDED_TABLES and not self.sharded_storage \
+          and is_sharded(conn.cursor()):
+        # sharded since this instance was opened: main.Flights is not used
+        raise ValueError(self.sharded_message)
+      kwargs = dict()
+      if table == DBOperations.FLIGHTS:
+        kwargs["archive"] = self.db_ops.archive
+      info = self.info_classes[table](cursor=conn.cursor(),
+                                      conn=conn,
+                                      lookup=self.db_ops.lookup,
+                                      interactive=False,
+                                      **kwargs)
+      return getattr(info, method)(sql, record)
+    finally:
+      self.db_ops.pool.release(conn)
+      self.db_ops.bump_data_version()
+
+  # ---- insert, update, delete
+  @measured("insert_data")
+  def insert(self, table, record):
+    '''
+    Insert a record (a sequence of values in column order); returns the rows affected
+    '''
+    return self.write(table, "insert_record",
+                      self.db_ops.insert_tables_dict.get(table),
+                      tuple(str(i) for i in record))
+
+  @measured("update_data")
+  def update(self, table, record):
+    '''
+    Update the record with the PK given as the first value; returns the rows affected
+    '''
+    return self.write(table, "update_record",
+                      self.db_ops.update_tables_dict.get(table),
+                      tuple(str(i) for i in record))
+
+  @measured("delete_data")
+  def delete(self, table, key):
+    '''
+    Delete a record by PK (a (FlightID, PilotID) pair for OperatedBy); returns the rows affected
+    '''
+    if table == DBOperations.OPERATED_BY:
+      key = tuple(str(i) for i in key)
+    return self.write(table, "delete_record",
+                      self.db_ops.delete_tables_dict.get(table), key)
+
+  # ---- select and search
+  def archived_rows(self, table, sql, params=()):
+    '''
+    Rows of a query run on the archive (none for the tables never archived)
+    '''
+    if self.db_ops.archive is None or table not in (DBOperations.FLIGHTS,
+                                                    DBOperations.OPERATED_BY):
+      return []
+    return self.db_ops.archive.query(sql, params)
+
+  @measured("select_all")
+  def select_all(self, table, archived=False):
+    '''
+    Every row of a table; archived adds the archived flights
+    '''
+    self.check_table(table)
+    sql = self.db_ops.sql_select_all + table
+    rows = self.query(sql)
+    if archived:
+      rows += self.archived_rows(table, sql)
+    return rows
+
+  def records(self, table, archived=False):
+    '''
+    Every row of a table as typed records (see records.py)
+    '''
+    return from_rows(table, self.select_all(table, archived))
+
+  def export(self, table, output_format="csv", out=None):
+    '''
+    Stream every row of a table to out (stdout by default) as csv, tsv,
+    jsonl or an aligned table; returns the number of rows written
+    '''
+    self.check_table(table)
+
+    def run(cursor):
+      cursor.execute(self.db_ops.sql_select_all + table)
+      renderer = make_renderer(output_format,
+                               [i[0] for i in cursor.description], out)
+      return renderer.render(cursor)
+
+    return self.run_read(run)
+
+  def export_columnar(self, out_dir, tables=None):
+    '''
+    Write tables (all four by default) to columnar files in out_dir, from one
+    snapshot of the database; returns {table: path}. Read the files back with
+    columnar_export.ColumnarTable
+    '''
+    tables = tables or list(self.db_ops.create_tables_dict)
+    for table in tables:
+      self.check_table(table)
+    return self.run_read(lambda cursor: export_tables(
+        cursor.connection, out_dir, tables, self.db_ops.prim_key_tables_dict))
+
+  @measured("search_data")
+  def get(self, table, key, archived=False):
+    '''
+    Search a table by PK (a (FlightID, PilotID) pair for OperatedBy); the
+    archive is searched as well when archived is set
+    '''
+    self.check_table(table)
+    params = tuple(key) if table == DBOperations.OPERATED_BY else (key, )
+    sql = self.run_read(
+        lambda cursor: self.db_ops.statements.search_pk(cursor, table))
+    rows = self.query(sql, params, cached=True)
+    if archived:
+      rows += self.archived_rows(table, sql, params)
+    return rows
+
+  @measured("search_data_by_non_pk")
+  def search(self, table, column, value, archived=False):
+    '''
+    Search a table by the value of any of its columns; the archive is
+    searched as well when archived is set
+    '''
+    self.check_table(table)
+    sql = self.run_read(
+        lambda cursor: self.db_ops.statements.search(cursor, table, column))
+    rows = self.query(sql, (value, ), cached=True)
+    if archived:
+      rows += self.archived_rows(table, sql, (value, ))
+    return rows
+
+  def pilot_roster(self, pilot_id, low=None, high=None):
+    '''
+    The flights a pilot operates between two dates (inclusive; None for no
+    bound), with their aircraft, ordered by Departure: (FlightID, Departure,
+    Origin, Destination, Status, AircraftID, Manufacturer, Model) rows,
+    streamed (see stream)
+    '''
+    return self.stream(self.db_ops.sql_pilot_roster,
+                       self.db_ops.roster_params(pilot_id, low, high))
+
+  def filter(self, table, conditions):
+    '''
+    Rows of a table matching every condition: a condition string such as
+    "Departure between 2024-04-01 and 2024-06-30 and Status = Delayed", or
+    (column, operator, values) tuples (see query_builder)
+    '''
+    predicates = query_builder.as_predicates(conditions)
+    sql, params = self.run_read(
+        lambda cursor: self.db_ops.filter_query(cursor, table, predicates))
+    return self.query(sql, params)
+
+  def filter_plan(self, table, conditions):
+    '''
+    The query plan of filter(table, conditions), one line per step
+    '''
+    predicates = query_builder.as_predicates(conditions)
+    return self.run_read(lambda cursor: query_builder.plan(
+        cursor, *self.db_ops.filter_query(cursor, table, predicates)))
+
+  def text_search(self, table, text, prefix=True, limit=50):
+    '''
+    Rows of Flights (by Origin and Destination) or Pilots (by names and
+    school) matching every word of text, or every word prefix when prefix
+    is set; the limit best matches, best first
+    '''
+    if table not in TEXT_INDEXES:
+      raise ValueError("Full-text search covers the Flights and Pilots tables.")
+    return self.run_read(lambda cursor: TEXT_INDEXES[table].search(
+        cursor, text, prefix, limit).fetchall())
+
+  def double_bookings(self):
+    '''
+    (AircraftID, Departure, FlightIDs) for every aircraft assigned to more
+    than one (not cancelled) flight on the same Departure date
+    '''
+    return self.db_ops.group_bookings(
+        self.query(self.db_ops.sql_double_bookings))
+
+  @measured("calc_summary_stat")
+  def summary_stat(self, qid):
+    '''
+    Return the rows of one of the summary statistics (1 to 4)
+    '''
+    if qid not in self.db_ops.summary_queries:
+      raise ValueError("Summary statistics are numbered 1 to 4.")
+    conn = self.db_ops.pool.acquire()
+    try:
+      cursor = conn.cursor()
+      result = self.db_ops.execute_cached(
+          self.db_ops.get_summary_query(qid, cursor), (), cursor)
+      return self.db_ops.summary_with_archive(qid, result).fetchall()
+    finally:
+      self.db_ops.pool.release(conn)
+
+  def parallel_summary_stat(self, qid, workers=None):
+    '''
+    Compute summary statistic 1, 2 or 4 from the tables over Departure
+    ranges in worker processes, plus the archive; returns the rows of the
+    serial query
+    '''
+    if self.parallel is None or (workers and
+                                 workers != self.parallel.workers):
+      if self.parallel is not None:
+        self.parallel.close()
+      self.parallel = ParallelSummary(self.db_ops.pool.db_path, workers)
+    rows = self.run_read(lambda cursor: self.parallel.run(qid, cursor))
+    # plus the archived totals, as in summary_stat
+    return self.db_ops.summary_with_archive(qid, CachedResult(None,
+                                                              rows)).fetchall()
+
+  def import_file(self, table, path, reject_path=None):
+    return self.db_ops.import_file(table, path, reject_path)
+
+  def archive_flights(self, older_than_days, batch_size=5000):
+    '''
+    Move the Landed and Cancelled flights older than older_than_days (and
+    their OperatedBy rows) to the archive database; returns an ArchiveResult
+    '''
+    return self.db_ops.archive_flights(older_than_days, batch_size)
+
+  def create_table(self, table):
+    '''
+    Create one of the tables of the schema (with its indexes)
+    '''
+    self.check_table(table)
+    try:
+      self.db_ops.get_connection()
+      self.db_ops.cur.execute(self.db_ops.create_tables_dict[table])
+      self.db_ops.create_indexes(table)
+      self.db_ops.refresh_summary_tables()
+      self.db_ops.refresh_text_indexes()
+      self.db_ops.conn.commit()
+      self.db_ops.lookup.invalidate(table)
+      self.db_ops.statements.invalidate(table)
+      self.db_ops.bump_data_version()
+    finally:
+      self.db_ops.release_connection()
+
+  def drop_table(self, table):
+    self.check_table(table)
+    try:
+      self.db_ops.get_connection()
+      self.db_ops.cur.execute(self.db_ops.sql_drop_table_query + table)
+      self.db_ops.refresh_summary_tables()
+      self.db_ops.refresh_text_indexes()
+      self.db_ops.conn.commit()
+      self.db_ops.lookup.invalidate(table)
+      self.db_ops.statements.invalidate(table)
+      self.db_ops.bump_data_version()
+    finally:
+      self.db_ops.release_connection()
+
+
+# --------------------------------------------------------------
+class ConcurrentAirDB(AirDB):
+  '''
+  AirDB shared by several threads: the database runs in WAL mode, every
+  thread reads through its own read-only connection, and all writes are
+  serialized through a single writer thread. Readers are never blocked by the
+  writer; within snapshot() they see one consistent state of the database.
+  Reads bypass the result cache, which is not shared between threads.
+  '''
+
+  def __init__(self, db_path="AirDB.db", db_ops=None):
+    super().__init__(db_path, db_ops)
+    # NORMAL is durable enough in WAL mode and saves a sync per commit
+    self.db_ops.pool.pragmas["synchronous"] = "NORMAL"
+    conn = self.db_ops.pool.acquire()
+    try:
+      enable_wal(conn)
+      conn.execute("PRAGMA synchronous = NORMAL")
+    finally:
+      self.db_ops.pool.release(conn)
+    self.readers = ReaderConnections(self.db_ops.pool.db_path,
+                                     self.db_ops.pool.cached_statements,
+                                     self.db_ops.profiler,
+                                     self.db_ops.statements.forget)
+    self.writer = concurrent.futures.ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="airdb-writer")
+
+  def close(self):
+    self.writer.shutdown(wait=True)
+    self.readers.close()
+    super().close()
+
+  def snapshot(self):
+    '''
+    Context manager: the reads of the calling thread inside the block all
+    see the same snapshot
+    '''
+    return self.readers.snapshot()
+
+  # ---- reads: on the calling thread, with its reader connection
+  def run_read(self, function):
+    return function(self.readers.connection().cursor())
+
+  def query(self, sql, params=(), cached=False):
+    return self.run_read(lambda cursor: self.db_ops.statements.execute(
+        cursor, sql, params).fetchall())
+
+  def stream(self, sql, params=()):
+    cursor = self.db_ops.statements.execute(
+        self.readers.connection().cursor(), sql, params)
+    while True:
+      rows = cursor.fetchmany(self.db_ops.page_size)
+      if len(rows) == 0:
+        return
+      yield from rows
+
+  @measured("calc_summary_stat")
+  def summary_stat(self, qid):
+    if qid not in self.db_ops.summary_queries:
+      raise ValueError("Summary statistics are numbered 1 to 4.")
+    with self.snapshot() as cursor:
+      result = cursor.execute(self.db_ops.get_summary_query(qid, cursor))
+      return self.db_ops.summary_with_archive(qid, result).fetchall()
+
+  # ---- writes: queued for the writer thread
+  def submit(self, function, *args):
+    '''
+    Queue a write and return its Future
+    '''
+    return self.writer.submit(function, *args)
+
+  def write(self, table, method, sql, record):
+    return self.submit(super().write, table, method, sql, record).result()
+
+  def import_file(self, table, path, reject_path=None):
+    return self.submit(super().import_file, table, path, reject_path).result()
+
+  def archive_flights(self, older_than_days, batch_size=5000):
+    return self.submit(super().archive_flights, older_than_days,
+                       batch_size).result()
+
+  def create_table(self, table):
+    return self.submit(super().create_table, table).result()
+
+  def drop_table(self, table):
+    return self.submit(super().drop_table, table).result()
+
+
+# --------------------------------------------------------------
+class ShardedAirDB(AirDB):
+  '''
+  AirDB storing Flights and OperatedBy in one database file per Departure
+  month (see sharding.py). Writes to those tables are routed to the shard of
+  the flight; reads run the usual queries over union views of the shards.
+  Rows already in the main database are moved to the shards by migrate().
+  The summary statistics are always computed from the tables, as the
+  materialized summary only follows the main Flights table
+  '''
+
+  sharded_storage = True
+
+  def __init__(self,
+               db_path="AirDB.db",
+               db_ops=None,
+               shard_dir=None,
+               max_attached=None):
+    super().__init__(db_path, db_ops)
+    ops = self.db_ops
+    schema = [
+        ops.sql_create_flights_table_firsttime,
+        ops.sql_create_operated_by_table_firsttime
+    ] + [
+        ops.sql_create_index.format(name=name,
+                                    table=table,
+                                    columns=", ".join(columns))
+        for name, (table, columns) in ops.indexes_dict.items()
+        if table in SHARDED_TABLES
+    ]
+    self.shards = ShardedFlights(ops.pool.db_path, shard_dir, schema,
+                                 max_attached, ops.profiler)
+
+  def close(self):
+    self.shards.close()
+    super().close()
+
+  def migrate(self):
+    '''
+    Move the flights of the main database to the shards; returns their number
+    '''
+    try:
+      return self.shards.migrate()
+    finally:
+      self.db_ops.bump_data_version()
+
+  def import_file(self, table, path, reject_path=None):
+    '''
+    As AirDB.import_file; imported Flights and OperatedBy rows are then moved
+    to the shards
+    '''
+    report = super().import_file(table, path, reject_path)
+    if table in SHARDED_TABLES:
+      self.migrate()
+    return report
+
+  # ---- writes routed to the shards
+  def routed_write(self, function, *args):
+    '''
+    Run a write of the shards, invalidating the cached results as AirDB.write
+    does
+    '''
+    try:
+      return function(*args)
+    finally:
+      self.db_ops.bump_data_version()
+
+  @measured("insert_data")
+  def insert(self, table, record):
+    record = [str(i) for i in record]
+    if table == DBOperations.FLIGHTS:
+      return self.routed_write(self.shards.insert_flight, record)
+    if table == DBOperations.OPERATED_BY:
+      return self.routed_write(self.shards.insert_operated_by, *record)
+    return super().insert(table, record)
+
+  @measured("update_data")
+  def update(self, table, record):
+    if table == DBOperations.FLIGHTS:
+      return self.routed_write(self.shards.update_flight,
+                               [str(i) for i in record])
+    return super().update(table, record)
+
+  @measured("delete_data")
+  def delete(self, table, key):
+    if table == DBOperations.FLIGHTS:
+      return self.routed_write(self.shards.delete_flight, str(key))
+    if table == DBOperations.OPERATED_BY:
+      return self.routed_write(self.shards.delete_operated_by,
+                               *[str(i) for i in key])
+    return super().delete(table, key)
+
+  # ---- reads over the union views
+  @measured("select_all")
+  def select_all(self, table, archived=False):
+    if table in SHARDED_TABLES:
+      return self.shards.query(self.db_ops.sql_select_all + table)
+    return super().select_all(table, archived)
+
+  def export(self, table, output_format="csv", out=None):
+    if table in SHARDED_TABLES:
+      renderer = make_renderer(output_format, self.columns(table), out)
+      return renderer.render(self.select_all(table))
+    return super().export(table, output_format, out)
+
+  def export_columnar(self, out_dir, tables=None):
+    '''
+    As AirDB.export_columnar, reading Flights and OperatedBy through the union
+    views (every shard attached at once)
+    '''
+    tables = tables or list(self.db_ops.create_tables_dict)
+    for table in tables:
+      self.check_table(table)
+    return self.shards.read_all(lambda conn: export_tables(
+        conn, out_dir, tables, self.db_ops.prim_key_tables_dict))
+
+  @measured("search_data")
+  def get(self, table, key, archived=False):
+    if table == DBOperations.FLIGHTS:
+      return self.shards.get_flight(key)
+    if table == DBOperations.OPERATED_BY:
+      return self.shards.query(
+          "SELECT * FROM OperatedBy WHERE FlightID = ? AND PilotID = ?",
+          tuple(key))
+    return super().get(table, key, archived)
+
+  @measured("search_data_by_non_pk")
+  def search(self, table, column, value, archived=False):
+    if table in SHARDED_TABLES:
+      sql = self.run_read(
+          lambda cursor: self.db_ops.statements.search(cursor, table, column))
+      return self.shards.query(sql, (value, ))
+    return super().search(table, column, value, archived)
+
+  @measured("calc_summary_stat")
+  def summary_stat(self, qid):
+    if qid not in self.db_ops.summary_queries:
+      raise ValueError("Summary statistics are numbered 1 to 4.")
+    return self.shards.summary_stat(qid, self.db_ops.summary_queries[qid])
+
+  def parallel_summary_stat(self, qid, workers=None):
+    '''
+    The worker processes read the main Flights table only: the statistic is
+    computed over the shards by summary_stat instead
+    '''
+    if qid not in partial_queries:
+      raise ValueError("Only summary statistics 1, 2 and 4 run in parallel.")
+    return self.summary_stat(qid)
+
+  def pilot_roster(self, pilot_id, low=None, high=None):
+    '''
+    As AirDB.pilot_roster, reading the shards of the months in range only
+    '''
+    params = self.db_ops.roster_params(pilot_id, low, high)
+    batches = self.shards.run(self.db_ops.sql_pilot_roster, params, low or None,
+                              high or None)
+    if len(batches) == 1:
+      return iter(batches[0])
+    # the main tables (first batch) may hold flights of any month
+    return iter(
+        sorted((row for rows in batches for row in rows),
+               key=lambda row: (row[1], row[0])))
+
+  def filter(self, table, conditions):
+    if table in SHARDED_TABLES:
+      predicates = query_builder.as_predicates(conditions)
+      sql, params = self.run_read(
+          lambda cursor: self.db_ops.filter_query(cursor, table, predicates))
+      # only the shards of the months the Departure conditions allow
+      low, high = query_builder.bounds(predicates, "Departure")
+      return [
+          row for rows in self.shards.run(sql, params, low, high)
+          for row in rows
+      ]
+    return super().filter(table, conditions)
+
+  def filter_plan(self, table, conditions):
+    if table in SHARDED_TABLES:
+      predicates = query_builder.as_predicates(conditions)
+      sql, params = self.run_read(
+          lambda cursor: self.db_ops.filter_query(cursor, table, predicates))
+      low, high = query_builder.bounds(predicates, "Departure")
+      # the plan over the union view of the first batch of shards
+      return [
+          i[3] for i in self.shards.run("EXPLAIN QUERY PLAN " + sql, params,
+                                        low, high)[0]
+      ]
+    return super().filter_plan(table, conditions)
+
+  def text_search(self, table, text, prefix=True, limit=50):
+    if table in SHARDED_TABLES:
+      # the index follows the main Flights table only
+      raise ValueError(f"Full-text search of {table} is not available with "
+                       "sharded storage.")
+    return super().text_search(table, text, prefix, limit)
+
+  def double_bookings(self):
+    # the flights of a Departure date are in one shard, so every batch of
+    # shards is checked on its own (the rows not yet migrated out of the main
+    # tables are only compared with the first batch)
+    rows = self.shards.query(self.db_ops.sql_double_bookings)
+    rows.sort()
+    return self.db_ops.group_bookings(rows)
+
+  def flights_between(self, low, high):
+    '''
+    Flights departing between two dates (inclusive), ordered by Departure;
+    only the shards of those months are read
+    '''
+    return self.shards.between(
+        """SELECT * FROM Flights WHERE Departure BETWEEN ? AND ?
+            ORDER BY Departure""", low, high)
+
+
+# --------------------------------------------------------------
+def run_batch(airdb, commands, out=sys.stdout):
+  '''
+  Run a file of commands (one per line, shell-style quoting) in one process and
+  write one JSON result per command. Returns the number of failed commands.
+
+    insert <table> <values...>      update <table> <pk> <values...>
+    delete <table> <pk...>          get <table> <pk...>
+    search <table> <column> <value> select <table>
+    stat <1-4>                      pstat <1|2|4> [workers]
+    import <table> <path>           archive <days>
+    search-archived <table> <column> <value>
+    create <table>                  drop <table>
+    cache-stats                     statement-stats
+    profile [n]                     slow-queries
+    metrics                         roster <pilot> [from] [to]
+    double-bookings
+    text-search <table> <words...>  text-search-words <table> <words...>
+    filter <table> <conditions...>
+    between <date> <date>           migrate-shards   (with --sharded)
+  '''
+  failed = 0
+  for line_no, line in enumerate(commands, start=1):
+    line = line.strip()
+    if line == "" or line.startswith("#"):
+      continue
+    result = {"line": line_no, "command": line}
+    try:
+      command, *args = shlex.split(line)
+      if command == "insert":
+        result["rows_affected"] = airdb.insert(args[0], args[1:])
+      elif command == "update":
+        result["rows_affected"] = airdb.update(args[0], args[1:])
+      elif command == "delete":
+        key = args[1:] if args[0] == DBOperations.OPERATED_BY else args[1]
+        result["rows_affected"] = airdb.delete(args[0], key)
+      elif command == "get":
+        key = args[1:] if args[0] == DBOperations.OPERATED_BY else args[1]
+        result["rows"] = airdb.get(args[0], key)
+      elif command == "search":
+        result["rows"] = airdb.search(args[0], args[1], args[2])
+      elif command == "search-archived":
+        result["rows"] = airdb.search(args[0],
+                                      args[1],
+                                      args[2],
+                                      archived=True)
+      elif command == "select":
+        result["rows"] = airdb.select_all(args[0])
+      elif command == "stat":
+        result["rows"] = airdb.summary_stat(int(args[0]))
+      elif command == "pstat":
+        result["rows"] = airdb.parallel_summary_stat(
+            int(args[0]), int(args[1]) if len(args) > 1 else None)
+      elif command == "import":
+        result.update(airdb.import_file(args[0], args[1]).as_dict())
+      elif command == "archive":
+        result.update(airdb.archive_flights(int(args[0])).as_dict())
+      elif command == "create":
+        airdb.create_table(args[0])
+      elif command == "drop":
+        airdb.drop_table(args[0])
+      elif command == "cache-stats":
+        result["cache"] = airdb.cache_stats()
+      elif command == "statement-stats":
+        result["statements"] = airdb.statement_stats()
+      elif command == "profile":
+        result["statements"] = airdb.query_profile(
+            int(args[0]) if len(args) > 0 else 10)
+      elif command == "slow-queries":
+        result["slow"] = airdb.slow_queries()
+      elif command == "metrics":
+        result["metrics"] = airdb.operation_metrics()
+      elif command in ("text-search", "text-search-words"):
+        result["rows"] = airdb.text_search(args[0],
+                                           " ".join(args[1:]),
+                                           prefix=command == "text-search")
+      elif command == "filter":
+        predicates = query_builder.parse_predicates(args[1:])
+        result["plan"] = airdb.filter_plan(args[0], predicates)
+        result["rows"] = airdb.filter(args[0], predicates)
+      elif command == "double-bookings":
+        result["bookings"] = airdb.double_bookings()
+      elif command == "roster":
+        result["rows"] = list(airdb.pilot_roster(args[0], *args[1:3]))
+      elif command in ("between", "migrate-shards"):
+        if not isinstance(airdb, ShardedAirDB):
+          raise ValueError(f"{command} is only available with --sharded.")
+        if command == "between":
+          result["rows"] = airdb.flights_between(args[0], args[1])
+        else:
+          result["moved"] = airdb.migrate()
+      else:
+        raise ValueError(f"Unknown command: {command}")
+      result["ok"] = True
+    except (ValueError, IndexError, sqlite3.Error) as e:
+      failed += 1
+      result["ok"] = False
+      result["error"] = str(e) or e.__class__.__name__
+    out.write(json.dumps(result, default=str) + "\n")
+  return failed
+
+
+# --------------------------------------------------------------
+def run_menu(db_ops):
+  '''
+  Interactive menu
+  '''
+  if db_ops.is_sharded():
+    # the menu operations read and write the main Flights table only
+    print("The flights of this database are stored in monthly shards. "
+          "Use --batch, --dump or --export-columnar instead of the menu.")
+    db_ops.pool.close()
+    return
+  while True:
+    print("\n Menu:")
+    print("**********")
+    print('\n----- Database management and review:')
+    print("  1. Create a table")
+    print("  2. Drop a table")
+    print("  3. View available table names")
+    print("  4. View deleted table names")
+    print("  5. Optional bulk data import")
+    print('\n----- Insert, update, delete data:')
+    print("  6. Insert table record")
+    print("  7. Update table values based on PK")
+    print("  8. Delete table record based on PK")
+    print('\n----- Inspect tables:')
+    print("  9. View table (SEL *)")
+    print(" 10. Search table record based on PK")
+    print(" 11. Search table record based on Non-PK attributes")
+    print('\n----- Calculate summary stats:')
+    print(" 12. Number of flights by status")
+    print(" 13. Max passengers capacity by flight status")
+    print(" 14. Pilots professional experience in years")
+    print(" 15. Number of flights by pilot and flight status")
+    print('\n----- Indexes:')
+    print(" 16. Manage secondary indexes")
+    print('\n----- File import:')
+    print(" 17. Import table records from a CSV or JSONL file")
+    print('\n----- Summary tables:')
+    print(" 18. Check or rebuild the materialized summary statistics")
+    print('\n----- Archive:')
+    print(" 19. Archive completed flights")
+    print(" 20. Search archived flights")
+    print('\n----- Profiling:')
+    print(" 21. Top statements by total time, and slow queries")
+    print(" 22. Latency and counts of the menu operations")
+    print('\n----- Pilots:')
+    print(" 23. Flights of a pilot between two dates (roster)")
+    print('\n----- Aircrafts:')
+    print(" 24. Aircrafts assigned to more than one flight on the same day")
+    print('\n----- Full-text search:')
+    print(" 25. Search airport names, pilot names and schools by words")
+    print('\n----- Search by conditions:')
+    print(" 26. Search a table by several conditions (ranges, IN lists)")
+    print('\n----- ')
+    print(" Type 0 to exit the program\n")
+
+    try:
+      __choose_menu = int(wait_for_input("Enter your choice: "))
+      print("\n")
+    except:
+      __choose_menu = None
+      print(
+          "Please use numeric input to interact with the database or to exit the program.\n"
+      )
+
+    # ---
+    if __choose_menu == 1:
+      db_ops.create_table()
+    elif __choose_menu == 2:
+      db_ops.drop_table()
+    elif __choose_menu == 3:
+      db_ops.get_available_tables()
+    elif __choose_menu == 4:
+      db_ops.get_deleted_tables()
+    elif __choose_menu == 5:
+      db_ops.bulk_import_seed_data()
+    # ---
+    elif __choose_menu == 6:
+      db_ops.insert_data()
+    elif __choose_menu == 7:
+      db_ops.update_data()
+    elif __choose_menu == 8:
+      db_ops.delete_data()
+    # ---
+    elif __choose_menu == 9:
+      db_ops.select_all()
+    elif __choose_menu == 10:
+      db_ops.search_data()
+    elif __choose_menu == 11:
+      db_ops.search_data_by_non_pk()
+    # ---
+    elif __choose_menu == 12:
+      db_ops.calc_summary_stat(1)
+    elif __choose_menu == 13:
+      db_ops.calc_summary_stat(2)
+    elif __choose_menu == 14:
+      db_ops.calc_summary_stat(3)
+    elif __choose_menu == 15:
+      db_ops.calc_summary_stat(4)
+    # ---
+    elif __choose_menu == 16:
+      db_ops.manage_indexes()
+    elif __choose_menu == 17:
+      db_ops.bulk_import_file()
+    elif __choose_menu == 18:
+      db_ops.manage_summary_tables()
+    elif __choose_menu == 19:
+      db_ops.archive_completed_flights()
+    elif __choose_menu == 20:
+      db_ops.search_archive()
+    elif __choose_menu == 21:
+      db_ops.print_query_profile()
+    elif __choose_menu == 22:
+      db_ops.print_metrics()
+    elif __choose_menu == 23:
+      db_ops.print_pilot_roster()
+    elif __choose_menu == 24:
+      db_ops.print_double_bookings()
+    elif __choose_menu == 25:
+      db_ops.text_search()
+    elif __choose_menu == 26:
+      db_ops.filter_table()
+
+    elif __choose_menu == 0:
+      db_ops.pool.close()
+      if db_ops.profiler is not None:
+        db_ops.profiler.close()
+      print("Goodbye..\n")
+      return
+    elif __choose_menu is None:
+      pass
+    else:
+      print("Invalid Choice\n")
+
+
+def main():
+  parser = argparse.ArgumentParser(description="AirDB")
+  parser.add_argument("--db", default="AirDB.db", help="database file")
+  parser.add_argument(
+      "--batch",
+      metavar="FILE",
+      help="run the commands in FILE ('-' for stdin) instead of the menu")
+  parser.add_argument(
+      "--serve",
+      metavar="ADDRESS",
+      help="serve JSON-lines requests on a Unix socket path or a host:port")
+  parser.add_argument("--workers",
+                      type=int,
+                      default=4,
+                      help="threads running the requests of --serve")
+  parser.add_argument("--timeout",
+                      type=float,
+                      default=10.0,
+                      help="seconds before a --serve request times out")
+  parser.add_argument("--dump",
+                      metavar="TABLE",
+                      help="write every row of TABLE to stdout and exit")
+  parser.add_argument("--format",
+                      choices=FORMATS,
+                      default="csv",
+                      help="output format of --dump")
+  parser.add_argument(
+      "--export-columnar",
+      metavar="DIR",
+      help="write every table to a columnar file in DIR and exit")
+  parser.add_argument(
+      "--sharded",
+      action="store_true",
+      help="store Flights in one file per month (with --batch; a database "
+      "already sharded is always opened this way)")
+  parser.add_argument(
+      "--profile",
+      action="store_true",
+      help="time every statement (query profile and slow queries; about "
+      "6 us per execute)")
+  parser.add_argument("--slow-log",
+                      metavar="FILE",
+                      help="write statements slower than --slow-ms to FILE "
+                      "(implies --profile)")
+  parser.add_argument("--slow-ms",
+                      type=float,
+                      default=100.0,
+                      help="slow-query threshold in milliseconds")
+  parser.add_argument(
+      "--metrics-file",
+      metavar="FILE",
+      help="write the operation metrics to FILE on exit (JSON for *.json, "
+      "Prometheus text otherwise)")
+  parser.add_argument("--metrics-sample-rate",
+                      type=float,
+                      default=1.0,
+                      help="share of the calls whose latency is measured")
+  args = parser.parse_args()
+  profiler = None
+  if args.profile or args.slow_log is not None:
+    profiler = QueryProfiler(args.slow_ms / 1000, args.slow_log)
+  metrics = Metrics(args.metrics_sample_rate)
+  if args.metrics_file is not None:
+    atexit.register(metrics.dump, args.metrics_file)
+
+  db_ops = DBOperations(args.db, profiler, metrics)
+  # a sharded database is always opened with ShardedAirDB
+  sharded = args.sharded or db_ops.is_sharded()
+  open_airdb = ShardedAirDB if sharded else AirDB
+
+  if args.export_columnar is not None:
+    airdb = open_airdb(args.db, db_ops)
+    try:
+      for table, path in airdb.export_columnar(args.export_columnar).items():
+        print(table, "->", path)
+    finally:
+      airdb.close()
+    return
+
+  if args.dump is not None:
+    airdb = open_airdb(args.db, db_ops)
+    try:
+      airdb.export(args.dump, args.format)
+    except ValueError as e:
+      print(e, file=sys.stderr)
+      sys.exit(1)
+    except BrokenPipeError:
+      # the reading end (e.g. head) stopped early: discard the rest quietly
+      os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+      airdb.close()
+    return
+
+  if args.serve is not None:
+    if sharded:
+      print("A sharded database cannot be served.", file=sys.stderr)
+      sys.exit(1)
+    airdb = ConcurrentAirDB(args.db, db_ops)
+    try:
+      print("Serving AirDB on", args.serve)
+      serve(airdb, args.serve, workers=args.workers, timeout=args.timeout)
+    finally:
+      airdb.close()
+    return
+
+  if args.batch is None:
+    run_menu(db_ops)
+    return
+
+  airdb = open_airdb(args.db, db_ops)
   try:
-    __choose_menu = int(input("Enter your choice: "))
-    print("\n")
-  except:
-    __choose_menu = None
-    print(
-        "Please use numeric input to interact with the database or to exit the program.\n"
-    )
-
-  # ---
-  if __choose_menu == 1:
-    db_ops.create_table()
-  elif __choose_menu == 2:
-    db_ops.drop_table()
-  elif __choose_menu == 3:
-    db_ops.get_available_tables()
-  elif __choose_menu == 4:
-    db_ops.get_deleted_tables()
-  elif __choose_menu == 5:
-    db_ops.bulk_import_seed_data()
-  # ---
-  elif __choose_menu == 6:
-    db_ops.insert_data()
-  elif __choose_menu == 7:
-    db_ops.update_data()
-  elif __choose_menu == 8:
-    db_ops.delete_data()
-  # ---
-  elif __choose_menu == 9:
-    db_ops.select_all()
-  elif __choose_menu == 10:
-    db_ops.search_data()
-  elif __choose_menu == 11:
-    db_ops.search_data_by_non_pk()
-  # ---
-  elif __choose_menu == 12:
-    db_ops.calc_summary_stat(1)
-  elif __choose_menu == 13:
-    db_ops.calc_summary_stat(2)
-  elif __choose_menu == 14:
-    db_ops.calc_summary_stat(3)
-  elif __choose_menu == 15:
-    db_ops.calc_summary_stat(4)
-  elif __choose_menu == 16:
-    db_ops.calc_summary_stat(4)
-
-  elif __choose_menu == 0:
-    print("Goodbye..\n")
-    exit(0)
-  elif __choose_menu is None:
-    pass
-  else:
-    print("Invalid Choice\n")
+    if args.batch == "-":
+      failed = run_batch(airdb, sys.stdin)
+    else:
+      with open(args.batch, encoding="utf-8") as commands:
+        failed = run_batch(airdb, commands)
+  finally:
+    airdb.close()
+  sys.exit(1 if failed > 0 else 0)
+
+
+if __name__ == "__main__":
+  main()
 
 # -- END -- 2024 May 26, 11:01 UTC
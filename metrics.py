@@ -0,0 +1,278 @@
+'''
+Per-operation metrics: calls, errors and rows of every operation, and
+latency histograms (p50, p95, p99) for a configurable sample of the calls.
+Operations are measured with the measured(name) decorator; the time spent
+waiting for user input (see wait_for_input) is not part of their latency.
+Metrics.prometheus() and Metrics.json() export the current values.
+'''
+import builtins
+import functools
+import json
+import math
+import random
+import threading
+from time import perf_counter
+
+# observation of the operation running on the current thread
+current = threading.local()
+
+
+# --------------------------------------------------------------
+class Observation:
+  '''
+  What one call of an operation did, filled in while it runs
+  '''
+
+  __slots__ = ("rows", "error", "waited")
+
+  def __init__(self):
+    self.rows = None
+    self.error = False
+    self.waited = 0.0
+
+
+def observe_rows(rows):
+  '''
+  Set the rows returned or affected by the operation being measured
+  '''
+  observation = getattr(current, "observation", None)
+  if observation is not None:
+    observation.rows = rows
+
+
+def observe_error():
+  '''
+  Count the operation being measured as failed (for errors that are caught
+  and reported to the user instead of raised)
+  '''
+  observation = getattr(current, "observation", None)
+  if observation is not None:
+    observation.error = True
+
+
+def wait_for_input(prompt=""):
+  '''
+  builtins.input, with the time spent waiting left out of the latency of
+  the operation being measured
+  '''
+  observation = getattr(current, "observation", None)
+  if observation is None:
+    return builtins.input(prompt)
+  start = perf_counter()
+  try:
+    return builtins.input(prompt)
+  finally:
+    observation.waited += perf_counter() - start
+
+
+# --------------------------------------------------------------
+class LatencyHistogram:
+  '''
+  Counts of latencies in logarithmic buckets: bucket i holds values up to
+  smallest * growth**i, so a quantile is known within the bucket width
+  (about 9%). Values over the last bucket go to an overflow bucket
+  '''
+
+  smallest = 1e-6
+  growth = 2**(1 / 8)
+  buckets = 240  # up to about a minute
+
+  def __init__(self):
+    self.counts = [0] * (self.buckets + 1)
+    self.count = 0
+    self.sum = 0.0
+    self.max = 0.0
+    self.log_growth = math.log(self.growth)
+
+  def add(self, seconds):
+    if seconds <= self.smallest:
+      i = 0
+    else:
+      i = min(math.ceil(math.log(seconds / self.smallest) / self.log_growth),
+              self.buckets)
+    self.counts[i] += 1
+    self.count += 1
+    self.sum += seconds
+    if seconds > self.max:
+      self.max = seconds
+
+  def quantile(self, q):
+    '''
+    Upper bound of the bucket holding the q-quantile (None without values)
+    '''
+    if self.count == 0:
+      return None
+    rank = max(1, math.ceil(q * self.count))
+    seen = 0
+    for i, count in enumerate(self.counts):
+      seen += count
+      if seen >= rank:
+        # never report more than the largest value seen
+        return min(self.smallest * self.growth**i, self.max)
+    return self.max
+
+
+# --------------------------------------------------------------
+class OperationMetrics:
+
+  __slots__ = ("calls", "errors", "rows", "latency")
+
+  def __init__(self):
+    self.calls = 0
+    self.errors = 0
+    self.rows = 0
+    self.latency = LatencyHistogram()
+
+
+# --------------------------------------------------------------
+class Metrics:
+  '''
+  Metrics of the measured operations. Every call is counted; the latency of
+  a call is only measured with probability sample_rate
+  '''
+
+  quantiles = (0.5, 0.95, 0.99)
+  prefix = "airdb_operation"
+
+  def __init__(self, sample_rate=1.0):
+    if not 0.0 <= sample_rate <= 1.0:
+      raise ValueError("The sample rate must be between 0 and 1.")
+    self.sample_rate = sample_rate
+    self.operations = dict()
+    self.lock = threading.Lock()
+
+  def measure(self, operation, function, *args, **kwargs):
+    '''
+    Call function and record it as one call of operation. Calls made while
+    another operation is measured on the same thread are part of it
+    '''
+    if getattr(current, "observation", None) is not None:
+      return function(*args, **kwargs)
+    observation = current.observation = Observation()
+    sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+    start = perf_counter() if sampled else None
+    try:
+      result = function(*args, **kwargs)
+      if observation.rows is None:
+        # rows affected (int), rows returned (list) or a single row (tuple)
+        if isinstance(result, list):
+          observation.rows = len(result)
+        elif isinstance(result, tuple):
+          observation.rows = 1
+        elif isinstance(result, int) and result >= 0:
+          observation.rows = result
+      return result
+    except BaseException:
+      observation.error = True
+      raise
+    finally:
+      current.observation = None
+      elapsed = None
+      if start is not None:
+        elapsed = perf_counter() - start - observation.waited
+      self.record(operation, elapsed, observation.rows or 0,
+                  observation.error)
+
+  def record(self, operation, elapsed, rows, error):
+    with self.lock:
+      metrics = self.operations.get(operation)
+      if metrics is None:
+        metrics = self.operations[operation] = OperationMetrics()
+      metrics.calls += 1
+      metrics.rows += rows
+      if error:
+        metrics.errors += 1
+      if elapsed is not None:
+        metrics.latency.add(max(elapsed, 0.0))
+
+  def reset(self):
+    with self.lock:
+      self.operations.clear()
+
+  # ---- export
+  def snapshot(self):
+    '''
+    Current values: {operation: {calls, errors, rows, sampled, sum and
+    quantiles in seconds}}
+    '''
+    with self.lock:
+      result = dict()
+      for operation, metrics in sorted(self.operations.items()):
+        latency = metrics.latency
+        values = {
+            "calls": metrics.calls,
+            "errors": metrics.errors,
+            "rows": metrics.rows,
+            "sampled": latency.count,
+            "sum_seconds": latency.sum,
+            "max_seconds": latency.max,
+        }
+        for q in self.quantiles:
+          values[f"p{round(q * 100)}_seconds"] = latency.quantile(q)
+        result[operation] = values
+      return result
+
+  def json(self):
+    return json.dumps({
+        "sample_rate": self.sample_rate,
+        "operations": self.snapshot()
+    },
+                      indent=2)
+
+  def prometheus(self):
+    '''
+    Prometheus text exposition format: a summary of the latencies (of the
+    sampled calls) and counters of calls, errors and rows
+    '''
+    snapshot = self.snapshot()
+    lines = [
+        f"# HELP {self.prefix}_latency_seconds Latency of the sampled calls "
+        f"(sample rate {self.sample_rate:g}).",
+        f"# TYPE {self.prefix}_latency_seconds summary",
+    ]
+    for operation, values in snapshot.items():
+      label = f'operation="{operation}"'
+      for q in self.quantiles:
+        value = values[f"p{round(q * 100)}_seconds"]
+        lines.append(f'{self.prefix}_latency_seconds{{{label},quantile="{q:g}"}} '
+                     f'{"NaN" if value is None else repr(value)}')
+      lines.append(f"{self.prefix}_latency_seconds_sum{{{label}}} "
+                   f"{values['sum_seconds']!r}")
+      lines.append(f"{self.prefix}_latency_seconds_count{{{label}}} "
+                   f"{values['sampled']}")
+    for name, key, help_text in (
+        ("calls_total", "calls", "Calls of the operation."),
+        ("errors_total", "errors", "Calls that ended with an error."),
+        ("rows_total", "rows", "Rows returned or affected."),
+    ):
+      lines.append(f"# HELP {self.prefix}_{name} {help_text}")
+      lines.append(f"# TYPE {self.prefix}_{name} counter")
+      for operation, values in snapshot.items():
+        lines.append(f'{self.prefix}_{name}{{operation="{operation}"}} '
+                     f"{values[key]}")
+    return "\n".join(lines) + "\n"
+
+  def dump(self, path):
+    '''
+    Write the metrics to path: JSON for a .json file, Prometheus text otherwise
+    '''
+    text = self.json() if path.endswith(".json") else self.prometheus()
+    with open(path, "w", encoding="utf-8") as f:
+      f.write(text)
+
+
+def measured(operation):
+  '''
+  Decorator for methods of objects with a metrics attribute: every call is
+  recorded as a call of operation
+  '''
+
+  def decorator(function):
+
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+      return self.metrics.measure(operation, function, self, *args, **kwargs)
+
+    return wrapper
+
+  return decorator
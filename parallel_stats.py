@@ -0,0 +1,159 @@
+'''
+Parallel summary statistics. Flights is split into Departure-date ranges of
+about the same number of rows, a process pool computes a partial aggregate
+for every range (each worker process reads through its own read-only
+connection) and the partial results are merged into the rows the serial
+query returns.
+
+Only statistics that can be added up across partitions are supported:
+  1  number of flights by status
+  2  passenger capacity by status (Flights joined with Aircrafts)
+  4  number of flights by pilot and status (Flights, OperatedBy, Pilots)
+Statistic 3 reads Pilots only and is not split.
+'''
+import concurrent.futures
+import os
+import pathlib
+import sqlite3
+
+# the summary queries of main.DBOperations restricted to one Departure range
+# ({where} adds the bounds); every row is (group key..., partial aggregate)
+partial_queries = {
+    1:
+    """SELECT Status, COUNT(Status)
+         FROM Flights
+        WHERE 1 {where}
+        GROUP BY Status""",
+    2:
+    """SELECT Status, SUM(MaxPassengers)
+         FROM Aircrafts, Flights
+        WHERE Flights.AircraftID = Aircrafts.AircraftID {where}
+        GROUP BY Status""",
+    4:
+    """SELECT Pilots.PilotID, Status, COUNT(Flights.FlightID)
+         FROM Flights, Pilots, OperatedBy
+        WHERE Flights.FlightID = OperatedBy.FlightID
+          AND Pilots.PilotID = OperatedBy.PilotID {where}
+        GROUP BY Pilots.PilotID, Status""",
+}
+
+sql_departure_bounds = """SELECT COUNT(*), MIN(Departure), MAX(Departure)
+                            FROM Flights"""
+sql_departure_at = """SELECT Departure FROM Flights
+                       ORDER BY Departure LIMIT 1 OFFSET ?"""
+
+# read-only connection of the current worker process
+worker_conn = None
+
+
+def open_worker_connection(uri):
+  '''
+  Process pool initializer: open the read-only connection of the worker
+  '''
+  global worker_conn
+  worker_conn = sqlite3.connect(uri, uri=True)
+  worker_conn.execute("PRAGMA query_only = ON")
+
+
+def partition_where(low, high, last=False):
+  '''
+  Bounds of a Departure range: [low, high), or [low, high] for the last one.
+  Both bounds are always given: with an open range the planner may scan
+  another index instead of searching the Departure index
+  '''
+  where = " AND Flights.Departure >= ? AND Flights.Departure "
+  return where + ("<= ?" if last else "< ?"), (low, high)
+
+
+def aggregate_partition(qid, low, high, last=False):
+  '''
+  Run in a worker process: the partial aggregate of one Departure range
+  '''
+  where, params = partition_where(low, high, last)
+  return worker_conn.execute(partial_queries[qid].format(where=where),
+                             params).fetchall()
+
+
+def split_departures(cursor, partitions):
+  '''
+  Split Flights into at most partitions Departure ranges of about the same
+  size (read from the Departure index); returns (low, high, last) for each
+  range. Rows sharing a Departure date always fall into the same range
+  '''
+  count, first, last = cursor.execute(sql_departure_bounds).fetchone()
+  if count == 0:
+    return []
+  boundaries = [first]
+  for i in range(1, partitions):
+    row = cursor.execute(sql_departure_at,
+                         (count * i // partitions, )).fetchone()
+    if row is not None and row[0] > boundaries[-1]:
+      boundaries.append(row[0])
+  boundaries.append(last)
+  ranges = list(zip(boundaries[:-1], boundaries[1:]))
+  return [(low, high, i == len(ranges) - 1)
+          for i, (low, high) in enumerate(ranges)]
+
+
+def merge(qid, partials):
+  '''
+  Add up the partial aggregates and order the rows as the serial query does
+  '''
+  totals = dict()
+  for rows in partials:
+    for *key, value in rows:
+      key = tuple(key)
+      totals[key] = totals.get(key, 0) + value
+  if qid == 4:
+    # GROUP BY order of the serial query
+    return [key + (value, ) for key, value in sorted(totals.items())]
+  if qid == 2:
+    # ROUND(SUM(MaxPassengers), 1) returns a REAL
+    totals = {key: round(float(value), 1) for key, value in totals.items()}
+  # ORDER BY the aggregate DESC; ties (left unordered by SQLite) by key
+  ordered = sorted(totals.items(), key=lambda item: item[0])
+  ordered.sort(key=lambda item: item[1], reverse=True)
+  return [key + (value, ) for key, value in ordered]
+
+
+# --------------------------------------------------------------
+class ParallelSummary:
+  '''
+  Computes summary statistics 1, 2 and 4 with a pool of worker processes.
+  The pool (and the connection of each worker) is kept between calls;
+  close() shuts it down. The workers each read the latest committed state,
+  so the result is only a consistent snapshot when no writes are committed
+  while it runs
+  '''
+
+  def __init__(self, db_path, workers=None, partitions=None):
+    self.uri = pathlib.Path(db_path).absolute().as_uri() + "?mode=ro"
+    self.workers = workers or os.cpu_count() or 1
+    self.pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=self.workers,
+        initializer=open_worker_connection,
+        initargs=(self.uri, ))
+    # a few partitions per worker evens out ranges of different cost
+    self.partitions = partitions or self.workers * 4
+
+  def close(self):
+    self.pool.shutdown(wait=True)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def run(self, qid, cursor):
+    '''
+    Return the rows of statistic qid; cursor is only used to split Flights
+    '''
+    if qid not in partial_queries:
+      raise ValueError("Only summary statistics 1, 2 and 4 run in parallel.")
+    ranges = split_departures(cursor, self.partitions)
+    futures = [
+        self.pool.submit(aggregate_partition, qid, low, high, last)
+        for low, high, last in ranges
+    ]
+    return merge(qid, [future.result() for future in futures])
@@ -0,0 +1,287 @@
+'''
+Query profiler for the database connections. The pooled, reader, archive
+and shard connections are opened with connect(), as ProfiledConnection
+whose cursors time every execute and executemany (and the fetches that
+follow) and report each execution to a QueryProfiler:
+statement, wall time and rows returned (or affected). Executions slower
+than the threshold are logged, with their EXPLAIN QUERY PLAN, to a rotating
+slow-query log.
+
+Profiling is opt-in (--profile): without a QueryProfiler, connect() returns
+plain connections. A profiled execute costs about 6 us more than a plain one
+(0.7 us per row fetched), i.e. 1.5x on a primary key lookup (see
+benchmarks/bench_profiler.py).
+'''
+import collections
+import datetime
+import json
+import logging
+import logging.handlers
+import sqlite3
+import threading
+from time import perf_counter
+
+# statements worth an EXPLAIN QUERY PLAN
+EXPLAINED = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+# --------------------------------------------------------------
+class StatementStats:
+  '''
+  Totals of one statement (SQL text with whitespace collapsed)
+  '''
+
+  __slots__ = ("sql", "calls", "total", "max", "rows", "slow")
+
+  def __init__(self, sql):
+    self.sql = sql
+    self.calls = 0
+    self.total = 0.0
+    self.max = 0.0
+    self.rows = 0
+    self.slow = 0
+
+  def as_dict(self):
+    return {
+        "sql": self.sql,
+        "calls": self.calls,
+        "total_ms": round(self.total * 1000, 3),
+        "mean_ms": round(self.total * 1000 / max(self.calls, 1), 3),
+        "max_ms": round(self.max * 1000, 3),
+        "rows": self.rows,
+        "slow": self.slow,
+    }
+
+
+# --------------------------------------------------------------
+class QueryProfiler:
+  '''
+  Collects the executions reported by ProfiledCursor. Executions taking at
+  least threshold seconds are explained and kept in slow (the most recent
+  ones), and written to log_path (rotated at max_bytes) when one is given
+  '''
+
+  def __init__(self,
+               threshold=0.1,
+               log_path=None,
+               max_bytes=1000000,
+               backup_count=3,
+               keep_slow=100):
+    self.threshold = threshold
+    self.stats = dict()
+    self.slow = collections.deque(maxlen=keep_slow)
+    self.lock = threading.Lock()
+    # SQL text -> normalized text, so that each string is only split once
+    self.normalized = dict()
+    self.log = None
+    if log_path is not None:
+      self.log = logging.getLogger(f"airdb.slow_queries.{id(self)}")
+      self.log.propagate = False
+      self.log.setLevel(logging.INFO)
+      self.handler = logging.handlers.RotatingFileHandler(
+          log_path,
+          maxBytes=max_bytes,
+          backupCount=backup_count,
+          encoding="utf-8")
+      self.log.addHandler(self.handler)
+
+  def close(self):
+    if self.log is not None:
+      self.log.removeHandler(self.handler)
+      self.handler.close()
+      self.log = None
+
+  def normalize(self, sql):
+    text = self.normalized.get(sql)
+    if text is None:
+      if len(self.normalized) > 10000:
+        self.normalized.clear()
+      text = self.normalized[sql] = " ".join(sql.split())
+    return text
+
+  def record(self, conn, sql, params, elapsed, rows):
+    '''
+    Add one execution; explain and log it if it is slow
+    '''
+    text = self.normalize(sql)
+    slow = elapsed >= self.threshold
+    with self.lock:
+      stats = self.stats.get(text)
+      if stats is None:
+        stats = self.stats[text] = StatementStats(text)
+      stats.calls += 1
+      stats.total += elapsed
+      stats.rows += rows
+      if elapsed > stats.max:
+        stats.max = elapsed
+      if slow:
+        stats.slow += 1
+    if slow:
+      self.log_slow(conn, sql, text, params, elapsed, rows)
+
+  def explain(self, conn, sql, params):
+    '''
+    EXPLAIN QUERY PLAN of a statement, as one line per step (None when it
+    cannot be explained)
+    '''
+    if params is None or not sql.lstrip().upper().startswith(EXPLAINED):
+      return None
+    try:
+      # the base class method: the EXPLAIN itself is not profiled
+      rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql,
+                                        params).fetchall()
+    except sqlite3.Error:
+      return None
+    return [row[-1] for row in rows]
+
+  def log_slow(self, conn, sql, text, params, elapsed, rows):
+    entry = {
+        "time": datetime.datetime.now().isoformat(timespec="milliseconds"),
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "rows": rows,
+        "sql": text,
+        "plan": self.explain(conn, sql, params),
+    }
+    self.slow.append(entry)
+    if self.log is not None:
+      self.log.info(json.dumps(entry, default=str))
+
+  def top(self, n=10):
+    '''
+    The n statements with the largest total time, as dictionaries
+    '''
+    with self.lock:
+      stats = sorted(self.stats.values(), key=lambda s: s.total, reverse=True)
+      return [s.as_dict() for s in stats[:n]]
+
+  def reset(self):
+    with self.lock:
+      self.stats.clear()
+      self.slow.clear()
+
+
+# --------------------------------------------------------------
+class ProfiledCursor(sqlite3.Cursor):
+  '''
+  Cursor reporting its executions to the profiler of its connection. The
+  time and rows of a query include the fetches that follow it: the
+  execution is reported once its rows are exhausted, or when the cursor
+  runs another statement or is closed
+  '''
+
+  pending = None
+
+  def finish(self):
+    if self.pending is not None:
+      sql, params, elapsed, rows = self.pending
+      self.pending = None
+      self.connection.profiler.record(self.connection, sql, params, elapsed,
+                                      rows)
+
+  def execute(self, sql, params=()):
+    self.finish()
+    start = perf_counter()
+    super().execute(sql, params)
+    elapsed = perf_counter() - start
+    if self.description is None:
+      # not a query: nothing to fetch
+      self.connection.profiler.record(self.connection, sql, params, elapsed,
+                                      max(self.rowcount, 0))
+    else:
+      self.pending = [sql, params, elapsed, 0]
+    return self
+
+  def executemany(self, sql, seq_of_params):
+    self.finish()
+    start = perf_counter()
+    super().executemany(sql, seq_of_params)
+    elapsed = perf_counter() - start
+    # the parameters have been consumed: executemany is not explained
+    self.connection.profiler.record(self.connection, sql, None, elapsed,
+                                    max(self.rowcount, 0))
+    return self
+
+  def fetched(self, rows, elapsed, exhausted):
+    pending = self.pending
+    if pending is not None:
+      pending[2] += elapsed
+      pending[3] += rows
+      if exhausted:
+        self.finish()
+
+  def fetchone(self):
+    start = perf_counter()
+    row = super().fetchone()
+    self.fetched(row is not None, perf_counter() - start, row is None)
+    return row
+
+  def fetchmany(self, size=None):
+    size = self.arraysize if size is None else size
+    start = perf_counter()
+    rows = super().fetchmany(size)
+    self.fetched(len(rows), perf_counter() - start, len(rows) < size)
+    return rows
+
+  def fetchall(self):
+    start = perf_counter()
+    rows = super().fetchall()
+    self.fetched(len(rows), perf_counter() - start, True)
+    return rows
+
+  def __next__(self):
+    # called once per row: kept as short as possible
+    pending = self.pending
+    if pending is None:
+      return super().__next__()
+    start = perf_counter()
+    try:
+      row = super().__next__()
+    except StopIteration:
+      pending[2] += perf_counter() - start
+      self.finish()
+      raise
+    pending[2] += perf_counter() - start
+    pending[3] += 1
+    return row
+
+  def close(self):
+    self.finish()
+    super().close()
+
+  def __del__(self):
+    # a cursor dropped before its rows were exhausted
+    try:
+      self.finish()
+    except Exception:
+      pass
+
+
+# --------------------------------------------------------------
+class ProfiledConnection(sqlite3.Connection):
+  '''
+  Connection whose cursors (including those of the execute shortcuts) are
+  ProfiledCursor. profiler is set by connect()
+  '''
+
+  profiler = None
+
+  def cursor(self, factory=ProfiledCursor):
+    return super().cursor(factory)
+
+  def execute(self, sql, params=()):
+    return self.cursor().execute(sql, params)
+
+  def executemany(self, sql, seq_of_params):
+    return self.cursor().executemany(sql, seq_of_params)
+
+
+def connect(database, profiler=None, **kwargs):
+  '''
+  sqlite3.connect, returning a ProfiledConnection that reports to profiler
+  when one is given
+  '''
+  if profiler is None:
+    return sqlite3.connect(database, **kwargs)
+  conn = sqlite3.connect(database, factory=ProfiledConnection, **kwargs)
+  conn.profiler = profiler
+  return conn
@@ -0,0 +1,208 @@
+'''
+Multi-predicate search: a SELECT of one table filtered by several conditions
+combined with AND. A condition is an equality, an IN list or a range (>, >=,
+<, <=, between) on a column of the table. Flights can also be filtered by the
+columns of its aircraft, which joins Aircrafts. Only column names read from
+the schema are accepted, and the values are always bound as parameters.
+
+The conditions are written on the bare columns, so that any index on them can
+serve the query. SQLite's planner picks the index from the statistics
+collected by ANALYZE. plan() reports the steps it chose.
+'''
+import collections
+import shlex
+
+# operator -> number of values (None: one or more)
+OPERATORS = {
+    "=": 1,
+    "in": None,
+    ">": 1,
+    ">=": 1,
+    "<": 1,
+    "<=": 1,
+    "between": 2,
+}
+
+# table -> (joined table, join condition): the columns of the joined table can
+# be filtered on as well
+JOINS = {
+    "Flights": ("Aircrafts", "Aircrafts.AircraftID = Flights.AircraftID"),
+}
+
+
+# --------------------------------------------------------------
+class Predicate(
+    collections.namedtuple("Predicate", ("column", "operator", "values"))):
+
+  __slots__ = ()
+
+  def sql(self, expression):
+    if self.operator == "in":
+      return f"{expression} IN ({', '.join('?' for _ in self.values)})"
+    if self.operator == "between":
+      return f"{expression} BETWEEN ? AND ?"
+    return f"{expression} {self.operator} ?"
+
+
+def predicate(column, operator, values):
+  '''
+  A Predicate, with its operator and number of values checked; values is a
+  single value or a sequence
+  '''
+  operator = operator.lower()
+  if operator not in OPERATORS:
+    raise ValueError(f"Unknown operator: {operator}. Use one of: " +
+                     ", ".join(OPERATORS))
+  if isinstance(values, (str, int, float)):
+    values = (values, )
+  values = tuple(values)
+  expected = OPERATORS[operator]
+  if len(values) == 0 or (expected is not None and len(values) != expected):
+    raise ValueError(f"'{column} {operator}' takes " +
+                     ("one or more values." if expected is None else
+                      f"{expected} value(s), not {len(values)}."))
+  return Predicate(column, operator, values)
+
+
+def parse_predicates(text):
+  '''
+  Predicates of a condition such as
+    Departure between 2024-04-01 and 2024-06-30 and Status = Delayed
+    and Model in 320 380
+  (shell-style quoting for values with spaces; IN values may also be
+  separated by commas)
+  '''
+  tokens = shlex.split(text) if isinstance(text, str) else list(text)
+  predicates = []
+  i = 0
+  while i < len(tokens):
+    if len(tokens) - i < 3:
+      raise ValueError(f"Incomplete condition: {' '.join(tokens[i:])}")
+    column, operator = tokens[i], tokens[i + 1].lower()
+    i += 2
+    if operator == "between":
+      # "between <low> and <high>" or "between <low> <high>"
+      values = [tokens[i]]
+      i += 1
+      if i < len(tokens) and tokens[i].lower() == "and":
+        i += 1
+      values += tokens[i:i + 1]
+      i += 1
+    elif operator == "in":
+      values = []
+      while i < len(tokens) and tokens[i].lower() != "and":
+        values += [value for value in tokens[i].split(",") if value != ""]
+        i += 1
+    else:
+      values = [tokens[i]]
+      i += 1
+    predicates.append(predicate(column, operator, values))
+    if i < len(tokens):
+      if tokens[i].lower() != "and":
+        raise ValueError(f"Expected 'and' before: {' '.join(tokens[i:])}")
+      i += 1
+  return predicates
+
+
+def as_predicates(conditions):
+  '''
+  Predicates of a condition string (see parse_predicates), or of a sequence
+  of Predicate or (column, operator, values) tuples
+  '''
+  if isinstance(conditions, str):
+    return parse_predicates(conditions)
+  return [
+      p if isinstance(p, Predicate) else predicate(*p) for p in conditions
+  ]
+
+
+def build(table, predicates, columns_of):
+  '''
+  (SQL, parameters) of the rows of table matching every predicate;
+  columns_of(table) gives the column names of a table
+  '''
+  if len(predicates) == 0:
+    raise ValueError("Enter at least one condition.")
+  owners = dict.fromkeys(columns_of(table), table)
+  joined = JOINS.get(table)
+  if joined is not None and any(p.column not in owners for p in predicates):
+    for column in columns_of(joined[0]):
+      owners.setdefault(column, joined[0])
+  conditions = []
+  params = []
+  join = False
+  for p in predicates:
+    owner = owners.get(p.column)
+    if owner is None:
+      raise ValueError(f"Column {p.column} is not available in {table}.")
+    join = join or owner != table
+    conditions.append(p.sql(f"{owner}.{p.column}"))
+    params.extend(p.values)
+  sql = f"SELECT {table}.* FROM {table}"
+  if join:
+    sql += f" JOIN {joined[0]} ON {joined[1]}"
+  return sql + " WHERE " + " AND ".join(conditions), tuple(params)
+
+
+def bounds(predicates, column):
+  '''
+  (low, high) bounds that the predicates put on column (None when unbounded)
+  '''
+  low = high = None
+  for p in predicates:
+    if p.column != column:
+      continue
+    if p.operator in ("=", "in", "between"):
+      p_low, p_high = min(p.values), max(p.values)
+    elif p.operator in (">", ">="):
+      p_low, p_high = p.values[0], None
+    else:
+      p_low, p_high = None, p.values[0]
+    if p_low is not None and (low is None or p_low > low):
+      low = p_low
+    if p_high is not None and (high is None or p_high < high):
+      high = p_high
+  return low, high
+
+
+# ---- query plans
+def plan(cursor, sql, params=()):
+  '''
+  EXPLAIN QUERY PLAN of a statement, one line per step
+  '''
+  return [
+      i[3] for i in cursor.execute("EXPLAIN QUERY PLAN " + sql,
+                                   params).fetchall()
+  ]
+
+
+def tables(cursor):
+  '''
+  Names of the tables of the schema (the plans also name the subqueries and
+  CTEs they materialize, which are not tables)
+  '''
+  return {
+      i[0] for i in cursor.execute(
+          "SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+  }
+
+
+def full_scans(steps, catalog):
+  '''
+  Tables of the catalog that a plan reads without an index (its plain SCAN
+  steps; a schema prefix such as main. is ignored)
+  '''
+  scans = []
+  for i in steps:
+    if i.startswith("SCAN ") and " INDEX " not in i:
+      name = i.split()[1].split(".")[-1]
+      if name in catalog:
+        scans.append(name)
+  return scans
+
+
+def uses_indexes(steps, catalog):
+  '''
+  Whether a plan reads the tables of the catalog through indexes only
+  '''
+  return len(full_scans(steps, catalog)) == 0
@@ -0,0 +1,67 @@
+'''
+Typed records of the four tables. Each record is a namedtuple in column
+order (no per-instance __dict__), so it binds directly as the parameters of
+the table's INSERT statement; update_params() gives the parameters of its
+UPDATE statement (the columns, then the PK). from_rows builds records from
+cursor rows in bulk.
+'''
+import collections
+
+
+# --------------------------------------------------------------
+class PilotRecord(
+    collections.namedtuple(
+        "PilotRecord",
+        ("pilot_id", "first_name", "last_name", "school", "birth_date",
+         "prof_since"))):
+
+  __slots__ = ()
+
+  def update_params(self):
+    return self[1:] + self[:1]
+
+
+# --------------------------------------------------------------
+class AircraftRecord(
+    collections.namedtuple(
+        "AircraftRecord",
+        ("aircraft_id", "manufacturer", "model", "max_passengers", "crew"))):
+
+  __slots__ = ()
+
+  def update_params(self):
+    return self[1:] + self[:1]
+
+
+# --------------------------------------------------------------
+class FlightRecord(
+    collections.namedtuple(
+        "FlightRecord", ("flight_id", "origin", "destination", "departure",
+                         "status", "aircraft_id"))):
+
+  __slots__ = ()
+
+  def update_params(self):
+    return self[1:] + self[:1]
+
+
+# --------------------------------------------------------------
+class OperatedByRecord(
+    collections.namedtuple("OperatedByRecord", ("flight_id", "pilot_id"))):
+
+  __slots__ = ()
+
+
+RECORD_TYPES = {
+    "Pilots": PilotRecord,
+    "Aircrafts": AircraftRecord,
+    "Flights": FlightRecord,
+    "OperatedBy": OperatedByRecord,
+}
+
+
+def from_rows(table, rows):
+  '''
+  Records of a table from rows in column order (a list of tuples or a cursor)
+  '''
+  return list(map(RECORD_TYPES[table]._make, rows))
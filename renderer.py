@@ -0,0 +1,159 @@
+'''
+Renderers for query results: an aligned text table for the menu, and CSV,
+TSV and JSON lines for piping into other tools. Rows are rendered a chunk at
+a time and written with one write() per chunk, so results of any size
+(including unbounded row iterators) are streamed in linear time.
+'''
+import csv
+import itertools
+import json
+import sys
+
+
+# --------------------------------------------------------------
+class Renderer:
+  '''
+  Base class: write_header() once, then write_rows() for every chunk of rows
+  '''
+
+  # rows rendered per write() call when streaming
+  chunk_size = 1000
+
+  def __init__(self, columns, out=None):
+    self.columns = tuple(columns)
+    self.out = out if out is not None else sys.stdout
+
+  def write_header(self):
+    pass
+
+  def write_rows(self, rows):
+    raise NotImplementedError
+
+  def flush(self):
+    self.out.flush()
+
+  def render(self, rows, header=True):
+    '''
+    Stream an iterable of rows; returns the number of rows written
+    '''
+    if header:
+      self.write_header()
+    written = 0
+    rows = iter(rows)
+    while True:
+      chunk = list(itertools.islice(rows, self.chunk_size))
+      if len(chunk) == 0:
+        break
+      self.write_rows(chunk)
+      written += len(chunk)
+    self.flush()
+    return written
+
+
+# --------------------------------------------------------------
+class TableRenderer(Renderer):
+  '''
+  Aligned text table. Column widths come from the header and a sample of the
+  first rows; longer values are cut with "..". The widths are kept for every
+  following chunk (or page) so that the columns stay aligned
+  '''
+
+  sample_size = 1000
+  max_width = 40
+
+  def __init__(self, columns, out=None, sample=None):
+    super().__init__(columns, out)
+    self.widths = None
+    if sample is not None:
+      self.set_widths(sample)
+
+  def set_widths(self, sample):
+    widths = [len(column) for column in self.columns]
+    for row in itertools.islice(sample, self.sample_size):
+      for i, cell in enumerate(row):
+        length = len(str(cell))
+        if length > widths[i]:
+          widths[i] = length
+    # two spaces of padding, as in the previous layout
+    self.widths = [min(width, self.max_width) + 2 for width in widths]
+    self.row_format = "".join("{:<%d}|" % width for width in self.widths) + "\n"
+    self.line_length = sum(self.widths) + len(self.widths) + 1
+
+  def format_row(self, row):
+    line = self.row_format.format(*map(str, row))
+    if len(line) == self.line_length:
+      return line
+    # at least one value is longer than its column: cut it
+    cells = [str(cell) for cell in row]
+    for i, width in enumerate(self.widths):
+      if len(cells[i]) > width:
+        cells[i] = cells[i][:width - 2] + ".."
+    return self.row_format.format(*cells)
+
+  def write_header(self):
+    if self.widths is None:
+      self.set_widths([])
+    self.out.write(self.format_row(self.columns))
+
+  def write_rows(self, rows):
+    if self.widths is None:
+      self.set_widths(rows)
+    self.out.write("".join(map(self.format_row, rows)))
+
+  def render(self, rows, header=True):
+    if self.widths is None:
+      # size the columns from a sampled prefix, then stream the rest
+      rows = iter(rows)
+      sample = list(itertools.islice(rows, self.sample_size))
+      self.set_widths(sample)
+      rows = itertools.chain(sample, rows)
+    return super().render(rows, header)
+
+
+# --------------------------------------------------------------
+class DelimitedRenderer(Renderer):
+  '''
+  CSV (or TSV, with delimiter="\\t") with a header row
+  '''
+
+  def __init__(self, columns, out=None, delimiter=","):
+    super().__init__(columns, out)
+    self.writer = csv.writer(self.out, delimiter=delimiter, lineterminator="\n")
+
+  def write_header(self):
+    self.writer.writerow(self.columns)
+
+  def write_rows(self, rows):
+    self.writer.writerows(rows)
+
+
+# --------------------------------------------------------------
+class JsonLinesRenderer(Renderer):
+  '''
+  One JSON object per row, keyed by column name
+  '''
+
+  def write_rows(self, rows):
+    columns = self.columns
+    self.out.write("".join(
+        json.dumps(dict(zip(columns, row)), default=str, ensure_ascii=False) +
+        "\n" for row in rows))
+
+
+FORMATS = ("table", "csv", "tsv", "jsonl")
+
+
+def make_renderer(output_format, columns, out=None):
+  '''
+  Return a renderer for one of FORMATS
+  '''
+  if output_format == "table":
+    return TableRenderer(columns, out)
+  elif output_format == "csv":
+    return DelimitedRenderer(columns, out)
+  elif output_format == "tsv":
+    return DelimitedRenderer(columns, out, delimiter="\t")
+  elif output_format == "jsonl":
+    return JsonLinesRenderer(columns, out)
+  raise ValueError(f"Unknown output format: {output_format}. "
+                   f"Please use one of {', '.join(FORMATS)}.")
@@ -0,0 +1,135 @@
+import collections
+
+
+# --------------------------------------------------------------
+class CachedResult:
+  '''
+  Replays cached rows through the part of the cursor interface used to print
+  results (description and fetchmany)
+  '''
+
+  def __init__(self, description, rows):
+    self.description = description
+    self.rows = rows
+    self.position = 0
+
+  def fetchmany(self, size):
+    records = self.rows[self.position:self.position + size]
+    self.position += len(records)
+    return records
+
+  def fetchall(self):
+    return self.fetchmany(len(self.rows) - self.position)
+
+
+# --------------------------------------------------------------
+class RecordingResult:
+  '''
+  Wraps the cursor of a cache miss: rows are passed through as they are
+  fetched and, once the result has been read to the end, stored in the cache
+  '''
+
+  def __init__(self, cache, cursor, query, params, version):
+    self.cache = cache
+    self.cursor = cursor
+    self.description = cursor.description
+    self.key = (query, params, version)
+    self.rows = []
+
+  def record(self, records, complete):
+    if self.rows is None:
+      return
+    self.rows.extend(records)
+    if len(self.rows) > self.cache.max_rows:
+      # too large to cache: stop keeping a copy
+      self.rows = None
+    elif complete:
+      query, params, version = self.key
+      self.cache.put(query, params, version, self.description, self.rows)
+      self.rows = None
+
+  def fetchmany(self, size):
+    records = self.cursor.fetchmany(size)
+    self.record(records, len(records) < size)
+    return records
+
+  def fetchall(self):
+    records = self.cursor.fetchall()
+    self.record(records, True)
+    return records
+
+
+# --------------------------------------------------------------
+class ResultCache:
+  '''
+  LRU cache of query results keyed by (query, parameters). Every entry stores
+  the data version it was read at; an entry read at an older version is
+  treated as a miss and dropped.
+  '''
+
+  def __init__(self, max_entries=256, max_rows=10000):
+    self.max_entries = max_entries
+    # results with more rows than this are not cached
+    self.max_rows = max_rows
+    self.entries = collections.OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.invalidations = 0
+
+  def get(self, query, params, version):
+    '''
+    Return a CachedResult, or None if there is no entry for the current version
+    '''
+    key = (query, tuple(params))
+    entry = self.entries.get(key)
+    if entry is None:
+      self.misses += 1
+      return None
+    if entry[0] != version:
+      del self.entries[key]
+      self.invalidations += 1
+      self.misses += 1
+      return None
+    self.entries.move_to_end(key)
+    self.hits += 1
+    return CachedResult(entry[1], entry[2])
+
+  def put(self, query, params, version, description, rows):
+    if len(rows) > self.max_rows:
+      return
+    key = (query, tuple(params))
+    self.entries[key] = (version, description, rows)
+    self.entries.move_to_end(key)
+    while len(self.entries) > self.max_entries:
+      self.entries.popitem(last=False)
+      self.evictions += 1
+
+  def execute(self, cursor, query, params, version, execute=None):
+    '''
+    Return the cached result of a query, or execute it (with execute(query,
+    params) if given, cursor.execute otherwise) and cache the rows as they
+    are read
+    '''
+    params = tuple(params)
+    cached = self.get(query, params, version)
+    if cached is not None:
+      return cached
+    execute = execute if execute is not None else cursor.execute
+    return RecordingResult(self, execute(query, params), query, params,
+                           version)
+
+  def clear(self):
+    self.entries.clear()
+
+  def stats(self):
+    lookups = self.hits + self.misses
+    return {
+        "entries": len(self.entries),
+        "max_entries": self.max_entries,
+        "hits": self.hits,
+        "misses": self.misses,
+        "hit_rate": round(self.hits / lookups, 4) if lookups > 0 else 0.0,
+        "evictions": self.evictions,
+        "invalidations": self.invalidations,
+    }
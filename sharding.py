@@ -0,0 +1,467 @@
+'''
+Month-sharded storage of Flights. Every flight is stored, together with its
+OperatedBy rows, in the database file of its Departure month
+(<shard dir>/flights_YYYY_MM.db). The main database keeps Pilots, Aircrafts
+and a directory of the shard of every FlightID, so that updates and deletes
+by FlightID go straight to one file.
+
+Shards are attached to one connection on demand. SQLite attaches at most
+SQLITE_LIMIT_ATTACHED (usually 10) databases at a time, so the least
+recently used shards are detached when more are needed. Reads run through
+temporary views named Flights and OperatedBy: the UNION ALL of the attached
+shards (and of the rows still in the main database). They shadow the main
+tables, so select_all and the summary statistics run their queries
+unchanged; when more shards exist than can be attached together, the shards
+are read in batches and the results of the batches are combined.
+
+A database is sharded once its FlightShards directory holds a flight
+(is_sharded): from then on its Flights and OperatedBy tables must only be
+read and written through ShardedFlights.
+'''
+import collections
+import os
+import sqlite3
+import threading
+
+import validation
+from parallel_stats import merge, partial_queries
+from profiler import connect
+
+sql_create_directory = """CREATE TABLE IF NOT EXISTS FlightShards (
+                            FlightID TEXT NOT NULL PRIMARY KEY,
+                            Shard TEXT NOT NULL
+                          )"""
+sql_create_directory_index = """CREATE INDEX IF NOT EXISTS idx_flightshards_shard
+                                ON FlightShards (Shard)"""
+sql_directory_exists = """SELECT 1 FROM sqlite_master
+                          WHERE type = 'table' AND name = 'FlightShards'"""
+
+SHARDED_TABLES = ("Flights", "OperatedBy")
+
+# another flight holding the aircraft on the Departure date
+sql_aircraft_booked = """SELECT 1 FROM {schema}.Flights
+                          WHERE AircraftID = ? AND Departure = ?
+                            AND Status <> ? AND FlightID <> ?
+                          LIMIT 1"""
+
+
+def shard_of(departure):
+  '''
+  Shard ("YYYY_MM") of a Departure date; raises ValueError for an invalid date
+  '''
+  date = validation.parse_date(departure)
+  if date is None:
+    raise ValueError(validation.MESSAGES[validation.INVALID_DEPARTURE])
+  return f"{date.year:04d}_{date.month:02d}"
+
+
+def is_sharded(cursor):
+  '''
+  Whether the database of cursor stores flights in shards
+  '''
+  if cursor.execute(sql_directory_exists).fetchone() is None:
+    return False
+  return cursor.execute(
+      "SELECT 1 FROM FlightShards LIMIT 1").fetchone() is not None
+
+
+def sharded_flight_ids(cursor):
+  '''
+  FlightIDs of the flights stored in shards
+  '''
+  if cursor.execute(sql_directory_exists).fetchone() is None:
+    return []
+  return [i[0] for i in cursor.execute("SELECT FlightID FROM FlightShards")]
+
+
+# --------------------------------------------------------------
+class ShardedFlights:
+  '''
+  Routes the Flights and OperatedBy rows to per-month shard files and reads
+  them back through union views. schema holds the statements creating the
+  two tables and their indexes in a new shard. Every method holds a lock, so
+  an instance can be shared by several threads
+  '''
+
+  sql_update = """UPDATE {schema}.Flights SET Origin = ?, Destination = ?,
+                  Departure = ?, Status = ?, AircraftID = ? WHERE FlightID = ?"""
+
+  def __init__(self,
+               db_path,
+               shard_dir=None,
+               schema=(),
+               max_attached=None,
+               profiler=None):
+    self.shard_dir = shard_dir or os.path.splitext(db_path)[0] + "_shards"
+    os.makedirs(self.shard_dir, exist_ok=True)
+    self.schema = tuple(schema)
+    self.profiler = profiler
+    # ATTACH is per connection: the shards get a connection of their own
+    self.conn = connect(db_path, profiler, check_same_thread=False)
+    self.conn.execute(sql_create_directory)
+    self.conn.execute(sql_create_directory_index)
+    self.conn.commit()
+    limit = self.conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    self.max_attached = min(max_attached or limit, limit)
+    # shard -> schema name, least recently used first
+    self.attached = collections.OrderedDict()
+    # shards of the current union views
+    self.view_shards = None
+    self.lock = threading.RLock()
+
+  def close(self):
+    with self.lock:
+      self.conn.close()
+
+  # ---- shard files
+  def shard_path(self, shard):
+    return os.path.join(self.shard_dir, f"flights_{shard}.db")
+
+  def shards(self):
+    '''
+    Every existing shard, oldest month first
+    '''
+    return sorted(name[len("flights_"):-len(".db")]
+                  for name in os.listdir(self.shard_dir)
+                  if name.startswith("flights_") and name.endswith(".db"))
+
+  def prune(self, low=None, high=None):
+    '''
+    Shards that can hold a Departure between low and high (inclusive)
+    '''
+    low = shard_of(low) if low is not None else None
+    high = shard_of(high) if high is not None else None
+    return [
+        shard for shard in self.shards()
+        if (low is None or shard >= low) and (high is None or shard <= high)
+    ]
+
+  def create_shard(self, shard):
+    conn = connect(self.shard_path(shard), self.profiler)
+    try:
+      for statement in self.schema:
+        conn.execute(statement)
+      conn.commit()
+    finally:
+      conn.close()
+
+  def attach(self, shards):
+    '''
+    Attach the given shards (creating the missing ones), detaching the least
+    recently used others if needed; returns their schema names
+    '''
+    if len(shards) > self.max_attached:
+      raise ValueError(f"At most {self.max_attached} shards can be attached.")
+    for shard in shards:
+      if shard in self.attached:
+        self.attached.move_to_end(shard)
+    for shard in shards:
+      if shard in self.attached:
+        continue
+      while len(self.attached) >= self.max_attached:
+        _, schema = self.attached.popitem(last=False)
+        # the views may use the shard
+        self.drop_views()
+        self.conn.execute(f"DETACH DATABASE {schema}")
+      if not os.path.exists(self.shard_path(shard)):
+        self.create_shard(shard)
+      schema = "shard_" + shard
+      self.conn.execute(f"ATTACH DATABASE ? AS {schema}",
+                        (self.shard_path(shard), ))
+      self.attached[shard] = schema
+    return [self.attached[shard] for shard in shards]
+
+  # ---- union views
+  def drop_views(self):
+    for table in SHARDED_TABLES:
+      self.conn.execute(f"DROP VIEW IF EXISTS temp.{table}")
+    self.view_shards = None
+
+  def union_view(self, shards, include_main=True):
+    '''
+    (Re)create the temporary Flights and OperatedBy views over the given
+    shards, plus the rows left in the main tables when include_main is set
+    '''
+    key = (tuple(shards), include_main)
+    if self.view_shards == key:
+      return
+    schemas = self.attach(shards)
+    self.drop_views()
+    for table in SHARDED_TABLES:
+      sources = [f"SELECT * FROM {schema}.{table}" for schema in schemas]
+      if include_main or len(sources) == 0:
+        sources.insert(0, f"SELECT * FROM main.{table}")
+      self.conn.execute(f"CREATE TEMP VIEW {table} AS " +
+                        " UNION ALL ".join(sources))
+    self.view_shards = key
+
+  def batches(self, shards):
+    '''
+    The shards split into groups that can be attached together (the first
+    group also reads the main tables); at least one group
+    '''
+    groups = [
+        shards[i:i + self.max_attached]
+        for i in range(0, len(shards), self.max_attached)
+    ]
+    return groups or [[]]
+
+  def run(self, sql, params=(), low=None, high=None):
+    '''
+    Run a query over the union views of every batch of shards that can hold
+    a Departure between low and high; returns the rows of each batch
+    '''
+    with self.lock:
+      results = []
+      for i, batch in enumerate(self.batches(self.prune(low, high))):
+        self.union_view(batch, include_main=i == 0)
+        results.append(self.conn.execute(sql, params).fetchall())
+      return results
+
+  # ---- reads
+  def read_all(self, function):
+    '''
+    Call function(connection) with the union views over every shard; raises
+    ValueError when the shards cannot all be attached together
+    '''
+    with self.lock:
+      batches = self.batches(self.shards())
+      if len(batches) > 1:
+        raise ValueError(f"More than {self.max_attached} shards cannot be "
+                         "read together.")
+      self.union_view(batches[0])
+      return function(self.conn)
+
+  def query(self, sql, params=()):
+    '''
+    Rows of a plain (non-aggregate) query over all shards, batch after batch
+    '''
+    return [row for rows in self.run(sql, params) for row in rows]
+
+  def summary_stat(self, qid, sql):
+    '''
+    Rows of summary statistic qid (sql is its serial query): run unchanged
+    when all shards can be attached together, otherwise merged from the
+    partial aggregates of each batch
+    '''
+    with self.lock:
+      batches = self.batches(self.shards())
+      if len(batches) > 1 and qid in partial_queries:
+        return merge(qid, self.run(partial_queries[qid].format(where="")))
+      # one batch, or statistic 3, which does not read Flights
+      self.union_view(batches[0])
+      return self.conn.execute(sql).fetchall()
+
+  def between(self, sql, low, high):
+    '''
+    Rows of a query with Departure bounds (low and high as its two
+    parameters), reading the shards of those months only
+    '''
+    return [
+        row for rows in self.run(sql, (low, high), low, high) for row in rows
+    ]
+
+  def locate(self, flight_id):
+    '''
+    Shard of a flight, None when it is not in a shard
+    '''
+    row = self.conn.execute("SELECT Shard FROM FlightShards WHERE FlightID = ?",
+                            (flight_id, )).fetchone()
+    return row[0] if row is not None else None
+
+  def get_flight(self, flight_id):
+    with self.lock:
+      shard = self.locate(flight_id)
+      if shard is None:
+        return []
+      schema, = self.attach([shard])
+      return self.conn.execute(
+          f"SELECT * FROM {schema}.Flights WHERE FlightID = ?",
+          (flight_id, )).fetchall()
+
+  # ---- writes
+  def check_flight(self, record, new=True):
+    '''
+    Validate a Flights record with validation.check_flight_record, then look
+    up its aircraft, the aircraft's booking and (for a new flight) its
+    FlightID; raises validation.ValidationError with the first code found
+    '''
+    flight_id, origin, destination, departure, status, aircraft_id = record
+    codes = validation.check_flight_record(flight_id, origin, destination,
+                                           departure, status)
+    if self.conn.execute("SELECT 1 FROM Aircrafts WHERE AircraftID = ?",
+                         (aircraft_id, )).fetchone() is None:
+      codes.append(validation.UNKNOWN_AIRCRAFT)
+    elif validation.parse_date(departure) is not None and validation.booking_of(
+        aircraft_id, departure, status) is not None:
+      # the flights of that day are in the shard of its month (or not yet
+      # migrated out of the main database)
+      schema, = self.attach([shard_of(departure)])
+      for source in (schema, "main"):
+        if self.conn.execute(sql_aircraft_booked.format(schema=source),
+                             (aircraft_id, departure,
+                              validation.RELEASED_STATUS,
+                              flight_id)).fetchone() is not None:
+          codes.append(validation.AIRCRAFT_BOOKED)
+          break
+    if new and (self.locate(flight_id) is not None or self.conn.execute(
+        "SELECT 1 FROM main.Flights WHERE FlightID = ?",
+        (flight_id, )).fetchone() is not None):
+      codes.append(validation.ID_IN_USE)
+    if len(codes) > 0:
+      raise validation.ValidationError(codes[0])
+
+  def insert_flight(self, record):
+    '''
+    Insert a Flights record into the shard of its Departure month
+    '''
+    with self.lock:
+      record = tuple(record)
+      self.check_flight(record)
+      schema, = self.attach([shard_of(record[3])])
+      with self.conn:
+        self.conn.execute(f"INSERT INTO {schema}.Flights VALUES (?,?,?,?,?,?)",
+                          record)
+        self.conn.execute("INSERT INTO FlightShards VALUES (?, ?)",
+                          (record[0], shard_of(record[3])))
+      return 1
+
+  def update_flight(self, record):
+    '''
+    Update a Flights record; a flight whose Departure moves to another month
+    is moved, with its OperatedBy rows, to the shard of that month
+    '''
+    with self.lock:
+      record = tuple(record)
+      flight_id = record[0]
+      old = self.locate(flight_id)
+      if old is None:
+        raise validation.ValidationError(validation.UNKNOWN_ID)
+      self.check_flight(record, new=False)
+      new = shard_of(record[3])
+      if old == new:
+        schema, = self.attach([old])
+        with self.conn:
+          return self.conn.execute(self.sql_update.format(schema=schema),
+                                   record[1:] + (flight_id, )).rowcount
+      old_schema, new_schema = self.attach([old, new])
+      with self.conn:
+        for table in SHARDED_TABLES:
+          self.conn.execute(
+              f"""INSERT INTO {new_schema}.{table}
+                  SELECT * FROM {old_schema}.{table} WHERE FlightID = ?""",
+              (flight_id, ))
+          self.conn.execute(
+              f"DELETE FROM {old_schema}.{table} WHERE FlightID = ?",
+              (flight_id, ))
+        cursor = self.conn.execute(self.sql_update.format(schema=new_schema),
+                                   record[1:] + (flight_id, ))
+        self.conn.execute("UPDATE FlightShards SET Shard = ? WHERE FlightID = ?",
+                          (new, flight_id))
+        return cursor.rowcount
+
+  def delete_flight(self, flight_id):
+    '''
+    Delete a flight and its OperatedBy rows, which would otherwise be left in
+    a shard no FlightID leads to
+    '''
+    with self.lock:
+      shard = self.locate(flight_id)
+      if shard is None:
+        raise validation.ValidationError(validation.UNKNOWN_ID)
+      schema, = self.attach([shard])
+      with self.conn:
+        cursor = self.conn.execute(
+            f"DELETE FROM {schema}.Flights WHERE FlightID = ?", (flight_id, ))
+        self.conn.execute(f"DELETE FROM {schema}.OperatedBy WHERE FlightID = ?",
+                          (flight_id, ))
+        self.conn.execute("DELETE FROM FlightShards WHERE FlightID = ?",
+                          (flight_id, ))
+        return cursor.rowcount
+
+  def insert_operated_by(self, flight_id, pilot_id):
+    '''
+    Add a (FlightID, PilotID) pair to the shard of the flight
+    '''
+    with self.lock:
+      codes = []
+      if validation.check_id(pilot_id) is not None or self.conn.execute(
+          "SELECT 1 FROM Pilots WHERE PilotID = ?",
+          (pilot_id, )).fetchone() is None:
+        codes.append(validation.INVALID_ID)
+      if flight_id == pilot_id:
+        codes.append(validation.SAME_FLIGHT_PILOT)
+      shard = self.locate(flight_id)
+      if shard is None:
+        raise validation.ValidationError(validation.UNKNOWN_ID)
+      if len(codes) > 0:
+        raise validation.ValidationError(codes[0])
+      schema, = self.attach([shard])
+      try:
+        with self.conn:
+          self.conn.execute(f"INSERT INTO {schema}.OperatedBy VALUES (?, ?)",
+                            (flight_id, pilot_id))
+      except sqlite3.IntegrityError:
+        raise validation.ValidationError(validation.PK_IN_USE)
+      return 1
+
+  def delete_operated_by(self, flight_id, pilot_id):
+    '''
+    Delete a (FlightID, PilotID) pair; raises validation.ValidationError
+    (UNKNOWN_PK) when it does not exist, as the unsharded path does
+    '''
+    with self.lock:
+      shard = self.locate(flight_id)
+      if shard is None:
+        raise validation.ValidationError(validation.UNKNOWN_PK)
+      schema, = self.attach([shard])
+      with self.conn:
+        deleted = self.conn.execute(
+            f"DELETE FROM {schema}.OperatedBy WHERE FlightID = ? AND PilotID = ?",
+            (flight_id, pilot_id)).rowcount
+      if deleted == 0:
+        raise validation.ValidationError(validation.UNKNOWN_PK)
+      return deleted
+
+  def migrate(self):
+    '''
+    Move the Flights rows of the main database (with their OperatedBy rows)
+    into the shards; returns the number of flights moved. Flights without a
+    valid Departure date stay in the main tables. A FlightID or OperatedBy
+    row already in the shards raises sqlite3.IntegrityError and leaves the
+    rows of its month in the main tables (the months before it are moved)
+    '''
+    with self.lock:
+      self.drop_views()
+      months = [
+          row[0] for row in self.conn.execute(
+              "SELECT DISTINCT substr(Departure, 1, 7) FROM main.Flights")
+      ]
+      moved = 0
+      for month in months:
+        if validation.parse_date(str(month) + "-01") is None:
+          continue
+        shard = month.replace("-", "_")
+        schema, = self.attach([shard])
+        with self.conn:
+          where = "substr(Departure, 1, 7) = ? AND length(Departure) = 10"
+          self.conn.execute(
+              f"""INSERT INTO FlightShards
+                  SELECT FlightID, ? FROM main.Flights WHERE {where}""",
+              (shard, month))
+          moved += self.conn.execute(
+              f"""INSERT INTO {schema}.Flights
+                  SELECT * FROM main.Flights WHERE {where}""",
+              (month, )).rowcount
+          self.conn.execute(
+              f"""INSERT INTO {schema}.OperatedBy
+                  SELECT * FROM main.OperatedBy WHERE FlightID IN
+                    (SELECT FlightID FROM main.Flights WHERE {where})""",
+              (month, ))
+          self.conn.execute(
+              f"""DELETE FROM main.OperatedBy WHERE FlightID IN
+                    (SELECT FlightID FROM main.Flights WHERE {where})""",
+              (month, ))
+          self.conn.execute(f"DELETE FROM main.Flights WHERE {where}",
+                            (month, ))
+      return moved
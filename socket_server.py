@@ -0,0 +1,219 @@
+'''
+Asyncio front end for AirDB: serves JSON-lines requests on a local Unix or
+TCP socket. Every request is one JSON object on one line, and is answered
+with one JSON object on one line:
+
+  {"id": 1, "op": "get", "table": "Flights", "key": "f1"}
+  {"id": 1, "ok": true, "rows": [["f1", "Heathrow Airport", ...]]}
+
+Operations (the same as the menu):
+  get     table, key (a [FlightID, PilotID] pair for OperatedBy)
+  search  table, column, value
+  stat    qid (1 to 4)
+  insert  table, record (values in column order)
+  update  table, record (PK first)
+  delete  table, key
+  ping
+
+The sqlite calls run in a bounded thread pool. A connection stops being read
+while too many of its requests are in progress (backpressure), and a request
+that takes longer than the timeout is answered with an error. Requests of one
+client may be answered out of order (match them by "id"), but a write never
+overtakes an earlier request of the same client and a read never overtakes an
+earlier write.
+'''
+import asyncio
+import concurrent.futures
+import json
+import os
+import sqlite3
+
+
+def execute(airdb, request):
+  '''
+  Run one request on the AirDB instance; returns the result fields
+  '''
+  op = request.get("op")
+  if op == "get":
+    return {"rows": airdb.get(request["table"], request["key"])}
+  elif op == "search":
+    return {
+        "rows":
+        airdb.search(request["table"], request["column"], request["value"])
+    }
+  elif op == "stat":
+    return {"rows": airdb.summary_stat(int(request["qid"]))}
+  elif op == "insert":
+    return {"rows_affected": airdb.insert(request["table"], request["record"])}
+  elif op == "update":
+    return {"rows_affected": airdb.update(request["table"], request["record"])}
+  elif op == "delete":
+    return {"rows_affected": airdb.delete(request["table"], request["key"])}
+  elif op == "ping":
+    return {}
+  raise ValueError(f"Unknown operation: {op}")
+
+
+def parse_request(line):
+  '''
+  Decode a request line; returns (request, None) or (None, error message)
+  '''
+  try:
+    request = json.loads(line)
+  except ValueError as e:
+    return None, f"Invalid JSON: {e}"
+  if not isinstance(request, dict):
+    return None, "A request must be a JSON object."
+  return request, None
+
+
+# --------------------------------------------------------------
+class AirDBServer:
+  '''
+  Serves one AirDB instance (a ConcurrentAirDB, so that several requests can
+  run at once) to any number of socket clients
+  '''
+
+  # longest request line accepted, in bytes
+  line_limit = 1024 * 1024
+  write_operations = ("insert", "update", "delete")
+
+  def __init__(self, airdb, workers=4, max_pending=64, per_client=8,
+               timeout=10.0):
+    self.airdb = airdb
+    self.executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="airdb-server")
+    # requests queued or running, over all clients
+    self.pending = asyncio.Semaphore(max_pending)
+    self.per_client = per_client
+    self.timeout = timeout
+    self.server = None
+
+  async def start(self, address):
+    '''
+    Listen on a Unix socket (a path) or on TCP (a "host:port" string)
+    '''
+    if ":" in address and "/" not in address:
+      host, port = address.rsplit(":", 1)
+      self.server = await asyncio.start_server(self.handle_client,
+                                               host,
+                                               int(port),
+                                               limit=self.line_limit)
+    else:
+      if os.path.exists(address):
+        os.remove(address)
+      self.server = await asyncio.start_unix_server(self.handle_client,
+                                                    address,
+                                                    limit=self.line_limit)
+    return self.server
+
+  async def handle_client(self, reader, writer):
+    '''
+    Read the requests of one client. Up to per_client requests of a client
+    run at once; beyond that (or when the server is saturated) the socket is
+    not read until a request completes
+    '''
+    client = asyncio.Semaphore(self.per_client)
+    tasks = set()
+    last_write = None
+    try:
+      while True:
+        await client.acquire()
+        await self.pending.acquire()
+        try:
+          line = await reader.readline()
+        except (asyncio.LimitOverrunError, ValueError):
+          self.release(client)
+          await self.respond(writer, {
+              "ok": False,
+              "error": "Request line too long."
+          })
+          break
+        if not line:
+          self.release(client)
+          break
+        request, error = parse_request(line)
+        is_write = request is not None and request.get(
+            "op") in self.write_operations
+        if is_write:
+          wait_for = set(tasks)
+        else:
+          wait_for = {last_write} if last_write in tasks else set()
+        task = asyncio.create_task(
+            self.handle_request(request, error, writer, client, wait_for))
+        if is_write:
+          last_write = task
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+      if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    except ConnectionError:
+      pass
+    finally:
+      writer.close()
+
+  def release(self, client):
+    client.release()
+    self.pending.release()
+
+  async def handle_request(self, request, error, writer, client, wait_for):
+    '''
+    Run one request in the executor once the requests it must not overtake
+    have completed, and write the response
+    '''
+    response = {}
+    future = None
+    try:
+      if error is not None:
+        raise ValueError(error)
+      response["id"] = request.get("id")
+      if wait_for:
+        await asyncio.wait(wait_for)
+      future = asyncio.get_running_loop().run_in_executor(
+          self.executor, execute, self.airdb, request)
+      # the slot is only freed when the call has really finished, even if
+      # the client has already been told that it timed out
+      future.add_done_callback(lambda _: self.release(client))
+      response.update(await asyncio.wait_for(asyncio.shield(future),
+                                             self.timeout))
+      response["ok"] = True
+    except asyncio.TimeoutError:
+      response["ok"] = False
+      response["error"] = f"Request timed out after {self.timeout} seconds."
+    except KeyError as e:
+      response["ok"] = False
+      response["error"] = f"Missing request field: {e.args[0]}"
+    except (ValueError, TypeError, IndexError, sqlite3.Error) as e:
+      response["ok"] = False
+      response["error"] = str(e) or e.__class__.__name__
+    finally:
+      if future is None:
+        self.release(client)
+    await self.respond(writer, response)
+
+  async def respond(self, writer, response):
+    writer.write(json.dumps(response, default=str).encode() + b"\n")
+    await writer.drain()
+
+  async def serve_forever(self, address):
+    server = await self.start(address)
+    async with server:
+      await server.serve_forever()
+
+  def close(self):
+    if self.server is not None:
+      self.server.close()
+    self.executor.shutdown(wait=True)
+
+
+def serve(airdb, address, **options):
+  '''
+  Run the server until interrupted
+  '''
+  server = AirDBServer(airdb, **options)
+  try:
+    asyncio.run(server.serve_forever(address))
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.close()
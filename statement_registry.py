@@ -0,0 +1,166 @@
+import collections
+import threading
+
+
+# --------------------------------------------------------------
+class StatementRegistry:
+  '''
+  Builds the parameterized search queries once per (table, column), from the
+  columns the table really has, and hands out the same SQL text every time so
+  that the prepared statement is reused from the connection's statement cache.
+  Column names that are not in the table are rejected before anything is
+  executed.
+
+  stats() counts how often the registry's own statements are executed again
+  on a connection that already ran them (among the last cache_size registry
+  statements it ran). This is registry reuse, not the hit rate of sqlite3's
+  statement cache: the other statements run on the same connection (summary
+  statistics, key lookups, ...) take slots in that cache too and are not seen
+  here, so a statement counted as reused may have been prepared again.
+  '''
+
+  def __init__(self, primary_keys, page_template, cache_size=256):
+    # table -> PK column (tables with a composite PK are not listed)
+    self.primary_keys = dict(primary_keys)
+    self.page_template = page_template
+    self.cache_size = cache_size
+    # table -> tuple of column names, read from the schema on first use
+    self.schema = dict()
+    # (kind, table, column) -> SQL
+    self.statements = dict()
+    # connection id -> (connection, OrderedDict of the statements prepared on
+    # it); the reference keeps the id from being reused by a new connection
+    # until forget() is called for the closed connection
+    self.prepared = dict()
+    # guards schema, statements, prepared and the counters
+    self.lock = threading.Lock()
+    # bumped by invalidate(), so that columns read before it are not stored
+    self.generation = 0
+    # executions of a statement the connection already ran, and first runs
+    self.reused = 0
+    self.first_runs = 0
+
+  # ---- schema
+  def columns(self, cursor, table):
+    '''
+    Return the column names of a table, as read from the database
+    '''
+    with self.lock:
+      columns = self.schema.get(table)
+      generation = self.generation
+    if columns is None:
+      # read outside the lock: the query may wait for the database
+      columns = tuple(
+          i[0] for i in cursor.execute("SELECT name FROM pragma_table_info(?)",
+                                       (table, )).fetchall())
+      if len(columns) == 0:
+        raise ValueError(f"Table {table} does not exist at the moment.")
+      with self.lock:
+        if generation == self.generation:
+          columns = self.schema.setdefault(table, columns)
+    return columns
+
+  def check_column(self, cursor, table, column):
+    if column not in self.columns(cursor, table):
+      raise ValueError(f"Column {column} is not available in {table}.")
+
+  def invalidate(self, table=None):
+    '''
+    Forget the columns and statements of a table (all tables if None) after
+    it was created or dropped
+    '''
+    with self.lock:
+      self.generation += 1
+      if table is None:
+        self.schema.clear()
+        self.statements.clear()
+        return
+      self.schema.pop(table, None)
+      for key in [key for key in self.statements if key[1] == table]:
+        del self.statements[key]
+
+  # ---- statements
+  def statement(self, kind, table, column):
+    key = (kind, table, column)
+    with self.lock:
+      sql = self.statements.get(key)
+      if sql is None:
+        if kind == "search":
+          sql = f"SELECT * FROM {table} WHERE {column} = ?"
+        elif kind == "page":
+          sql = self.page_template.format(table=table,
+                                          where=f"AND {column} = ?")
+        elif kind == "pk":
+          sql = f"SELECT * FROM {table} WHERE FlightID = ? AND PilotID = ?"
+        else:
+          raise ValueError(f"Unknown statement kind: {kind}")
+        self.statements[key] = sql
+    return sql
+
+  def search(self, cursor, table, column):
+    '''
+    SELECT * ... WHERE column = ?, for a column of the table
+    '''
+    self.check_column(cursor, table, column)
+    return self.statement("search", table, column)
+
+  def search_pk(self, cursor, table):
+    '''
+    Search by PK; the parameters of OperatedBy are (FlightID, PilotID)
+    '''
+    if table not in self.primary_keys:
+      self.check_column(cursor, table, "FlightID")
+      self.check_column(cursor, table, "PilotID")
+      return self.statement("pk", table, None)
+    return self.search(cursor, table, self.primary_keys[table])
+
+  def search_page(self, cursor, table, column):
+    '''
+    One page of the keyset-paginated search on a column (see print_pages)
+    '''
+    self.check_column(cursor, table, column)
+    return self.statement("page", table, column)
+
+  # ---- execution
+  def execute(self, cursor, sql, params=()):
+    '''
+    Execute a registry statement and count whether it was still prepared on
+    the connection
+    '''
+    self.record(cursor.connection, sql)
+    return cursor.execute(sql, params)
+
+  def record(self, conn, sql):
+    with self.lock:
+      entry = self.prepared.get(id(conn))
+      if entry is None:
+        entry = self.prepared[id(conn)] = (conn, collections.OrderedDict())
+      prepared = entry[1]
+      if sql in prepared:
+        prepared.move_to_end(sql)
+        self.reused += 1
+      else:
+        self.first_runs += 1
+        prepared[sql] = True
+        if len(prepared) > self.cache_size:
+          prepared.popitem(last=False)
+
+  def forget(self, conn):
+    '''
+    Drop the statements recorded for a connection that was closed
+    '''
+    with self.lock:
+      self.prepared.pop(id(conn), None)
+
+  def stats(self):
+    '''
+    Registry reuse counts (see the class docstring: not sqlite3's cache hits)
+    '''
+    executions = self.reused + self.first_runs
+    return {
+        "statements": len(self.statements),
+        "reused": self.reused,
+        "first_runs": self.first_runs,
+        "reuse_rate":
+        round(self.reused / executions, 4) if executions > 0 else 0.0,
+    }
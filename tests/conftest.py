@@ -0,0 +1,64 @@
+'''
+Shared fixtures: an AirDB on a fresh database file, with a few hand-written
+rows or with generated data
+'''
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from data_generator import DataGenerator
+
+PILOTS = [
+    ("p1", "Adam", "Jones", "Air Grand", "1984-12-21", "2007-03-03"),
+    ("p2", "James", "Black", "Apple Air", "1981-09-01", "2003-09-03"),
+]
+AIRCRAFTS = [
+    ("a1", "Airbus", "320", "180", "6"),
+    ("a2", "Boeing", "777", "400", "10"),
+]
+
+
+def flight(flight_id,
+           departure="2024-05-01",
+           status="Scheduled",
+           aircraft_id="a1"):
+  return (flight_id, "Heathrow Airport", "Haneda Airport", departure, status,
+          aircraft_id)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+  return str(tmp_path / "AirDB.db")
+
+
+@pytest.fixture
+def airdb(db_path):
+  '''
+  AirDB with the pilots and aircrafts above and no flights
+  '''
+  airdb = main.AirDB(db_path)
+  for record in PILOTS:
+    airdb.insert("Pilots", record)
+  for record in AIRCRAFTS:
+    airdb.insert("Aircrafts", record)
+  yield airdb
+  airdb.close()
+
+
+@pytest.fixture
+def generated_db(db_path):
+  '''
+  Path of a database holding 2000 generated flights
+  '''
+  main.AirDB(db_path).close()
+  conn = sqlite3.connect(db_path)
+  try:
+    DataGenerator(2000).populate(conn)
+  finally:
+    conn.close()
+  return db_path
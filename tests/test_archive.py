@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+import validation
+from conftest import flight
+
+
+@pytest.fixture
+def archived(airdb):
+  '''
+  F1 and F2 (Landed in 2020, operated by p1) archived, F3 left in the hot set
+  '''
+  airdb.insert("Flights", flight("F1", "2020-01-01", "Landed"))
+  airdb.insert("Flights", flight("F2", "2020-01-02", "Cancelled"))
+  airdb.insert("Flights", flight("F3", "2020-01-03", "Delayed"))
+  airdb.insert("OperatedBy", ("F1", "p1"))
+  airdb.insert("OperatedBy", ("F2", "p1"))
+  return airdb
+
+
+def test_archive_moves_completed_flights(archived):
+  stats = {qid: sorted(archived.summary_stat(qid)) for qid in (1, 2, 4)}
+  result = archived.archive_flights(30, batch_size=1)
+  assert (result.flights, result.operated_by, result.batches) == (2, 2, 2)
+
+  assert [row[0] for row in archived.select_all("Flights")] == ["F3"]
+  assert archived.select_all("OperatedBy") == []
+  assert sorted(row[0] for row in archived.select_all(
+      "Flights", archived=True)) == ["F1", "F2", "F3"]
+  assert archived.get("OperatedBy", ("F1", "p1"),
+                      archived=True) == [("F1", "p1")]
+  # the statistics include the archived totals
+  for qid, rows in stats.items():
+    assert sorted(archived.summary_stat(qid)) == rows
+
+
+def test_archived_flight_id_stays_taken(archived, tmp_path):
+  archived.archive_flights(30)
+  with pytest.raises(validation.ValidationError) as error:
+    archived.insert("Flights", flight("F1", "2020-02-01", "Landed"))
+  assert error.value.code == validation.ID_IN_USE
+
+  path = tmp_path / "flights.csv"
+  path.write_text("FlightID,Origin,Destination,Departure,Status,AircraftID\n" +
+                  ",".join(flight("F2", "2020-02-02")) + "\n")
+  report = archived.import_file("Flights", str(path))
+  assert (report.rows_inserted, report.rows_rejected) == (0, 1)
+
+
+def test_archive_conflict_keeps_rows(archived, db_path):
+  archived.archive_flights(30)
+  # a row the validators would reject, written behind their back
+  conn = sqlite3.connect(db_path)
+  with conn:
+    conn.execute("INSERT INTO Flights VALUES (?, ?, ?, ?, ?, ?)",
+                 flight("F1", "2020-02-01", "Landed"))
+    conn.execute("INSERT INTO OperatedBy VALUES ('F1', 'p1')")
+  conn.close()
+  with pytest.raises(sqlite3.IntegrityError):
+    archived.archive_flights(30)
+  assert archived.select_all("OperatedBy") == [("F1", "p1")]
+  assert len(archived.get("Flights", "F1")) == 1
@@ -0,0 +1,54 @@
+import sqlite3
+
+import pytest
+
+import validation
+from conftest import flight
+
+
+def test_booked_aircraft_rejected(airdb):
+  airdb.insert("Flights", flight("F1"))
+  with pytest.raises(validation.ValidationError) as error:
+    airdb.insert("Flights", flight("F2"))
+  assert error.value.code == validation.AIRCRAFT_BOOKED
+  # another aircraft, another day, or a cancelled flight
+  airdb.insert("Flights", flight("F2", aircraft_id="a2"))
+  airdb.insert("Flights", flight("F3", departure="2024-05-02"))
+  airdb.insert("Flights", flight("F4", status="Cancelled"))
+
+  with pytest.raises(validation.ValidationError) as error:
+    airdb.update("Flights", flight("F4", status="Scheduled"))
+  assert error.value.code == validation.AIRCRAFT_BOOKED
+  # a flight does not conflict with itself
+  airdb.update("Flights", flight("F1", status="Delayed"))
+  # cancelling F1 releases the aircraft
+  airdb.update("Flights", flight("F1", status="Cancelled"))
+  airdb.update("Flights", flight("F4", status="Scheduled"))
+  assert airdb.double_bookings() == []
+
+
+def test_import_rejects_bookings(airdb, tmp_path):
+  airdb.insert("Flights", flight("F1"))
+  path = tmp_path / "flights.csv"
+  path.write_text("FlightID,Origin,Destination,Departure,Status,AircraftID\n" +
+                  "".join(",".join(record) + "\n" for record in (
+                      flight("F2"),
+                      flight("F3", departure="2024-05-02"),
+                      flight("F4", departure="2024-05-02"),
+                  )))
+  report = airdb.import_file("Flights", str(path))
+  assert (report.rows_inserted, report.rows_rejected) == (1, 2)
+  assert airdb.double_bookings() == []
+
+
+def test_report_lists_conflicts(airdb, db_path):
+  airdb.insert("Flights", flight("F1"))
+  # conflicts written before the check existed
+  conn = sqlite3.connect(db_path)
+  with conn:
+    conn.execute("INSERT INTO Flights VALUES (?, ?, ?, ?, ?, ?)", flight("F2"))
+  conn.close()
+  conflicts = airdb.double_bookings()
+  assert len(conflicts) == 1
+  assert conflicts[0][:2] == ("a1", "2024-05-01")
+  assert sorted(conflicts[0][2]) == ["F1", "F2"]
@@ -0,0 +1,29 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def generated(generated_db):
+  airdb = main.AirDB(generated_db)
+  yield airdb
+  airdb.close()
+
+
+@pytest.mark.parametrize("qid", [1, 2, 4])
+def test_parallel_equals_serial(generated, qid):
+  serial = generated.query(generated.db_ops.summary_queries[qid])
+  assert sorted(generated.parallel_summary_stat(qid, workers=2)) == sorted(
+      serial)
+
+
+def test_parallel_includes_archive(generated):
+  assert generated.archive_flights(0).flights > 0
+  for qid in (1, 2, 4):
+    assert sorted(generated.parallel_summary_stat(qid, workers=2)) == sorted(
+        generated.summary_stat(qid))
+
+
+def test_only_partial_statistics(generated):
+  with pytest.raises(ValueError):
+    generated.parallel_summary_stat(3)
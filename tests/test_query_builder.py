@@ -0,0 +1,95 @@
+import pytest
+
+import query_builder
+from conftest import flight
+from query_builder import Predicate, bounds, build, parse_predicates
+
+COLUMNS = {
+    "Flights": ("FlightID", "Origin", "Destination", "Departure", "Status",
+                "AircraftID"),
+    "Aircrafts":
+    ("AircraftID", "Manufacturer", "Model", "MaxPassengers", "CrewSize"),
+}
+
+
+def test_parse():
+  assert parse_predicates(
+      "Departure between 2024-04-01 and 2024-06-30 and Status = Delayed "
+      "and Model in 320, 380 and Origin = 'Heathrow Airport'") == [
+          Predicate("Departure", "between", ("2024-04-01", "2024-06-30")),
+          Predicate("Status", "=", ("Delayed", )),
+          Predicate("Model", "in", ("320", "380")),
+          Predicate("Origin", "=", ("Heathrow Airport", )),
+      ]
+  # tokens as passed by the batch mode, and operators in any case
+  assert parse_predicates(["Departure", "BETWEEN", "a", "b"]) == [
+      Predicate("Departure", "between", ("a", "b"))
+  ]
+
+
+@pytest.mark.parametrize("text", [
+    "Status",
+    "Status =",
+    "Status like Delayed",
+    "Status = Delayed or Status = Landed",
+    "Departure between 2024-04-01",
+    "Status in",
+])
+def test_parse_errors(text):
+  with pytest.raises(ValueError):
+    parse_predicates(text)
+
+
+def test_build():
+  sql, params = build("Flights", parse_predicates("Status = Delayed"),
+                      COLUMNS.get)
+  assert sql == "SELECT Flights.* FROM Flights WHERE Flights.Status = ?"
+  assert params == ("Delayed", )
+
+  sql, params = build(
+      "Flights",
+      parse_predicates("Model in 320,380 and Departure >= 2024-01-01"),
+      COLUMNS.get)
+  assert "JOIN Aircrafts ON Aircrafts.AircraftID = Flights.AircraftID" in sql
+  assert "Aircrafts.Model IN (?, ?) AND Flights.Departure >= ?" in sql
+  assert params == ("320", "380", "2024-01-01")
+
+
+def test_build_errors():
+  with pytest.raises(ValueError):
+    build("Flights", [], COLUMNS.get)
+  with pytest.raises(ValueError):
+    build("Flights", parse_predicates("Departure; = 1"), COLUMNS.get)
+  # only Flights joins Aircrafts
+  with pytest.raises(ValueError):
+    build("Aircrafts", parse_predicates("Status = Delayed"), COLUMNS.get)
+
+
+def test_bounds():
+  predicates = parse_predicates(
+      "Departure >= 2024-01-01 and Departure between 2023-06-01 2024-03-31")
+  assert bounds(predicates, "Departure") == ("2024-01-01", "2024-03-31")
+  assert bounds(predicates, "Status") == (None, None)
+
+
+def test_full_scans():
+  catalog = {"Flights", "Aircrafts"}
+  steps = [
+      "SCAN Slots", "SEARCH Flights USING INDEX idx_flights_status (Status=?)",
+      "SCAN main.Aircrafts"
+  ]
+  assert query_builder.full_scans(steps, catalog) == ["Aircrafts"]
+  assert not query_builder.uses_indexes(steps, catalog)
+  assert query_builder.uses_indexes(steps[:2], catalog)
+
+
+def test_filter(airdb):
+  airdb.insert("Flights", flight("F1", status="Delayed"))
+  airdb.insert("Flights", flight("F2", status="Delayed", aircraft_id="a2"))
+  airdb.insert("Flights", flight("F3", departure="2024-05-02"))
+  rows = airdb.filter("Flights", "Status = Delayed and Model = 777")
+  assert [row[0] for row in rows] == ["F2"]
+  assert airdb.filter("Flights", [("Departure", ">", "2024-05-01")
+                                 ]) == [flight("F3", departure="2024-05-02")]
+  with pytest.raises(ValueError):
+    airdb.filter("Flights", "Passengers > 10")
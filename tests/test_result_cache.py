@@ -0,0 +1,55 @@
+import sqlite3
+
+from conftest import flight
+from result_cache import ResultCache
+
+
+def test_lru_and_versions():
+  cache = ResultCache(max_entries=2)
+  cache.put("q1", (), 1, None, [(1, )])
+  cache.put("q2", (), 1, None, [(2, )])
+  assert cache.get("q1", (), 1).fetchall() == [(1, )]
+  cache.put("q3", (), 1, None, [(3, )])
+  # q2 was the least recently used
+  assert cache.get("q2", (), 1) is None
+  # an entry of an older version is dropped
+  assert cache.get("q1", (), 2) is None
+  assert cache.get("q1", (), 1) is None
+  stats = cache.stats()
+  assert stats["evictions"] == 1
+  assert stats["invalidations"] == 1
+
+
+def test_cached_get_follows_writes(airdb):
+  airdb.insert("Flights", flight("F1"))
+  assert airdb.get("Flights", "F1")[0][4] == "Scheduled"
+  hits = airdb.cache_stats()["hits"]
+  assert airdb.get("Flights", "F1")[0][4] == "Scheduled"
+  assert airdb.cache_stats()["hits"] == hits + 1
+
+  airdb.update("Flights", flight("F1", status="Delayed"))
+  assert airdb.get("Flights", "F1")[0][4] == "Delayed"
+  airdb.delete("Flights", "F1")
+  assert airdb.get("Flights", "F1") == []
+
+
+def test_summary_follows_other_connections(airdb, db_path):
+  airdb.insert("Flights", flight("F1"))
+  assert airdb.summary_stat(1) == [("Scheduled", 1)]
+  # a commit of another connection changes PRAGMA data_version
+  conn = sqlite3.connect(db_path)
+  with conn:
+    conn.execute("INSERT INTO Flights VALUES (?, ?, ?, ?, ?, ?)",
+                 flight("F2", departure="2024-05-02"))
+  conn.close()
+  assert airdb.summary_stat(1) == [("Scheduled", 2)]
+
+
+def test_filter_and_text_search_follow_writes(airdb):
+  airdb.insert("Flights", flight("F1"))
+  assert airdb.filter("Flights", "Status = Scheduled") != []
+  assert len(airdb.text_search("Flights", "heath")) == 1
+  airdb.update("Flights", flight("F1", status="Landed"))
+  assert airdb.filter("Flights", "Status = Scheduled") == []
+  airdb.delete("Flights", "F1")
+  assert airdb.text_search("Flights", "heath") == []
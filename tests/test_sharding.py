@@ -0,0 +1,121 @@
+import pytest
+
+import main
+import validation
+from conftest import flight
+from sharding import shard_of
+
+
+@pytest.fixture
+def unsharded(airdb):
+  '''
+  Three months of flights (and their pilots) in the main tables
+  '''
+  for i, departure in enumerate(("2024-01-05", "2024-02-05", "2024-03-05"),
+                                start=1):
+    airdb.insert("Flights", flight(f"F{i}", departure, "Landed"))
+    airdb.insert("OperatedBy", (f"F{i}", "p1"))
+  return airdb
+
+
+@pytest.fixture
+def sharded(unsharded, db_path):
+  '''
+  ShardedAirDB after migrate(), attaching at most 2 shards at a time
+  '''
+  stats = {qid: sorted(unsharded.summary_stat(qid)) for qid in (1, 2, 3, 4)}
+  flights = sorted(unsharded.select_all("Flights"))
+  unsharded.close()
+  airdb = main.ShardedAirDB(db_path, max_attached=2)
+  assert airdb.migrate() == 3
+  airdb.before = stats, flights
+  yield airdb
+  airdb.close()
+
+
+def test_shard_of():
+  assert shard_of("2024-03-05") == "2024_03"
+  with pytest.raises(ValueError):
+    shard_of("2024-3-5")
+
+
+def test_migrate_keeps_reads(sharded):
+  stats, flights = sharded.before
+  assert sharded.shards.shards() == ["2024_01", "2024_02", "2024_03"]
+  assert sharded.run_read(lambda cursor: cursor.execute(
+      "SELECT COUNT(*) FROM main.Flights").fetchone()) == (0, )
+  assert sorted(sharded.select_all("Flights")) == flights
+  for qid, rows in stats.items():
+    assert sorted(sharded.summary_stat(qid)) == rows
+  assert sorted(sharded.parallel_summary_stat(1)) == stats[1]
+  assert [row[0] for row in sharded.flights_between("2024-02-01", "2024-02-28")
+         ] == ["F2"]
+
+
+def test_routed_writes(sharded):
+  version = sharded.db_ops.data_version
+  # the origin rule is the one of FlightInfo: any value but "\n"
+  sharded.insert("Flights", ("F4", "X", "Haneda Airport", "2024-03-06",
+                             "Scheduled", "a1"))
+  assert sharded.db_ops.data_version > version
+  sharded.insert("OperatedBy", ("F4", "p2"))
+
+  # a new Departure month moves the flight and its pilots
+  sharded.update("Flights", ("F4", "X", "Haneda Airport", "2024-04-06",
+                             "Scheduled", "a1"))
+  assert sharded.shards.locate("F4") == "2024_04"
+  assert sharded.get("OperatedBy", ("F4", "p2")) == [("F4", "p2")]
+
+  sharded.delete("OperatedBy", ("F4", "p2"))
+  sharded.delete("Flights", "F4")
+  assert sharded.get("Flights", "F4") == []
+  assert sharded.db_ops.data_version > version + 4
+
+
+@pytest.mark.parametrize("write, code", [
+    (lambda db: db.insert("Flights", flight("F1", "2024-05-01")),
+     validation.ID_IN_USE),
+    (lambda db: db.insert("Flights", flight("F9", "2024-01-05")),
+     validation.AIRCRAFT_BOOKED),
+    (lambda db: db.update("Flights", flight("F9")), validation.UNKNOWN_ID),
+    (lambda db: db.delete("Flights", "F9"), validation.UNKNOWN_ID),
+    (lambda db: db.insert("OperatedBy", ("F1", "p1")), validation.PK_IN_USE),
+    (lambda db: db.delete("OperatedBy", ("F1", "p2")), validation.UNKNOWN_PK),
+    (lambda db: db.delete("OperatedBy", ("F9", "p1")), validation.UNKNOWN_PK),
+])
+def test_rejected_writes(sharded, write, code):
+  with pytest.raises(validation.ValidationError) as error:
+    write(sharded)
+  assert error.value.code == code
+
+
+def test_sharded_database_needs_sharded_airdb(sharded, db_path):
+  with pytest.raises(ValueError):
+    main.AirDB(db_path)
+  with pytest.raises(ValueError):
+    main.ConcurrentAirDB(db_path)
+
+
+def test_writes_rejected_after_migration(unsharded, db_path):
+  sharded = main.ShardedAirDB(db_path)
+  try:
+    sharded.migrate()
+  finally:
+    sharded.close()
+  with pytest.raises(ValueError):
+    unsharded.insert("Flights", flight("F1", "2024-05-01"))
+  # the other tables stay writable
+  unsharded.insert("Aircrafts", ("a3", "Airbus", "380", "500", "10"))
+
+
+def test_import_moves_rows_to_shards(sharded, tmp_path):
+  path = tmp_path / "flights.csv"
+  path.write_text("FlightID,Origin,Destination,Departure,Status,AircraftID\n" +
+                  ",".join(flight("F1", "2024-06-01")) + "\n" +
+                  ",".join(flight("F5", "2024-06-02")) + "\n")
+  report = sharded.import_file("Flights", str(path))
+  assert (report.rows_inserted, report.rows_rejected) == (1, 1)
+  assert sharded.shards.locate("F5") == "2024_06"
+  assert sorted(row[0] for row in sharded.select_all("Flights")) == [
+      "F1", "F2", "F3", "F5"
+  ]
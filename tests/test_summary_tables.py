@@ -0,0 +1,56 @@
+from conftest import flight
+
+SUMMARY = """SELECT Status, NumFlights, AircraftFlights, PassengerCapacity
+               FROM FlightStatusSummary WHERE NumFlights > 0 ORDER BY Status"""
+LIVE = """SELECT Status, COUNT(*), COUNT(Aircrafts.AircraftID),
+                 COALESCE(SUM(MaxPassengers), 0)
+            FROM Flights LEFT JOIN Aircrafts
+              ON Flights.AircraftID = Aircrafts.AircraftID
+           GROUP BY Status ORDER BY Status"""
+
+
+def assert_consistent(airdb):
+  assert airdb.query(SUMMARY) == airdb.query(LIVE)
+  assert sorted(airdb.summary_stat(1)) == sorted(
+      airdb.query(airdb.db_ops.sql_summary_q1))
+  assert sorted(airdb.summary_stat(2)) == sorted(
+      airdb.query(airdb.db_ops.sql_summary_q2))
+
+
+def test_summary_follows_writes(airdb):
+  assert airdb.run_read(airdb.db_ops.summary_tables_active)
+  airdb.insert("Flights", flight("F1"))
+  airdb.insert("Flights", flight("F2", departure="2024-05-02"))
+  airdb.insert("Flights", flight("F3", status="Landed", aircraft_id="a2"))
+  assert_consistent(airdb)
+
+  airdb.update("Flights", flight("F2", departure="2024-05-02",
+                                 status="Delayed"))
+  assert_consistent(airdb)
+
+  airdb.delete("Flights", "F1")
+  assert_consistent(airdb)
+
+  # the capacity follows the aircraft
+  airdb.update("Aircrafts", ("a2", "Boeing", "777", "350", "10"))
+  assert_consistent(airdb)
+  assert ("Landed", 1, 1, 350) in airdb.query(SUMMARY)
+
+
+def test_summary_rebuilt_after_import(airdb, tmp_path):
+  path = tmp_path / "flights.csv"
+  path.write_text("FlightID,Origin,Destination,Departure,Status,AircraftID\n" +
+                  "".join(",".join(flight(f"F{i}", f"2024-06-{i:02d}")) + "\n"
+                          for i in range(1, 11)))
+  airdb.import_file("Flights", str(path))
+  assert airdb.query(SUMMARY) == [("Scheduled", 10, 10, 1800)]
+  assert_consistent(airdb)
+
+
+def test_summary_emptied_with_flights(airdb):
+  airdb.insert("Flights", flight("F1"))
+  airdb.drop_table("Flights")
+  assert airdb.query(SUMMARY) == []
+  airdb.create_table("Flights")
+  airdb.insert("Flights", flight("F1"))
+  assert_consistent(airdb)
@@ -0,0 +1,120 @@
+import datetime
+
+import pytest
+
+import validation
+from conftest import flight
+from validation import BatchValidator, ValidationError
+
+TODAY = datetime.date(2024, 6, 1)
+
+
+# ---- single values
+def test_check_text():
+  assert validation.check_text("Air Grand", validation.INVALID_SCHOOL) is None
+  for value in ("A", "123", "\n"):
+    assert validation.check_text(
+        value, validation.INVALID_SCHOOL) == validation.INVALID_SCHOOL
+
+
+def test_check_departure():
+  assert validation.check_departure("2024-02-29") is None
+  for value in ("2023-02-29", "2024-5-01", "01-05-2024", ""):
+    assert validation.check_departure(value) == validation.INVALID_DEPARTURE
+
+
+def test_check_flight_record():
+  assert validation.check_flight_record("F1", "X", "Haneda Airport",
+                                        "2024-05-01", "Landed") == []
+  assert validation.check_flight_record("\n", "\n", "\n", "2024-13-01",
+                                        "Boarding") == [
+                                            validation.INVALID_ID,
+                                            validation.INVALID_ORIGIN,
+                                            validation.SAME_ORIGIN_DESTINATION,
+                                            validation.INVALID_DEPARTURE,
+                                            validation.INVALID_STATUS,
+                                        ]
+
+
+def test_reject():
+  with pytest.raises(ValidationError) as error:
+    validation.reject(validation.UNKNOWN_ID, interactive=False)
+  assert error.value.code == validation.UNKNOWN_ID
+  assert str(error.value) == validation.MESSAGES[validation.UNKNOWN_ID]
+
+
+# ---- batches
+def test_batch_pilots():
+  validator = BatchValidator("Pilots", ["p1"], today=TODAY)
+  errors = validator.validate([
+      ("p1", "Adam", "Jones", "Air Grand", "1984-12-21", "2007-03-03"),
+      ("p2", "A", "Jones", "Air Grand", "2010-01-01", "2007-03-03"),
+      ("p3", "Ann", "Lee", "Cranfield", "1980-01-01", "2005-01-01"),
+      ("p3", "Ann", "Lee", "Cranfield", "1980-01-01", "2005-01-01"),
+      ("p4", "Ann"),
+  ])
+  assert errors == [
+      (validation.ID_IN_USE, ),
+      (validation.INVALID_NAME, validation.INVALID_BIRTH_DATE,
+       validation.INVALID_PROF_SINCE),
+      (),
+      (validation.DUPLICATE_IN_BATCH, ),
+      (validation.FIELD_COUNT, ),
+  ]
+
+
+def test_batch_flights():
+  validator = BatchValidator("Flights", [], ["a1"],
+                             TODAY,
+                             bookings=[("a1", "2024-05-01")])
+  errors = validator.validate([
+      flight("F1"),
+      flight("F2", status="Cancelled"),
+      flight("F3", departure="2024-05-02"),
+      flight("F4", departure="2024-05-02"),
+      flight("F5", aircraft_id="a9"),
+  ])
+  assert errors == [
+      (validation.AIRCRAFT_BOOKED, ),
+      (),
+      (),
+      (validation.AIRCRAFT_BOOKED, ),
+      (validation.UNKNOWN_AIRCRAFT, ),
+  ]
+  # a rejected row gives its key back
+  assert validator.validate([flight("F1", status="Cancelled")]) == [()]
+
+
+# ---- AirDB writes
+@pytest.mark.parametrize("table, record, code", [
+    ("Pilots", ("p1", "Ann", "Lee", "Cranfield", "1980-01-01", "2005-01-01"),
+     validation.ID_IN_USE),
+    ("Pilots", ("p9", "Ann", "Lee", "Cranfield", "2015-01-01", "2005-01-01"),
+     validation.INVALID_BIRTH_DATE),
+    ("Aircrafts", ("a9", "Airbus", "320", "10", "6"),
+     validation.INVALID_MAX_PASSENGERS),
+    ("Flights", flight("F1", aircraft_id="a9"), validation.UNKNOWN_AIRCRAFT),
+    ("Flights", flight("F1", status="Boarding"), validation.INVALID_STATUS),
+    ("OperatedBy", ("p1", "p1"), validation.SAME_FLIGHT_PILOT),
+])
+def test_insert_rejected(airdb, table, record, code):
+  with pytest.raises(ValidationError) as error:
+    airdb.insert(table, record)
+  assert error.value.code == code
+
+
+def test_unknown_keys(airdb):
+  airdb.insert("Flights", flight("F1"))
+  airdb.insert("OperatedBy", ("F1", "p1"))
+  with pytest.raises(ValidationError) as error:
+    airdb.insert("OperatedBy", ("F1", "p1"))
+  assert error.value.code == validation.PK_IN_USE
+  with pytest.raises(ValidationError) as error:
+    airdb.delete("OperatedBy", ("F1", "p2"))
+  assert error.value.code == validation.UNKNOWN_PK
+  with pytest.raises(ValidationError) as error:
+    airdb.delete("Flights", "F9")
+  assert error.value.code == validation.UNKNOWN_ID
+  with pytest.raises(ValidationError) as error:
+    airdb.update("Flights", flight("F9"))
+  assert error.value.code == validation.UNKNOWN_ID
@@ -0,0 +1,141 @@
+'''
+Full-text search over the airport names of Flights (Origin, Destination) and
+the names and schools of Pilots. Each table is mirrored by an FTS5 index
+stored as an external-content table: it holds the index only, reads the
+text back from the table by rowid, and is kept in sync by triggers on the
+table. Searches match whole words or word prefixes ("heath" finds Heathrow
+Airport) and return the rows ranked by bm25.
+
+The index refers to the rows by rowid. A VACUUM may renumber the rows of
+these tables (their keys are TEXT), after which rebuild() must be run.
+'''
+import re
+
+# words as the unicode61 tokenizer splits them (letters and digits)
+WORD = re.compile(r"[^\W_]+")
+
+
+# --------------------------------------------------------------
+class TextIndex:
+  '''
+  FTS5 index named name over columns of table; weights are the bm25 weights
+  of the columns (a match in a column of weight 2 ranks as two matches)
+  '''
+
+  tokenizer = "unicode61 remove_diacritics 2"
+  # prefix indexes for the 2 and 3 character prefixes (longer prefixes are
+  # read as a range of the main index)
+  prefix_lengths = "2 3"
+
+  def __init__(self, name, table, columns, weights):
+    self.name = name
+    self.table = table
+    self.columns = columns
+    self.weights = weights
+    self.triggers = {
+        f"trg_{name.lower()}_{event}": event
+        for event in ("insert", "delete", "update")
+    }
+
+  # ---- schema
+  def sql_create(self):
+    return (f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.name} USING fts5("
+            f"{', '.join(self.columns)}, content='{self.table}', "
+            f"content_rowid='rowid', tokenize='{self.tokenizer}', "
+            f"prefix='{self.prefix_lengths}')")
+
+  def sql_triggers(self):
+    columns = ", ".join(self.columns)
+    new_values = ", ".join("new." + column for column in self.columns)
+    old_values = ", ".join("old." + column for column in self.columns)
+    add = (f"INSERT INTO {self.name} (rowid, {columns}) "
+           f"VALUES (new.rowid, {new_values});")
+    remove = (f"INSERT INTO {self.name} ({self.name}, rowid, {columns}) "
+              f"VALUES ('delete', old.rowid, {old_values});")
+    body = {"insert": add, "delete": remove, "update": remove + " " + add}
+    event = {
+        "insert": "INSERT",
+        "delete": "DELETE",
+        "update": "UPDATE OF " + columns
+    }
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event[kind]} "
+        f"ON {self.table} BEGIN {body[kind]} END"
+        for trigger, kind in self.triggers.items()
+    ]
+
+  def active(self, cursor):
+    '''
+    Whether every trigger exists (i.e. the index follows the table)
+    '''
+    names = ", ".join("?" for _ in self.triggers)
+    count = cursor.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' "
+        f"AND name IN ({names})", tuple(self.triggers)).fetchone()[0]
+    return count == len(self.triggers)
+
+  def refresh(self, cursor, existing_tables):
+    '''
+    Keep the index and its triggers while the table exists (building the
+    index when the triggers had to be created), and drop them otherwise
+    '''
+    if self.table in existing_tables:
+      if not self.active(cursor):
+        cursor.execute(self.sql_create())
+        for statement in self.sql_triggers():
+          cursor.execute(statement)
+        self.rebuild(cursor)
+    else:
+      for trigger in self.triggers:
+        cursor.execute("DROP TRIGGER IF EXISTS " + trigger)
+      cursor.execute("DROP TABLE IF EXISTS " + self.name)
+
+  def rebuild(self, cursor):
+    '''
+    Rebuild the index from the table
+    '''
+    cursor.execute(f"INSERT INTO {self.name} ({self.name}) VALUES ('rebuild')")
+
+  # ---- search
+  def sql_search(self, limit=None):
+    weights = ", ".join(str(weight) for weight in self.weights)
+    sql = (f"SELECT {self.table}.* FROM {self.name} "
+           f"JOIN {self.table} ON {self.table}.rowid = {self.name}.rowid "
+           f"WHERE {self.name} MATCH ? "
+           f"ORDER BY bm25({self.name}, {weights})")
+    if limit is not None:
+      sql += " LIMIT ?"
+    return sql
+
+  def search(self, cursor, text, prefix=True, limit=None):
+    '''
+    Execute a search on cursor: the rows of the table matching every word of
+    text (as a word prefix when prefix is set), best matches first
+    '''
+    params = (match_expression(text, prefix), )
+    if limit is not None:
+      params += (limit, )
+    return cursor.execute(self.sql_search(limit), params)
+
+
+def match_expression(text, prefix=True):
+  '''
+  FTS5 query matching every word of text: each word is quoted (so that
+  operators typed by the user are searched as text), with * for a prefix
+  '''
+  words = WORD.findall(text)
+  if len(words) == 0:
+    raise ValueError("Enter at least one word to search for.")
+  suffix = "*" if prefix else ""
+  return " ".join(f'"{word}"{suffix}' for word in words)
+
+
+TEXT_INDEXES = {
+    "Flights":
+    TextIndex("FlightsText", "Flights", ("Origin", "Destination"),
+              (1.0, 1.0)),
+    # names rank above the school
+    "Pilots":
+    TextIndex("PilotsText", "Pilots", ("FirstName", "LastName", "School"),
+              (2.0, 2.0, 1.0)),
+}
@@ -0,0 +1,411 @@
+'''
+Validation rules shared by the interactive set_* functions and the batch
+(bulk import) path. Every check returns None when the value is accepted, or
+an error code otherwise.
+'''
+import datetime
+
+VALID_STATUSES = ("Cancelled", "Landed", "Delayed", "Scheduled")
+# a flight with this status does not hold its aircraft on its Departure date
+RELEASED_STATUS = "Cancelled"
+
+# ------ error codes
+FIELD_COUNT = "field_count"
+ID_IN_USE = "id_in_use"
+DUPLICATE_IN_BATCH = "duplicate_in_batch"
+INVALID_ID = "invalid_id"
+INVALID_NAME = "invalid_name"
+INVALID_SCHOOL = "invalid_school"
+INVALID_MANUFACTURER = "invalid_manufacturer"
+INVALID_MODEL = "invalid_model"
+INVALID_BIRTH_DATE = "invalid_birth_date"
+INVALID_PROF_SINCE = "invalid_prof_since"
+INVALID_MAX_PASSENGERS = "invalid_max_passengers"
+INVALID_CREW = "invalid_crew"
+INVALID_ORIGIN = "invalid_origin"
+SAME_ORIGIN_DESTINATION = "same_origin_destination"
+INVALID_DEPARTURE = "invalid_departure"
+INVALID_STATUS = "invalid_status"
+UNKNOWN_AIRCRAFT = "unknown_aircraft"
+AIRCRAFT_BOOKED = "aircraft_booked"
+PK_IN_USE = "pk_in_use"
+UNKNOWN_ID = "unknown_id"
+UNKNOWN_PK = "unknown_pk"
+SAME_FLIGHT_PILOT = "same_flight_pilot"
+
+MESSAGES = {
+    FIELD_COUNT: "Wrong number of values.",
+    ID_IN_USE: "The ID is already used in the table.",
+    DUPLICATE_IN_BATCH: "The ID is used more than once in the batch.",
+    INVALID_ID: "Invalid ID.",
+    INVALID_NAME:
+    "Pilot names must have at least two characters and be non-numeric.",
+    INVALID_SCHOOL:
+    "Air school names must have at least two characters and be non-numeric.",
+    INVALID_MANUFACTURER:
+    "Manufacturer names must have at least two characters and be non-numeric.",
+    INVALID_MODEL: "Invalid model.",
+    INVALID_BIRTH_DATE:
+    "Invalid birth date. The pilot must be between 18 and 70 years old.",
+    INVALID_PROF_SINCE:
+    "Invalid ''prof since'' date. The pilot must have been at least 18 years old when they started working as professionals.",
+    INVALID_MAX_PASSENGERS:
+    "Max passengers value must be numeric and between 20 and 500.",
+    INVALID_CREW: "Cabin crew value must be numeric and between 2 and 10.",
+    INVALID_ORIGIN: "Invalid origin.",
+    SAME_ORIGIN_DESTINATION:
+    "Flight origin and destination cannot be the same.",
+    INVALID_DEPARTURE:
+    "Flight departure date must follow the ''YYYY-MM-DD'' format.",
+    INVALID_STATUS: "Status must be a label from the following values: " +
+    str(list(VALID_STATUSES)),
+    UNKNOWN_AIRCRAFT: "The Aircraft ID must be available in the Aircrafts table",
+    AIRCRAFT_BOOKED:
+    "The aircraft is already assigned to another flight on that Departure date.",
+    PK_IN_USE: "Composite PK already exists.",
+    UNKNOWN_ID: "The ID does not exist in the table.",
+    UNKNOWN_PK: "Composite PK does not exist.",
+    SAME_FLIGHT_PILOT: "FlightID and PilotID cannot be the same.",
+}
+
+DAYS_PER_YEAR = 365.24
+
+
+# --------------------------------------------------------------
+class ValidationError(ValueError):
+  '''
+  A value rejected by a non-interactive write; code is its error code
+  '''
+
+  def __init__(self, code):
+    super().__init__(MESSAGES[code])
+    self.code = code
+
+
+def reject(code, interactive=True):
+  '''
+  Report a rejected value: print its message (menu), or raise it as a
+  ValidationError (AirDB, where the caller may not own sys.stdout). Returns
+  False for the setters
+  '''
+  if not interactive:
+    raise ValidationError(code)
+  print(MESSAGES[code])
+  return False
+
+
+# ---- single values
+def parse_date(value):
+  '''
+  Return the date of a "YYYY-MM-DD" string, or None if it is not one
+  '''
+  if not isinstance(value, str) or len(value) != 10 or value[4] != "-" \
+      or value[7] != "-":
+    return None
+  year, month, day = value[0:4], value[5:7], value[8:10]
+  if not (year.isdigit() and month.isdigit() and day.isdigit()):
+    return None
+  try:
+    return datetime.date(int(year), int(month), int(day))
+  except ValueError:
+    return None
+
+
+def check_text(value, code):
+  '''
+  At least two characters and non-numeric (names, schools, manufacturers)
+  '''
+  if isinstance(value, str) and len(value) > 1 and not value.isnumeric() \
+      and value != "\n":
+    return None
+  return code
+
+
+def check_id(value):
+  if value == "\n" or value == "":
+    return INVALID_ID
+  return None
+
+
+def check_birth_date(birth, today):
+  '''
+  birth is a parsed date (or None): the pilot must be between 18 and 70
+  '''
+  if birth is None:
+    return INVALID_BIRTH_DATE
+  years = (today - birth).days / DAYS_PER_YEAR
+  if 18 <= years <= 70:
+    return None
+  return INVALID_BIRTH_DATE
+
+
+def check_prof_since(prof_since, birth, today):
+  '''
+  Both are parsed dates (or None): the pilot turned professional at 18 or
+  later, and not today or in the future
+  '''
+  if prof_since is None or birth is None:
+    return INVALID_PROF_SINCE
+  years = (prof_since - birth).days / DAYS_PER_YEAR
+  if years >= 18 and (today - prof_since).days > 0:
+    return None
+  return INVALID_PROF_SINCE
+
+
+def check_int_range(value, low, high, code):
+  try:
+    number = int(value)
+  except (TypeError, ValueError):
+    return code
+  if low <= number <= high:
+    return None
+  return code
+
+
+def check_max_passengers(value):
+  return check_int_range(value, 20, 500, INVALID_MAX_PASSENGERS)
+
+
+def check_crew(value):
+  return check_int_range(value, 2, 10, INVALID_CREW)
+
+
+def check_origin(origin):
+  if origin == "\n":
+    return INVALID_ORIGIN
+  return None
+
+
+def check_destination(origin, destination):
+  if destination == "\n" or destination == origin:
+    return SAME_ORIGIN_DESTINATION
+  return None
+
+
+def check_departure(departure):
+  if parse_date(departure) is None:
+    return INVALID_DEPARTURE
+  return None
+
+
+def check_status(status):
+  if status in VALID_STATUSES:
+    return None
+  return INVALID_STATUS
+
+
+def check_flight_record(flight_id, origin, destination, departure, status):
+  '''
+  Codes of the checks of a Flights record that need no lookup in the database
+  (the aircraft and FlightID lookups are left to the caller)
+  '''
+  codes = (check_id(flight_id), check_origin(origin),
+           check_destination(origin, destination), check_departure(departure),
+           check_status(status))
+  return [code for code in codes if code is not None]
+
+
+def booking_of(aircraft_id, departure, status):
+  '''
+  The (AircraftID, Departure) slot a flight holds, or None if it holds none
+  '''
+  if status == RELEASED_STATUS:
+    return None
+  return (aircraft_id, departure)
+
+
+# --------------------------------------------------------------
+class BatchValidator:
+  '''
+  Validates whole batches of rows for one table in a single pass. Checks run
+  column by column: dates are parsed once per distinct value, and key checks
+  are set lookups against key sets fetched once. validate(rows) returns one
+  tuple of error codes per row (empty when the row is valid); the keys of
+  valid rows are added to the key set so later batches see them. Flights
+  are also checked against the (AircraftID, Departure) slots already held.
+  '''
+
+  field_counts = {"Pilots": 6, "Aircrafts": 5, "Flights": 6, "OperatedBy": 2}
+
+  def __init__(self,
+               table,
+               existing_keys,
+               aircraft_ids=None,
+               today=None,
+               bookings=None):
+    if table not in self.field_counts:
+      raise ValueError(f"Unknown table: {table}")
+    self.table = table
+    self.existing_keys = set(existing_keys)
+    self.aircraft_ids = set(aircraft_ids or ())
+    self.today = today or datetime.date.today()
+    self.bookings = set(bookings or ())
+
+  @classmethod
+  def from_cursor(cls, cursor, table, today=None):
+    '''
+    Build a validator with the key sets read from the database
+    '''
+    if table == "OperatedBy":
+      keys = cursor.execute(
+          "SELECT FlightID, PilotID FROM OperatedBy").fetchall()
+    else:
+      key_column = {
+          "Pilots": "PilotID",
+          "Aircrafts": "AircraftID",
+          "Flights": "FlightID"
+      }[table]
+      keys = [
+          i[0] for i in cursor.execute(
+              f"SELECT {key_column} FROM {table}").fetchall()
+      ]
+    aircraft_ids = None
+    bookings = None
+    if table == "Flights":
+      aircraft_ids = [
+          i[0] for i in cursor.execute(
+              "SELECT AircraftID FROM Aircrafts").fetchall()
+      ]
+      bookings = cursor.execute(
+          "SELECT AircraftID, Departure FROM Flights WHERE Status <> ?",
+          (RELEASED_STATUS, )).fetchall()
+    return cls(table, keys, aircraft_ids, today, bookings)
+
+  # ---- column helpers
+  def add_column_errors(self, errors, column, check):
+    for row_errors, value in zip(errors, column):
+      code = check(value)
+      if code is not None:
+        row_errors.append(code)
+
+  def parse_column(self, column):
+    '''
+    Map every distinct value of a date column to its parsed date (or None)
+    '''
+    return {value: parse_date(value) for value in set(column)}
+
+  def check_keys(self, errors, keys):
+    '''
+    Key checks run last: only rows that passed every other check claim their
+    key, so a rejected row does not make a later row with the same key a duplicate
+    '''
+    code_in_use = PK_IN_USE if self.table == "OperatedBy" else ID_IN_USE
+    existing_keys = self.existing_keys
+    claimed = set()
+    for row_errors, key in zip(errors, keys):
+      if key in claimed:
+        row_errors.append(DUPLICATE_IN_BATCH)
+      elif key in existing_keys:
+        row_errors.append(code_in_use)
+      elif not row_errors:
+        claimed.add(key)
+    existing_keys.update(claimed)
+
+  def check_bookings(self, errors, keys, bookings):
+    '''
+    Runs after the key checks: a valid row taking a slot already held (in the
+    database or by an earlier row) is rejected and gives its key back
+    '''
+    held = self.bookings
+    for row_errors, key, booking in zip(errors, keys, bookings):
+      if row_errors or booking is None:
+        continue
+      if booking in held:
+        row_errors.append(AIRCRAFT_BOOKED)
+        self.existing_keys.discard(key)
+      else:
+        held.add(booking)
+
+  # ---- tables
+  def validate_pilots(self, rows, errors):
+    ids, first, last, school, birth, prof = zip(*rows)
+    self.add_column_errors(errors, ids, check_id)
+    name_check = lambda v: check_text(v, INVALID_NAME)
+    self.add_column_errors(errors, first, name_check)
+    self.add_column_errors(errors, last, name_check)
+    self.add_column_errors(errors, school,
+                           lambda v: check_text(v, INVALID_SCHOOL))
+    birth_dates = self.parse_column(birth)
+    prof_dates = self.parse_column(prof)
+    today = self.today
+    # the age check only depends on the birth date: once per distinct value
+    birth_codes = {
+        value: check_birth_date(date, today)
+        for value, date in birth_dates.items()
+    }
+    for row_errors, b, p in zip(errors, birth, prof):
+      code = birth_codes[b]
+      if code is not None:
+        row_errors.append(code)
+      code = check_prof_since(prof_dates[p], birth_dates[b], today)
+      if code is not None:
+        row_errors.append(code)
+    return ids
+
+  def validate_aircrafts(self, rows, errors):
+    ids, manufacturer, model, max_passengers, crew = zip(*rows)
+    self.add_column_errors(errors, ids, check_id)
+    self.add_column_errors(errors, manufacturer,
+                           lambda v: check_text(v, INVALID_MANUFACTURER))
+    self.add_column_errors(errors, model,
+                           lambda v: INVALID_MODEL if v == "\n" else None)
+    self.add_column_errors(errors, max_passengers, check_max_passengers)
+    self.add_column_errors(errors, crew, check_crew)
+    return ids
+
+  def validate_flights(self, rows, errors):
+    ids, origin, destination, departure, status, aircraft = zip(*rows)
+    self.add_column_errors(errors, ids, check_id)
+    self.add_column_errors(errors, origin, check_origin)
+    for row_errors, o, d in zip(errors, origin, destination):
+      code = check_destination(o, d)
+      if code is not None:
+        row_errors.append(code)
+    departure_dates = self.parse_column(departure)
+    self.add_column_errors(
+        errors, departure,
+        lambda v: INVALID_DEPARTURE if departure_dates[v] is None else None)
+    self.add_column_errors(errors, status, check_status)
+    aircraft_ids = self.aircraft_ids
+    self.add_column_errors(
+        errors, aircraft,
+        lambda v: None if v in aircraft_ids else UNKNOWN_AIRCRAFT)
+    return ids
+
+  def validate_operated_by(self, rows, errors):
+    keys = [tuple(row) for row in rows]
+    for row_errors, (flight_id, pilot_id) in zip(errors, keys):
+      if flight_id == pilot_id:
+        row_errors.append(SAME_FLIGHT_PILOT)
+    return keys
+
+  def validate(self, rows):
+    '''
+    Return one tuple of error codes per row
+    '''
+    expected = self.field_counts[self.table]
+    errors = [[] if len(row) == expected else [FIELD_COUNT] for row in rows]
+    # rows with the wrong shape are not checked any further
+    checked = [i for i, row_errors in enumerate(errors) if not row_errors]
+    if len(checked) > 0:
+      checked_rows = [rows[i] for i in checked]
+      checked_errors = [errors[i] for i in checked]
+      validate_table = {
+          "Pilots": self.validate_pilots,
+          "Aircrafts": self.validate_aircrafts,
+          "Flights": self.validate_flights,
+          "OperatedBy": self.validate_operated_by,
+      }[self.table]
+      keys = validate_table(checked_rows, checked_errors)
+      self.check_keys(checked_errors, keys)
+      if self.table == "Flights":
+        self.check_bookings(checked_errors, keys,
+                            [booking_of(r[5], r[3], r[4]) for r in checked_rows])
+    return [tuple(row_errors) for row_errors in errors]
+
+
+def describe(codes):
+  '''
+  Readable message for a tuple of error codes
+  '''
+  return " ".join(MESSAGES.get(code, code) for code in codes)